@@ -0,0 +1,663 @@
+"""
+Event-driven backtester: replays historical price, trade and observation files through Trader.run.
+
+The round data is first decoded into MarketData, a set of columnar NumPy arrays (one .npy file per column once saved), so that it can be
+reloaded memory-mapped without parsing the CSV files again. Backtester then rebuilds one TradingState per tick, matches the orders returned by
+the trader against the order book and the market trades of that tick, enforces POSITION_LIMITS the way the exchange does and keeps the PnL of
+every product.
+
+Usage:
+    python backtester.py DATA_DIR ROUND DAY [DAY ...]
+"""
+
+import argparse
+import contextlib
+import glob
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+from datamodel import ConversionObservation, Listing, Observation, Order, OrderDepth, Trade, TradingState
+from trader import LOG_DELTA, LOG_FULL, LOG_OFF, LOG_SUMMARY, POSITION_LIMITS, PRODUCTS, SUBMISSION, Profiler, Trader
+
+LEVELS = 3 #number of book levels per side in the price files
+DENOMINATION = 'SEASHELLS'
+OBSERVATION_FIELDS = ['bidPrice', 'askPrice', 'transportFees', 'exportTariff', 'importTariff', 'sunlight', 'humidity']
+CHUNK_BYTES = 1 << 20 #bytes of csv read at once
+CHUNK_TICKS = 4096 #ticks converted to arrays at once by MarketData.from_csv, and decoded at once by MarketData.ticks
+
+
+def read_csv(path: str, chunk_bytes: int = CHUNK_BYTES):
+    """
+    yields the rows of a round data file as dicts, whether it is separated by ';' (prices, trades) or ',' (observations).
+    The file is read chunk_bytes at a time, so only one chunk of lines is in memory whatever the size of the file.
+    """
+    with open(path, newline='') as f:
+        header = f.readline().strip()
+        delimiter = ';' if ';' in header else ','
+        columns = header.split(delimiter)
+        for lines in iter(lambda: f.readlines(chunk_bytes), []):
+            for line in lines:
+                line = line.strip()
+                if line:
+                    yield dict(zip(columns, line.split(delimiter)))
+
+
+def group_by_timestamp(rows):
+    """
+    yields (timestamp, rows) for the consecutive rows sharing the same timestamp, the rows being sorted by timestamp as in the exchange files
+    """
+    timestamp = None
+    group = []
+    for row in rows:
+        row_timestamp = int(row['timestamp'])
+        if row_timestamp != timestamp:
+            if group:
+                yield timestamp, group
+            if timestamp is not None and row_timestamp < timestamp:
+                raise ValueError(f'rows are not sorted by timestamp ({row_timestamp} after {timestamp})')
+            timestamp = row_timestamp
+            group = []
+        group.append(row)
+    if group:
+        yield timestamp, group
+
+
+def stream_ticks(prices_paths: List[str], trades_paths: List[str] = None, observations_paths: List[str] = None, chunk_bytes: int = CHUNK_BYTES):
+    """
+    merges the files of consecutive days by timestamp and yields one tick at a time as (day, timestamp, price rows, trade rows, observation row or None),
+    trades_paths[i] and observations_paths[i] (when given, None if missing) being the files of the same day as prices_paths[i].
+    Every file is streamed chunk_bytes at a time, so the memory used is bounded by the chunk size and not by the size of the files.
+    Trades and observations at a timestamp without prices are dropped.
+    """
+    for i, prices_path in enumerate(prices_paths):
+        day = None
+        others = []
+        for paths in (trades_paths, observations_paths):
+            path = paths[i] if paths else None
+            groups = group_by_timestamp(read_csv(path, chunk_bytes)) if path is not None else iter(())
+            others.append([groups, next(groups, None)])
+
+        for timestamp, price_rows in group_by_timestamp(read_csv(prices_path, chunk_bytes)):
+            if day is None:
+                day = int(price_rows[0]['day'])
+            matched = []
+            for other in others:
+                groups, current = other
+                while current is not None and current[0] < timestamp:
+                    current = next(groups, None)
+                if current is not None and current[0] == timestamp:
+                    matched.append(current[1])
+                    current = next(groups, None)
+                else:
+                    matched.append([])
+                other[1] = current
+            trade_rows, observation_rows = matched
+            yield day, timestamp, price_rows, trade_rows, observation_rows[-1] if observation_rows else None
+
+
+def stream_states(prices_paths: List[str], trades_paths: List[str] = None, observations_paths: List[str] = None, chunk_bytes: int = CHUNK_BYTES):
+    """
+    yields (day, TradingState) lazily for every tick of stream_ticks, with the market trades of the tick, no position, no own trades and an empty traderData
+    """
+    listings = {}
+    for day, timestamp, price_rows, trade_rows, observation_row in stream_ticks(prices_paths, trades_paths, observations_paths, chunk_bytes):
+        order_depths = {}
+        for row in price_rows:
+            product = row['product']
+            if product not in listings:
+                listings[product] = Listing(product, product, DENOMINATION)
+            bids = {}
+            asks = {}
+            for level in range(1, LEVELS + 1):
+                if row.get(f'bid_volume_{level}'):
+                    bids[to_number(row[f'bid_price_{level}'])] = abs(to_number(row[f'bid_volume_{level}']))
+                if row.get(f'ask_volume_{level}'):
+                    asks[to_number(row[f'ask_price_{level}'])] = -abs(to_number(row[f'ask_volume_{level}']))
+            if bids or asks:
+                order_depths[product] = OrderDepth(bids, asks)
+
+        market_trades = {}
+        for row in trade_rows:
+            product = row['symbol']
+            trade = Trade(product, to_number(row['price']), int(float(row['quantity'])), row.get('buyer', ''), row.get('seller', ''), timestamp)
+            market_trades.setdefault(product, []).append(trade)
+
+        conversion_observations = {}
+        if observation_row is not None:
+            conversion_observations['ORCHIDS'] = ConversionObservation(*(float(observation_row[field]) for field in OBSERVATION_FIELDS))
+
+        yield day, TradingState('', timestamp, listings, order_depths, {}, market_trades, {}, Observation({}, conversion_observations))
+
+
+def to_number(value: str):
+    """
+    parses a price or a volume, keeping integral values as int
+    """
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+class MarketData:
+    """
+    Columnar market data of one or more consecutive days.
+
+    Per tick t (T ticks) and product p (P products):
+        days, timestamps: int64 [T]
+        bid_prices, bid_volumes, ask_prices, ask_volumes: int64 [T, P, LEVELS], best level first. A volume of 0 means no level, ask volumes are positive.
+        observations: float64 [T, C, 7] for the C conversion_products, in the order of OBSERVATION_FIELDS (NaN when missing)
+    Market trades (N trades), sorted by tick, the ones of tick t being trade_*[trade_offsets[t]:trade_offsets[t + 1]]:
+        trade_offsets: int64 [T + 1]
+        trade_product, trade_buyer, trade_seller: int64 [N], indexes into products and names
+        trade_price: float64 [N], trade_quantity: int64 [N]
+    """
+
+    ARRAYS = [
+        'days', 'timestamps',
+        'bid_prices', 'bid_volumes', 'ask_prices', 'ask_volumes',
+        'observations',
+        'trade_offsets', 'trade_product', 'trade_price', 'trade_quantity', 'trade_buyer', 'trade_seller',
+    ]
+
+    def __init__(self, products: List[str], names: List[str], conversion_products: List[str], **arrays: np.ndarray) -> None:
+        self.products = products
+        self.names = names #buyer and seller names of the market trades, index 0 is the empty name
+        self.conversion_products = conversion_products
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self._decoded = None
+        self._fingerprint = None
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @classmethod
+    def from_csv(cls, prices_paths: List[str], trades_paths: List[str] = None, observations_paths: List[str] = None, chunk_ticks: int = CHUNK_TICKS) -> 'MarketData':
+        """
+        builds the market data of consecutive days, trades_paths[i] and observations_paths[i] (when given) being the files of the same day as prices_paths[i].
+        The files are streamed with stream_ticks and converted to arrays chunk_ticks ticks at a time, so besides the result only one chunk is in memory.
+        """
+        products = [] #in order of appearance, sorted at the end
+        product_index = {}
+        priced = set() #products with at least one price row, the trades of the others are dropped
+        names = ['']
+        name_index = {'': 0}
+        has_observations = bool(observations_paths) and any(path is not None for path in observations_paths)
+        conversion_products = ['ORCHIDS'] if has_observations else [] #the observation files only describe ORCHIDS
+
+        chunks = []
+        book_rows = [] #(tick in chunk, product, bid prices, bid volumes, ask prices, ask volumes) of the current chunk
+        trade_rows = [] #(tick, product, price, quantity, buyer, seller) of the current chunk
+        observation_rows = [] #(tick in chunk, values)
+        days = []
+        timestamps = []
+
+        def index(values, value_index, value):
+            i = value_index.get(value)
+            if i is None:
+                i = value_index[value] = len(values)
+                values.append(value)
+            return i
+
+        def close_chunk():
+            n = len(days)
+            width = len(products)
+            shape = (n, width, LEVELS)
+            chunk = {
+                'days': np.array(days, dtype=np.int64),
+                'timestamps': np.array(timestamps, dtype=np.int64),
+                'bid_prices': np.zeros(shape, dtype=np.int64),
+                'bid_volumes': np.zeros(shape, dtype=np.int64),
+                'ask_prices': np.zeros(shape, dtype=np.int64),
+                'ask_volumes': np.zeros(shape, dtype=np.int64),
+                'observations': np.full((n, len(conversion_products), len(OBSERVATION_FIELDS)), np.nan),
+                'trades': np.array(trade_rows, dtype=float).reshape(-1, 6),
+            }
+            for tick, p, bid_prices, bid_volumes, ask_prices, ask_volumes in book_rows:
+                chunk['bid_prices'][tick, p] = bid_prices
+                chunk['bid_volumes'][tick, p] = bid_volumes
+                chunk['ask_prices'][tick, p] = ask_prices
+                chunk['ask_volumes'][tick, p] = ask_volumes
+            for tick, values in observation_rows:
+                chunk['observations'][tick, 0] = values
+            chunks.append(chunk)
+            for rows in (book_rows, trade_rows, observation_rows, days, timestamps):
+                rows.clear()
+
+        n_ticks = 0
+        for day, timestamp, price_rows, trades, observation_row in stream_ticks(prices_paths, trades_paths, observations_paths):
+            tick = len(days)
+            days.append(day)
+            timestamps.append(timestamp)
+
+            for row in price_rows:
+                p = index(products, product_index, row['product'])
+                priced.add(p)
+                levels = [[0] * LEVELS for _ in range(4)]
+                for level in range(LEVELS):
+                    if row.get(f'bid_volume_{level + 1}'):
+                        levels[0][level] = to_number(row[f'bid_price_{level + 1}'])
+                        levels[1][level] = abs(to_number(row[f'bid_volume_{level + 1}']))
+                    if row.get(f'ask_volume_{level + 1}'):
+                        levels[2][level] = to_number(row[f'ask_price_{level + 1}'])
+                        levels[3][level] = abs(to_number(row[f'ask_volume_{level + 1}']))
+                book_rows.append((tick, p, *levels))
+
+            for row in trades:
+                trade_rows.append((
+                    n_ticks + tick,
+                    index(products, product_index, row['symbol']),
+                    float(row['price']),
+                    int(float(row['quantity'])),
+                    index(names, name_index, row.get('buyer', '')),
+                    index(names, name_index, row.get('seller', '')),
+                ))
+
+            if observation_row is not None:
+                observation_rows.append((tick, [float(observation_row[field]) for field in OBSERVATION_FIELDS]))
+
+            if len(days) == chunk_ticks:
+                n_ticks += chunk_ticks
+                close_chunk()
+        n_ticks += len(days)
+        close_chunk()
+
+        #canonical product order: the known PRODUCTS first, then the others alphabetically
+        kept = [products[p] for p in sorted(priced)]
+        ordered = [product for product in PRODUCTS if product in kept] + sorted(set(kept) - set(PRODUCTS))
+        columns = [product_index[product] for product in ordered]
+        new_index = np.full(len(products) + 1, -1, dtype=np.int64)
+        new_index[columns] = np.arange(len(columns))
+
+        def books(name):
+            padded = [np.pad(chunk[name], ((0, 0), (0, len(products) - chunk[name].shape[1]), (0, 0))) for chunk in chunks]
+            return np.concatenate(padded)[:, columns]
+
+        trade_columns = np.concatenate([chunk['trades'] for chunk in chunks])
+        trade_product = new_index[trade_columns[:, 1].astype(np.int64)]
+        trade_columns = trade_columns[trade_product >= 0]
+        trade_product = trade_product[trade_product >= 0]
+        trade_tick = trade_columns[:, 0].astype(np.int64)
+        trade_offsets = np.zeros(n_ticks + 1, dtype=np.int64)
+        np.cumsum(np.bincount(trade_tick, minlength=n_ticks), out=trade_offsets[1:])
+
+        return cls(
+            ordered, names, conversion_products,
+            days=np.concatenate([chunk['days'] for chunk in chunks]),
+            timestamps=np.concatenate([chunk['timestamps'] for chunk in chunks]),
+            bid_prices=books('bid_prices'),
+            bid_volumes=books('bid_volumes'),
+            ask_prices=books('ask_prices'),
+            ask_volumes=books('ask_volumes'),
+            observations=np.concatenate([chunk['observations'] for chunk in chunks]),
+            trade_offsets=trade_offsets,
+            trade_product=trade_product,
+            trade_price=trade_columns[:, 2].copy(),
+            trade_quantity=trade_columns[:, 3].astype(np.int64),
+            trade_buyer=trade_columns[:, 4].astype(np.int64),
+            trade_seller=trade_columns[:, 5].astype(np.int64),
+        )
+
+    @classmethod
+    def from_round(cls, directory: str, round_number: int, days: List[int]) -> 'MarketData':
+        """
+        loads the files of the given days as distributed by the exchange: prices_round_R_day_D.csv, trades_round_R_day_D*.csv and observations_round_R_day_D*.csv
+        """
+        def find(prefix, day):
+            paths = sorted(glob.glob(os.path.join(directory, f'{prefix}_round_{round_number}_day_{day}*.csv')))
+            return paths[0] if paths else None
+
+        prices_paths = [find('prices', day) for day in days]
+        missing = [day for day, path in zip(days, prices_paths) if path is None]
+        if missing:
+            raise FileNotFoundError(f'No prices file for round {round_number} day(s) {missing} in {directory}')
+
+        return cls.from_csv(prices_paths, [find('trades', day) for day in days], [find('observations', day) for day in days])
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, 'meta.json'), 'w') as f:
+            json.dump({'products': self.products, 'names': self.names, 'conversion_products': self.conversion_products}, f)
+        for name in self.ARRAYS:
+            np.save(os.path.join(directory, name + '.npy'), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: str = 'r') -> 'MarketData':
+        """
+        loads market data written by save(), memory-mapped (read-only) by default
+        """
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, name + '.npy'), mmap_mode=mmap_mode) for name in cls.ARRAYS}
+        return cls(meta['products'], meta['names'], meta['conversion_products'], **arrays)
+
+    def decode(self) -> list:
+        """
+        decodes every tick once into (order_depths, market_trades, observations, prices), the first three ready to be put in a TradingState
+        and prices holding the bid and ask prices of every book from the best to the worst level, for the matching.
+        The result is cached, so that all the replays of the same data share the decoded objects and must not modify them.
+        """
+        if self._decoded is None:
+            self._decoded = self.decode_ticks(0, len(self))
+        return self._decoded
+
+    def ticks(self, chunk_ticks: int = CHUNK_TICKS) -> Iterator[tuple]:
+        """
+        the ticks of decode(), from its cache when the data was decoded, otherwise decoded chunk_ticks at a time and not kept:
+        memory-mapped data is then only read a chunk of rows at a time and never held whole as Python objects (e.g. by the workers of sweep.py)
+        """
+        if self._decoded is not None:
+            return iter(self._decoded)
+        return (tick for start in range(0, len(self), chunk_ticks) for tick in self.decode_ticks(start, min(start + chunk_ticks, len(self))))
+
+    def decode_ticks(self, start: int, stop: int) -> list:
+        """
+        the ticks start to stop (excluded) in the layout of decode(), not cached
+        """
+        products = self.products
+        bid_prices = self.bid_prices[start:stop].tolist()
+        bid_volumes = self.bid_volumes[start:stop].tolist()
+        ask_prices = self.ask_prices[start:stop].tolist()
+        ask_volumes = self.ask_volumes[start:stop].tolist()
+        timestamps = self.timestamps[start:stop].tolist()
+        trade_offsets = self.trade_offsets[start:stop + 1].tolist()
+        first, last = trade_offsets[0], trade_offsets[-1]
+        trade_offsets = [offset - first for offset in trade_offsets]
+        trade_columns = list(zip(
+            self.trade_product[first:last].tolist(),
+            self.trade_price[first:last].tolist(),
+            self.trade_quantity[first:last].tolist(),
+            self.trade_buyer[first:last].tolist(),
+            self.trade_seller[first:last].tolist(),
+        ))
+        observations = self.observations[start:stop].tolist()
+
+        decoded = []
+        for tick, timestamp in enumerate(timestamps):
+            order_depths = {}
+            prices = {}
+            for p, product in enumerate(products):
+                volumes = bid_volumes[tick][p]
+                asks = ask_volumes[tick][p]
+                if not volumes[0] and not asks[0]:
+                    continue
+                bids = {price: volume for price, volume in zip(bid_prices[tick][p], volumes) if volume}
+                asks = {price: -volume for price, volume in zip(ask_prices[tick][p], asks) if volume}
+                order_depths[product] = OrderDepth(bids, asks)
+                prices[product] = (sorted(bids, reverse=True), sorted(asks))
+
+            market_trades = {}
+            for p, price, quantity, buyer, seller in trade_columns[trade_offsets[tick]:trade_offsets[tick + 1]]:
+                product = products[p]
+                price = int(price) if price.is_integer() else price
+                market_trades.setdefault(product, []).append(Trade(product, price, quantity, self.names[buyer], self.names[seller], timestamp))
+
+            conversion_observations = {}
+            for product, values in zip(self.conversion_products, observations[tick]):
+                if values[0] == values[0]: #skip the ticks without observations (NaN)
+                    conversion_observations[product] = ConversionObservation(*values)
+
+            decoded.append((order_depths, market_trades, Observation({}, conversion_observations), prices))
+        return decoded
+
+    def fingerprint(self) -> str:
+        """
+        hash of the products and of every array, identifying the data in a features.FeatureStore
+        """
+        if self._fingerprint is None:
+            digest = hashlib.sha1(json.dumps([self.products, self.names, self.conversion_products]).encode())
+            for name in self.ARRAYS:
+                digest.update(np.ascontiguousarray(getattr(self, name)).data)
+            self._fingerprint = digest.hexdigest()[:16]
+        return self._fingerprint
+
+    def mid_prices(self) -> np.ndarray:
+        """
+        mid price of every product at every tick [T, P], carried forward from the last two-sided book when one side is empty
+        """
+        best_bid = self.bid_prices[:, :, 0].astype(float)
+        best_ask = self.ask_prices[:, :, 0].astype(float)
+        mid = np.where((self.bid_volumes[:, :, 0] > 0) & (self.ask_volumes[:, :, 0] > 0), (best_bid + best_ask) / 2, np.nan)
+
+        #forward fill the NaNs column by column using the index of the last valid tick
+        last_valid = np.where(np.isnan(mid), 0, np.arange(len(mid))[:, None])
+        np.maximum.accumulate(last_valid, axis=0, out=last_valid)
+        return mid[last_valid, np.arange(mid.shape[1])]
+
+
+class Account:
+    """
+    Everything the exchange keeps for one trader: positions, cash, the fills of the last tick and its traderData.
+    """
+
+    def __init__(self, products: List[str]) -> None:
+        self.position = {product: 0 for product in products}
+        self.cash = {product: 0.0 for product in products}
+        self.own_trades = {} #fills of the previous tick by product, returned in the next TradingState
+        self.trader_data = ''
+        self.rejected = [] #(timestamp, product) of the order batches rejected for breaching the position limit
+
+    def fill(self, product: str, price: float, quantity: int, counterparty: str, timestamp: int) -> None:
+        """
+        books a fill, quantity > 0 for a buy and < 0 for a sell
+        """
+        self.position[product] += quantity
+        self.cash[product] -= price * quantity
+        if quantity > 0:
+            trade = Trade(product, price, quantity, SUBMISSION, counterparty, timestamp)
+        else:
+            trade = Trade(product, price, -quantity, counterparty, SUBMISSION, timestamp)
+        self.own_trades.setdefault(product, []).append(trade)
+
+
+class BacktestResult:
+
+    def __init__(self, products: List[str], timestamps: np.ndarray, position: np.ndarray, cash: np.ndarray, mid: np.ndarray, rejected: list, replay_seconds: float, strategy_seconds: float) -> None:
+        self.products = products
+        self.timestamps = timestamps
+        self.position = position #[T, P] position after each tick
+        self.cash = cash #[T, P] cash after each tick
+        self.pnl = cash + np.where(position == 0, 0.0, position * mid) #[T, P] marked to the mid price of each tick
+        self.rejected = rejected
+        self.replay_seconds = replay_seconds #time spent by the backtester itself (decoding the ticks it streams, building states, matching, accounting)
+        self.strategy_seconds = strategy_seconds #time spent inside Trader.run
+
+    def final_pnl(self) -> Dict[str, float]:
+        return {product: float(pnl) for product, pnl in zip(self.products, self.pnl[-1])} if len(self.pnl) else {}
+
+    def total_pnl(self) -> float:
+        return float(self.pnl[-1].sum()) if len(self.pnl) else 0.0
+
+    def ticks_per_second(self) -> float:
+        return len(self.timestamps) / self.replay_seconds if self.replay_seconds > 0 else float('inf')
+
+
+class Backtester:
+    """
+    Replays MarketData through a trader. At tick t the trader sees the book of tick t, the market trades of tick t - 1 and its own fills of
+    tick t - 1. Its orders are matched first against the book of tick t, then against the market trades of tick t at the order price.
+    If the orders for a product could take the position beyond its limit were they all filled, all of them are rejected, as on the exchange.
+    """
+
+    def __init__(self, trader, data: MarketData, position_limits: Dict[str, int] = POSITION_LIMITS, log_path: str = os.devnull, store = None) -> None:
+        self.trader = trader
+        self.data = data
+        self.position_limits = position_limits
+        self.log_path = log_path #where the output printed by the trader goes
+        self.store = store #optional features.FeatureStore serving the mid prices the PnL is marked to
+        self.listings = {product: Listing(product, product, DENOMINATION) for product in data.products}
+
+    def match(self, account: Account, product: str, orders: List[Order], order_depth: OrderDepth, prices: tuple, trades: List[Trade], timestamp: int) -> None:
+        """
+        matches the orders of one product against the book and then against the market trades of the tick,
+        prices being the bid and ask prices of the book from the best to the worst level (see MarketData.decode)
+        """
+        position = account.position[product]
+        limit = self.position_limits.get(product, 0)
+        total_buy = 0
+        total_sell = 0
+        for order in orders:
+            if order.quantity > 0:
+                total_buy += order.quantity
+            else:
+                total_sell -= order.quantity
+        if position + total_buy > limit or position - total_sell < -limit:
+            account.rejected.append((timestamp, product))
+            return
+
+        taken = None #volume already taken from each level of the book during this tick (bid and ask prices never overlap)
+        trade_volumes = None
+        for order in orders:
+            limit_price = order.price
+            quantity = order.quantity
+            if limit_price is None or quantity == 0:
+                continue
+            buy = quantity > 0
+            remaining = quantity if buy else -quantity
+
+            if buy:
+                levels, side = order_depth.sell_orders, prices[1]
+            else:
+                levels, side = order_depth.buy_orders, prices[0]
+            if side and (side[0] <= limit_price if buy else side[0] >= limit_price):
+                if taken is None:
+                    taken = {}
+                for price in side:
+                    if price > limit_price if buy else price < limit_price:
+                        break
+                    volume = min(remaining, abs(levels[price]) - taken.get(price, 0))
+                    if volume > 0:
+                        account.fill(product, price, volume if buy else -volume, '', timestamp)
+                        taken[price] = taken.get(price, 0) + volume
+                        remaining -= volume
+                        if remaining == 0:
+                            break
+
+            if remaining == 0 or not trades:
+                continue
+            if trade_volumes is None:
+                trade_volumes = [trade.quantity for trade in trades]
+            for i, trade in enumerate(trades):
+                if trade_volumes[i] == 0 or (trade.price > limit_price if buy else trade.price < limit_price):
+                    continue
+                volume = min(remaining, trade_volumes[i])
+                account.fill(product, trade.price, volume if buy else -volume, trade.seller if buy else trade.buyer, timestamp)
+                trade_volumes[i] -= volume
+                remaining -= volume
+                if remaining == 0:
+                    break
+
+    def convert(self, account: Account, product: str, conversions: int, observation: ConversionObservation, timestamp: int) -> None:
+        """
+        conversions can only reduce the position: a long position is sold at the bid of the other island, a short one is bought at its ask, fees and tariffs included
+        """
+        position = account.position[product]
+        if conversions == 0 or position == 0 or observation is None or abs(conversions) > abs(position) or (conversions > 0) == (position > 0):
+            return
+        if conversions > 0:
+            price = observation.askPrice + observation.transportFees + observation.importTariff
+        else:
+            price = observation.bidPrice - observation.transportFees - observation.exportTariff
+        account.position[product] += conversions
+        account.cash[product] -= price * conversions
+
+    def run(self) -> BacktestResult:
+        return self.run_variants([self.trader])[0]
+
+    def run_variants(self, traders: list) -> List[BacktestResult]:
+        """
+        replays the data once for many independent traders and returns one result per trader. Every tick is decoded once (MarketData.ticks): its
+        books, market trades and observations are shared by the TradingStates of all the traders (which must not modify them), while each trader
+        keeps its own account (positions, cash, fills, traderData) and is matched against the book of the tick on its own. The replay time is split evenly.
+        """
+        data = self.data
+        products = data.products
+        timestamps = data.timestamps.tolist()
+        ticks = data.ticks()
+
+        accounts = [Account(products) for _ in traders]
+        positions = [[] for _ in traders]
+        cash = [[] for _ in traders]
+        strategy_seconds = [0.0 for _ in traders]
+        variants = list(zip(traders, accounts, positions, cash))
+        previous_trades = {}
+        no_trades = []
+        match = self.match
+        listings = self.listings
+        perf_counter = time.perf_counter
+
+        start = time.perf_counter()
+        with open(self.log_path, 'w') as log, contextlib.redirect_stdout(log):
+            for timestamp, (order_depths, market_trades, observations, prices) in zip(timestamps, ticks):
+                for k, (trader, account, account_positions, account_cash) in enumerate(variants):
+                    own_trades = account.own_trades
+                    account.own_trades = {}
+                    state = TradingState(
+                        account.trader_data, timestamp, listings, order_depths,
+                        own_trades, previous_trades, dict(account.position), observations,
+                    )
+
+                    strategy_start = perf_counter()
+                    orders, conversions, account.trader_data = trader.run(state)
+                    strategy_seconds[k] += perf_counter() - strategy_start
+
+                    for product, product_orders in orders.items():
+                        if product_orders and product in order_depths:
+                            match(account, product, product_orders, order_depths[product], prices[product], market_trades.get(product, no_trades), timestamp)
+                    if conversions:
+                        for product, observation in observations.conversionObservations.items():
+                            self.convert(account, product, conversions, observation, timestamp)
+
+                    account_positions.append(list(account.position.values()))
+                    account_cash.append(list(account.cash.values()))
+                previous_trades = market_trades
+
+        replay_seconds = (time.perf_counter() - start - sum(strategy_seconds)) / len(traders)
+        #a recorder only appends full chunks while recording, the rows of the last one are written when the replay ends
+        for trader in traders:
+            recorder = getattr(trader, 'recorder', None)
+            if recorder is not None:
+                recorder.close()
+
+        mid = data.mid_prices() if self.store is None else self.store.get(data.fingerprint(), 'mid_prices', {}, data.mid_prices)
+        results = []
+        for account, account_positions, account_cash, seconds in zip(accounts, positions, cash, strategy_seconds):
+            account_positions = np.array(account_positions, dtype=np.int64).reshape(len(timestamps), len(products))
+            account_cash = np.array(account_cash, dtype=float).reshape(len(timestamps), len(products))
+            results.append(BacktestResult(products, data.timestamps, account_positions, account_cash, mid, account.rejected, replay_seconds, seconds))
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay round data through Trader.run and report the PnL per product.')
+    parser.add_argument('directory', help='directory with the prices_/trades_/observations_round_R_day_D csv files')
+    parser.add_argument('round', type=int)
+    parser.add_argument('days', type=int, nargs='+')
+    parser.add_argument('--log', default=os.devnull, help='file receiving the output printed by the trader')
+    parser.add_argument('--log-level', choices=[LOG_OFF, LOG_SUMMARY, LOG_FULL, LOG_DELTA], default=None, help='verbosity of the trader logs (full with --log, off otherwise), delta logs are decoded by deltalog.py')
+    parser.add_argument('--profile', type=int, default=None, metavar='N', help='measure the latency of the strategies and risk limits of Trader.run, summarized in the logs every N ticks and at the end')
+    parser.add_argument('--profile-all', action='store_true', help='with --profile, time every step of Trader.run at every tick instead of the strategies and risk limits of one tick in PROFILE_SAMPLE_EVERY')
+    parser.add_argument('--no-persist', action='store_true', help='skip encoding the traderData at every tick (Trader(persist=False)), nothing reads it back in process')
+    args = parser.parse_args()
+    log_level = args.log_level or (LOG_OFF if args.log == os.devnull else LOG_FULL)
+
+    data = MarketData.from_round(args.directory, args.round, args.days)
+    trader = Trader(log_level=log_level, profile_every=args.profile, persist=not args.no_persist)
+    if args.profile and args.profile_all:
+        trader.profiler = Profiler(args.profile, sample_every=1, sections=None)
+    result = Backtester(trader, data, log_path=args.log).run()
+
+    for product, pnl in result.final_pnl().items():
+        print(f'{product:>16} {pnl:>14,.1f}')
+    print(f'{"TOTAL":>16} {result.total_pnl():>14,.1f}')
+    print(f'{len(result.rejected)} order batches rejected, {result.ticks_per_second():,.0f} ticks/s replayed ({result.strategy_seconds:.1f}s in Trader.run)')
+    if args.profile:
+        print(trader.profiler.summary())
+
+
+if __name__ == '__main__':
+    main()
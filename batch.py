@@ -0,0 +1,388 @@
+"""
+Vectorized whole-day mode of the strategies in trader.py.
+
+Given the MarketData of a session and the position held at every tick, compute_signals evaluates the signals and the target orders of
+every strategy for all the ticks at once with NumPy, instead of calling Trader.run one TradingState at a time. check_parity replays the
+same data through Trader.run and reports every tick where the two paths disagree.
+
+Usage:
+    python batch.py DATA_DIR ROUND DAY [DAY ...]
+"""
+
+import argparse
+import contextlib
+import math
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from backtester import OBSERVATION_FIELDS, MarketData
+from datamodel import TradingState
+from features import FeatureStore
+from trader import (
+    AMETHYSTS, CHOCOLATE, COCONUT, COCONUT_COUPON, DAY_TIMESTAMPS, DAYS_PER_YEAR, DEFAULT_PRICES, GIFT_BASKET, ORCHIDS, POSITION_LIMITS,
+    PRODUCT_INDEX, PRODUCTS, ROSES, STARFRUIT, STRAWBERRIES, LOG_OFF, Trader, TraderParams, black_scholes, implied_vol,
+)
+
+
+def affine_scan(a: np.ndarray, b: np.ndarray, initial: np.ndarray) -> np.ndarray:
+    """
+    solves the recurrence x[t] = a[t] * x[t - 1] + b[t] along the first axis, with x[-1] = initial, in log2(T) vectorized steps (Hillis-Steele scan).
+    Unlike a closed form with cumulative products, it never divides by small numbers, so it stays accurate on sessions of any length.
+    """
+    a = a.astype(float)
+    b = b.astype(float)
+    shift = 1
+    while shift < len(a):
+        b[shift:] = a[shift:] * b[:-shift] + b[shift:]
+        a[shift:] = a[shift:] * a[:-shift]
+        shift *= 2
+    return a * initial + b
+
+
+def rolling_moments(x: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    rolling mean and stdev (ddof=1) of x over the last window values, NaN until the window is full, as pd.Series.rolling(window)
+    """
+    mean = np.full(len(x), np.nan)
+    std = np.full(len(x), np.nan)
+    if len(x) < window:
+        return mean, std
+    shifted = x - x[0] #limits the cancellation errors of the sums of squares
+    sums = np.concatenate([[0.0], np.cumsum(shifted)])
+    sums_sq = np.concatenate([[0.0], np.cumsum(shifted * shifted)])
+    window_sum = sums[window:] - sums[:-window]
+    window_sum_sq = sums_sq[window:] - sums_sq[:-window]
+    mean[window - 1:] = x[0] + window_sum / window
+    if window > 1:
+        std[window - 1:] = np.sqrt(np.maximum((window_sum_sq - window_sum * window_sum / window) / (window - 1), 0.0))
+    return mean, std
+
+
+def expanding_moments(x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    mean and population stdev (ddof=0) of all the non-NaN values of x up to each tick, as RunningMoments
+    """
+    valid = ~np.isnan(x)
+    if not valid.any():
+        return np.full(len(x), np.nan), np.full(len(x), np.nan)
+    origin = x[valid][0]
+    shifted = np.where(valid, x - origin, 0.0)
+    count = np.cumsum(valid)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.cumsum(shifted) / count
+        variance = np.cumsum(shifted * shifted) / count - mean * mean
+    return origin + mean, np.sqrt(np.maximum(variance, 0.0))
+
+
+def scatter(values: np.ndarray, where: np.ndarray) -> np.ndarray:
+    """
+    values computed on the ticks where `where` is True only, placed back on the whole session with NaN on the other ticks
+    """
+    out = np.full(len(where), np.nan)
+    out[where] = values
+    return out
+
+
+class BatchOrders:
+    """
+    Target orders of one product for every tick: up to K orders per tick, stored as price [T, K] (NaN for a None price), quantity [T, K] and a mask [T, K] of the slots holding an order.
+    """
+
+    def __init__(self, n_ticks: int, slots: int) -> None:
+        self.price = np.full((n_ticks, slots), np.nan)
+        self.quantity = np.zeros((n_ticks, slots), dtype=np.int64)
+        self.mask = np.zeros((n_ticks, slots), dtype=bool)
+
+    def set(self, slot: int, where: np.ndarray, price, quantity) -> None:
+        self.price[where, slot] = np.broadcast_to(price, where.shape)[where]
+        self.quantity[where, slot] = np.broadcast_to(quantity, where.shape)[where]
+        self.mask[where, slot] = True
+
+    def at(self, tick: int) -> List[Tuple[int, int]]:
+        """
+        orders of the tick as a sorted list of (price, quantity), with None for a missing price
+        """
+        orders = []
+        for price, quantity in zip(self.price[tick][self.mask[tick]].tolist(), self.quantity[tick][self.mask[tick]].tolist()):
+            orders.append((None if math.isnan(price) else int(price), quantity))
+        return sorted(orders, key=lambda order: (order[0] is None, order))
+
+
+class BatchResult:
+
+    def __init__(self, timestamps: np.ndarray, signals: Dict[str, np.ndarray], orders: Dict[str, BatchOrders]) -> None:
+        self.timestamps = timestamps
+        self.signals = signals #name -> array [T] (or [T, P] indexed by PRODUCT_INDEX)
+        self.orders = orders #product -> BatchOrders
+
+    def orders_at(self, tick: int) -> Dict[str, List[Tuple[int, int]]]:
+        return {product: orders.at(tick) for product, orders in self.orders.items()}
+
+
+def market_arrays(data: MarketData) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    best bid and best ask [T, P] of the products of PRODUCTS (NaN when that side of the book is empty or the product is missing)
+    """
+    best_bid = np.full((len(data), len(PRODUCTS)), np.nan)
+    best_ask = np.full((len(data), len(PRODUCTS)), np.nan)
+    for p, product in enumerate(data.products):
+        if product in PRODUCT_INDEX:
+            i = PRODUCT_INDEX[product]
+            best_bid[:, i] = np.where(data.bid_volumes[:, p, 0] > 0, data.bid_prices[:, p, 0], np.nan)
+            best_ask[:, i] = np.where(data.ask_volumes[:, p, 0] > 0, data.ask_prices[:, p, 0], np.nan)
+    return best_bid, best_ask
+
+
+def compute_signals(data: MarketData, positions: np.ndarray = None, params: TraderParams = None, store: FeatureStore = None) -> BatchResult:
+    """
+    signals and target orders of every strategy for the whole session, with the given parameters (the defaults of TraderParams if None).
+    positions [T, P] is the position held at each tick, indexed by PRODUCT_INDEX (flat by default), as it would be found in the TradingState.
+    With a store, the derived series (books, EMAs, spreads, rolling and expanding moments, implied volatility) are read from it, keyed by the
+    data and the parameters they depend on, so that only the order logic is evaluated again for a variant.
+    """
+    if params is None:
+        params = TraderParams()
+    if params.depth_ticks is not None:
+        raise ValueError('depth_ticks sizes the orders from the full books, which the vectorized mode does not model')
+    ema_param = params.ema_param
+    n_ticks = len(data)
+    timestamps = np.asarray(data.timestamps)
+    if positions is None:
+        positions = np.zeros((n_ticks, len(PRODUCTS)), dtype=np.int64)
+    limits = np.array([POSITION_LIMITS[product] for product in PRODUCTS])
+    bid_volumes = limits - positions
+    ask_volumes = -limits - positions
+
+    def feature(name, compute, **feature_params):
+        #a series that only depends on the data and on feature_params, computed once per store
+        if store is None:
+            return compute()
+        return store.get(data.fingerprint(), name, feature_params, compute)
+
+    def column(product):
+        return PRODUCT_INDEX[product]
+
+    best_bid, best_ask = feature('best_bid_ask', lambda: np.stack(market_arrays(data)))
+    book_mid = (best_bid + best_ask) / 2
+    has_book = ~np.isnan(book_mid)
+
+    def compute_ema():
+        #EMA of the mids: it does not move on the ticks without a two-sided book, and starts from the first mid (or the default price)
+        a = np.where(has_book, 1 - ema_param, 1.0)
+        b = np.where(has_book, ema_param * np.nan_to_num(book_mid), 0.0)
+        a[0] = 0.0
+        b[0] = np.where(has_book[0], book_mid[0], defaults)
+        return affine_scan(a, b, defaults)
+
+    defaults = np.array([DEFAULT_PRICES[product] for product in PRODUCTS], dtype=float)
+    ema = feature('ema', compute_ema, ema_param=ema_param)
+    mid = feature('mid', lambda: np.where(has_book, book_mid, np.vstack([defaults, ema[:-1]])), ema_param=ema_param) #what get_mid_price returns
+
+    signals = {'mid': mid, 'ema': ema, 'best_bid': best_bid, 'best_ask': best_ask}
+    orders = {}
+
+    def reset_orders(product, result, slot, where):
+        #reset_positions: -position at the best bid if long or flat, at the best ask if short (None price when the book is one-sided)
+        i = column(product)
+        position = positions[:, i]
+        price = np.where(has_book[:, i], np.where(position >= 0, best_bid[:, i], best_ask[:, i]), np.nan)
+        result.set(slot, where, price, -position)
+
+    #AMETHYSTS: fair value quoting around the default price (the per-tick strategy fails when one side of the book is empty)
+    i = column(AMETHYSTS)
+    fair = DEFAULT_PRICES[AMETHYSTS]
+    bid, ask = best_bid[:, i], best_ask[:, i]
+    up = has_book[:, i] & (bid > fair) & (ask > fair)
+    down = has_book[:, i] & (bid < fair) & (ask < fair) & ~up
+    middle = has_book[:, i] & ~up & ~down
+    min_diff = np.minimum(np.abs(bid - fair), np.abs(fair - ask))
+    result = orders[AMETHYSTS] = BatchOrders(n_ticks, 2)
+    result.set(0, has_book[:, i], np.where(up, fair, np.where(down, ask, fair - min_diff + 1)), bid_volumes[:, i])
+    result.set(1, has_book[:, i], np.where(up, bid, np.where(down, fair, fair + min_diff - 1)), ask_volumes[:, i])
+    signals['amethysts_middle'] = middle
+
+    #STARFRUIT: bands around the EMA, skewed by the position (only with a two-sided STARFRUIT book, like every strategy of Trader.run)
+    i = column(STARFRUIT)
+    position = positions[:, i]
+    offset_bid = np.where(position == 0, -1, np.where(position > 0, -2, 0))
+    offset_ask = np.where(position == 0, 1, np.where(position > 0, 0, 2))
+    result = orders[STARFRUIT] = BatchOrders(n_ticks, 2)
+    result.set(0, has_book[:, i], np.floor(ema[:, i] + offset_bid), bid_volumes[:, i])
+    result.set(1, has_book[:, i], np.ceil(ema[:, i] + offset_ask), ask_volumes[:, i])
+
+    #ORCHIDS: concordant (orchids_lag - 1)-observation derivatives of sunlight and humidity, flat after orchids_cutoff
+    i = column(ORCHIDS)
+    lag = params.orchids_lag
+    result = orders[ORCHIDS] = BatchOrders(n_ticks, 1)
+    observed = np.zeros(n_ticks, dtype=bool)
+    if ORCHIDS in data.conversion_products:
+        c = data.conversion_products.index(ORCHIDS)
+        sunlight = data.observations[:, c, OBSERVATION_FIELDS.index('sunlight')]
+        humidity = data.observations[:, c, OBSERVATION_FIELDS.index('humidity')]
+        observed = ~np.isnan(sunlight) & ~np.isnan(humidity) #the windows only receive the ticks with an ORCHIDS observation
+
+    def compute_orchids_derivs():
+        derivs = np.full((2, n_ticks), np.nan)
+        if observed.any():
+            values = np.stack([sunlight[observed], humidity[observed]])
+            n_observed = values.shape[1]
+            changes = np.full(values.shape, np.nan)
+            changes[:, lag - 1:] = values[:, lag - 1:] - values[:, :n_observed - lag + 1]
+            derivs[:, observed] = changes
+        return derivs
+
+    sunlight_deriv, humidity_deriv = feature('orchids_derivs', compute_orchids_derivs, lag=lag)
+    runs = observed & has_book[:, i]
+    mid_orchids = np.round(mid[:, i])
+    early = timestamps <= params.orchids_cutoff
+    derivs = ~np.isnan(sunlight_deriv) & ~np.isnan(humidity_deriv)
+    rising = runs & early & derivs & (sunlight_deriv > 0) & (humidity_deriv > 0)
+    falling = runs & early & derivs & (sunlight_deriv < 0) & (humidity_deriv < 0)
+    result.set(0, rising, mid_orchids, bid_volumes[:, i])
+    result.set(0, falling, mid_orchids, ask_volumes[:, i])
+    reset_orders(ORCHIDS, result, 0, runs & ((early & derivs & ~rising & ~falling) | ~early))
+    signals['sunlight_deriv'] = sunlight_deriv
+    signals['humidity_deriv'] = humidity_deriv
+
+    #GIFT_BASKET: z-score of the basket spread over the last rolling_window ticks where the four books are two-sided, unwinding by multiplier baskets at the position limit
+    basket_books = has_book[:, [column(GIFT_BASKET), column(CHOCOLATE), column(STRAWBERRIES), column(ROSES)]].all(axis=1)
+
+    def compute_spread():
+        spread = book_mid[:, column(GIFT_BASKET)] - (4 * book_mid[:, column(CHOCOLATE)] + 6 * book_mid[:, column(STRAWBERRIES)] + book_mid[:, column(ROSES)])
+        return np.where(basket_books, spread, np.nan)
+
+    def compute_spread_moments(window):
+        return np.stack([scatter(moment, basket_books) for moment in rolling_moments(spread[basket_books], window)])
+
+    spread = feature('basket_spread', compute_spread)
+    spread_mean, spread_sd = feature('basket_spread_moments', lambda: compute_spread_moments(params.rolling_window), window=params.rolling_window)
+    spread_5 = feature('basket_spread_moments', lambda: compute_spread_moments(5), window=5)[0]
+    position_basket = positions[:, column(GIFT_BASKET)]
+    ready = ~np.isnan(spread_mean)
+    threshold = params.spread_threshold
+    room = np.abs(position_basket) <= POSITION_LIMITS[GIFT_BASKET] - params.volume_basket
+    buy = ready & ((room & (spread_5 < spread_mean - threshold * spread_sd)) | (~room & (position_basket <= 0)))
+    sell = ready & ((room & ~buy & (spread_5 > spread_mean + threshold * spread_sd)) | (~room & (position_basket > 0)))
+    multiplier = np.where(room, 1, params.multiplier)
+    sign = np.where(buy, 1, -1)
+    for product, ratio in [(GIFT_BASKET, -1), (CHOCOLATE, 4), (STRAWBERRIES, 6), (ROSES, 1)]:
+        result = orders[product] = BatchOrders(n_ticks, 1)
+        if product == GIFT_BASKET:
+            price = np.where(buy, 1_000_000, 1)
+        else:
+            price = np.where(buy, 1, 1_000_000)
+        result.set(0, buy | sell, price, -sign * ratio * params.volume_basket * multiplier)
+    signals.update(spread=spread, spread_mean=spread_mean, spread_sd=spread_sd, spread_5=spread_5)
+
+    #COCONUT / COCONUT_COUPON: z-score of the spread of their coco_lookback averages against all the previous spreads, over the ticks where both books are two-sided
+    i, j = column(COCONUT), column(COCONUT_COUPON)
+    coco_books = has_book[:, i] & has_book[:, j]
+
+    def compute_coco_spread():
+        average_coconut, _ = rolling_moments(book_mid[coco_books, i], params.coco_lookback)
+        average_coupon, _ = rolling_moments(book_mid[coco_books, j], params.coco_lookback)
+        spread = scatter(average_coconut - average_coupon, coco_books)
+        return np.stack([spread] + [scatter(moment, coco_books) for moment in expanding_moments(spread[coco_books])])
+
+    coco_spread, coco_mean, coco_sd = feature('coco_spread', compute_coco_spread, lookback=params.coco_lookback)
+    ready = coco_books & (np.cumsum(coco_books) >= params.coco_warmup)
+    high = ready & (coco_spread > coco_mean + params.coco_threshold * coco_sd)
+    low = ready & ~high & (coco_spread < coco_mean - params.coco_threshold * coco_sd)
+    calm = ready & ~high & ~low & (np.abs(coco_spread) < coco_mean + params.coco_reset_threshold * coco_sd)
+    result_coconut = orders[COCONUT] = BatchOrders(n_ticks, 1)
+    result_coupon = orders[COCONUT_COUPON] = BatchOrders(n_ticks, 1)
+    mid_coconut, mid_coupon = np.round(mid[:, i]), np.round(mid[:, j])
+    result_coconut.set(0, high, mid_coconut, ask_volumes[:, i])
+    result_coupon.set(0, high, mid_coupon, bid_volumes[:, j])
+    result_coconut.set(0, low, mid_coconut, bid_volumes[:, i])
+    result_coupon.set(0, low, mid_coupon, ask_volumes[:, j])
+    reset_orders(COCONUT, result_coconut, 0, calm)
+    reset_orders(COCONUT_COUPON, result_coupon, 0, calm)
+    signals.update(coco_spread=coco_spread, coco_mean=coco_mean, coco_sd=coco_sd)
+
+    #COCONUT_COUPON as a call on COCONUT: implied volatility and delta of every tick with both books, repriced in one call
+    def compute_coupon():
+        years = (params.coupon_days_left - timestamps / DAY_TIMESTAMPS) / DAYS_PER_YEAR
+        iv = np.where(coco_books, implied_vol(book_mid[:, j], book_mid[:, i], params.coupon_strike, years, params.coupon_vol), np.nan)
+        _, delta, _ = black_scholes(book_mid[:, i], params.coupon_strike, years, iv)
+        return np.stack([iv, delta])
+
+    coupon_iv, coupon_delta = feature('coupon', compute_coupon, strike=params.coupon_strike, days_left=params.coupon_days_left, vol=params.coupon_vol)
+    signals.update(coupon_iv=coupon_iv, coupon_delta=coupon_delta)
+
+    for product, result in orders.items():
+        apply_risk_limits(result, positions[:, column(product)], POSITION_LIMITS[product])
+
+    return BatchResult(timestamps, signals, orders)
+
+
+def apply_risk_limits(orders: BatchOrders, position: np.ndarray, limit: int) -> None:
+    """
+    Trader.apply_risk_limits on all the ticks at once: drops the orders without a price or quantity and scales the buys (sells) of the ticks
+    where they exceed what the limit leaves proportionally down, rounded towards zero
+    """
+    orders.mask &= ~np.isnan(orders.price) & (orders.quantity != 0)
+    quantity = np.where(orders.mask, orders.quantity, 0)
+    buys = np.maximum(quantity, 0).sum(axis=1, keepdims=True)
+    sells = np.maximum(-quantity, 0).sum(axis=1, keepdims=True)
+    buy_room = np.maximum(limit - position, 0)[:, None]
+    sell_room = np.maximum(limit + position, 0)[:, None]
+    buying = quantity > 0
+    over = np.where(buying, buys > buy_room, sells > sell_room)
+    room = np.where(buying, buy_room, sell_room)
+    total = np.maximum(np.where(buying, buys, sells), 1)
+    orders.quantity = np.where(over, np.sign(quantity) * (np.abs(quantity) * room // total), quantity)
+    orders.mask &= orders.quantity != 0
+
+
+def check_parity(data: MarketData, positions: np.ndarray = None, trader: Trader = None, store: FeatureStore = None) -> List[Tuple[int, str, list, list]]:
+    """
+    runs Trader.run tick by tick on the same data and positions as compute_signals and returns the mismatches as (timestamp, product, per-tick orders, batch orders)
+    """
+    n_ticks = len(data)
+    if positions is None:
+        positions = np.zeros((n_ticks, len(PRODUCTS)), dtype=np.int64)
+    if trader is None:
+        trader = Trader(log_level=LOG_OFF)
+    batch = compute_signals(data, positions, trader.params, store)
+
+    mismatches = []
+    timestamps = data.timestamps.tolist()
+    position_rows = positions.tolist()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for tick, (order_depths, market_trades, observations, _) in enumerate(data.decode()):
+            position = {product: position_rows[tick][PRODUCT_INDEX[product]] for product in PRODUCTS}
+            state = TradingState('', timestamps[tick], {}, order_depths, {}, market_trades, position, observations)
+            result, _, _ = trader.run(state)
+            expected = batch.orders_at(tick)
+            for product in PRODUCTS:
+                per_tick = sorted(((order.price, order.quantity) for order in result.get(product) or []), key=lambda order: (order[0] is None, order))
+                if per_tick != expected.get(product, []):
+                    mismatches.append((timestamps[tick], product, per_tick, expected.get(product, [])))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that the vectorized signals match Trader.run tick by tick.')
+    parser.add_argument('directory')
+    parser.add_argument('round', type=int)
+    parser.add_argument('days', type=int, nargs='+')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random positions used for the check')
+    parser.add_argument('--store', default=None, help='feature store directory reused across runs (features.py)')
+    args = parser.parse_args()
+
+    data = MarketData.from_round(args.directory, args.round, args.days)
+    rng = np.random.default_rng(args.seed)
+    limits = np.array([POSITION_LIMITS[product] for product in PRODUCTS])
+    positions = np.round(rng.uniform(-1, 1, (len(data), len(PRODUCTS))) * limits).astype(np.int64)
+
+    mismatches = check_parity(data, positions, store=FeatureStore(args.store) if args.store else None)
+    for mismatch in mismatches[:20]:
+        print(*mismatch)
+    print(f'{len(mismatches)} mismatches over {len(data)} ticks')
+
+
+if __name__ == '__main__':
+    main()
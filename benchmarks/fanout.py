@@ -0,0 +1,76 @@
+"""
+Fan-out benchmark: N Trader variants replayed separately against one Backtester.run_variants replay.
+
+The round data is decoded once and saved as MarketData. Each separate replay then loads and decodes it again, as a new backtest process does,
+while the fan-out decodes every tick once and hands it to all the variants. The variants differ by ema_param, and both paths must give the
+same PnL for every variant.
+
+Usage:
+    python benchmarks/fanout.py DATA_DIR ROUND DAY [DAY ...] [--variants 4] [--out fanout.json]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backtester import Backtester, MarketData
+from trader import LOG_OFF, Trader, TraderParams
+
+
+def variants(n: int) -> list:
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        return [Trader(TraderParams(ema_param=(k + 1) / (n + 1)), log_level=LOG_OFF) for k in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare N separate replays with one fan-out replay of N Trader variants.')
+    parser.add_argument('directory', help='directory with the round data csv files')
+    parser.add_argument('round', type=int)
+    parser.add_argument('days', type=int, nargs='+')
+    parser.add_argument('--variants', type=int, default=4)
+    parser.add_argument('--out', default=None, help='json file receiving the results')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        MarketData.from_round(args.directory, args.round, args.days).save(directory)
+
+        start = time.perf_counter()
+        separate = []
+        for trader in variants(args.variants):
+            data = MarketData.load(directory)
+            separate.append(Backtester(trader, data).run().total_pnl())
+        separate_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        data = MarketData.load(directory)
+        fan_out = [result.total_pnl() for result in Backtester(None, data).run_variants(variants(args.variants))]
+        fan_out_seconds = time.perf_counter() - start
+
+    ticks = len(data) * args.variants
+    report = {
+        'variants': args.variants,
+        'ticks': len(data),
+        'separate_seconds': separate_seconds,
+        'fan_out_seconds': fan_out_seconds,
+        'separate_ticks_per_second': ticks / separate_seconds,
+        'fan_out_ticks_per_second': ticks / fan_out_seconds,
+        'identical': separate == fan_out,
+    }
+    print(f'separate {separate_seconds:.1f}s ({report["separate_ticks_per_second"]:,.0f} variant ticks/s), fan-out {fan_out_seconds:.1f}s ({report["fan_out_ticks_per_second"]:,.0f} variant ticks/s), speedup {separate_seconds / fan_out_seconds:.2f}')
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if not report['identical']:
+        sys.exit(f'the fan-out PnLs {fan_out} differ from the separate ones {separate}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Scaling benchmark: latency of Trader.run as the session grows.
+
+One Trader runs through a long seeded session (benchmarks/states.py). The latency of the WINDOW ticks that follow each checkpoint
+is summarized, and the run fails when the median latency at the last checkpoint is more than --factor times the one at the first,
+which is what a strategy doing O(n) work per tick on its history looks like. The results are written as JSON, tagged with the commit,
+so that runs can be compared across commits.
+
+Usage:
+    python benchmarks/scaling.py [--ticks 1,10000,100000,1000000] [--factor 2] [--out scaling.json]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from states import StateGenerator
+
+from trader import LOG_DELTA, LOG_FULL, LOG_OFF, LOG_SUMMARY, Trader
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WINDOW = 1000 #ticks measured after each checkpoint
+
+
+def commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def measure(checkpoints, seed: int, depth: int, log_level: str, window: int = WINDOW) -> list:
+    """
+    runs one Trader up to the last checkpoint + window ticks and returns the latency summary of the window after every checkpoint
+    """
+    generator = StateGenerator(seed=seed, depth=depth)
+    trader_data = ''
+    latencies = {checkpoint: [] for checkpoint in checkpoints}
+    windows = [(checkpoint, checkpoint + window) for checkpoint in checkpoints]
+    end = max(stop for _, stop in windows)
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        trader = Trader(log_level=log_level)
+        for tick, state in enumerate(generator, start=1):
+            if tick > end:
+                break
+            state.traderData = trader_data
+            start = time.perf_counter_ns()
+            _, _, trader_data = trader.run(state)
+            elapsed = time.perf_counter_ns() - start
+            for checkpoint, stop in windows:
+                if checkpoint <= tick < stop:
+                    latencies[checkpoint].append(elapsed)
+
+    results = []
+    for checkpoint in checkpoints:
+        values = sorted(latencies[checkpoint])
+        results.append({
+            'tick': checkpoint,
+            'p50_us': statistics.median(values) / 1000,
+            'p99_us': values[int(0.99 * (len(values) - 1))] / 1000,
+            'mean_us': statistics.fmean(values) / 1000,
+            'max_us': values[-1] / 1000,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure how the latency of Trader.run grows over a long session.')
+    parser.add_argument('--ticks', default='1,10000,100000,1000000', help='comma-separated checkpoints, in ticks since the start of the session')
+    parser.add_argument('--window', type=int, default=WINDOW, help='ticks measured after each checkpoint')
+    parser.add_argument('--factor', type=float, default=2.0, help='largest allowed ratio between the median latency at the last and at the first checkpoint')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--depth', type=int, default=3, help='price levels on each side of the books')
+    parser.add_argument('--log-level', choices=[LOG_OFF, LOG_SUMMARY, LOG_FULL, LOG_DELTA], default=LOG_FULL)
+    parser.add_argument('--out', default=None, help='json file receiving the results (benchmarks/results/scaling_COMMIT.json by default)')
+    args = parser.parse_args()
+
+    checkpoints = sorted(int(tick) for tick in args.ticks.split(','))
+    start = time.perf_counter()
+    results = measure(checkpoints, args.seed, args.depth, args.log_level, args.window)
+    ratio = results[-1]['p50_us'] / results[0]['p50_us']
+
+    report = {
+        'commit': commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'seed': args.seed,
+        'depth': args.depth,
+        'log_level': args.log_level,
+        'window': args.window,
+        'factor': args.factor,
+        'ratio': ratio,
+        'passed': ratio <= args.factor,
+        'seconds': time.perf_counter() - start,
+        'checkpoints': results,
+    }
+
+    for result in results:
+        print(f'tick {result["tick"]:>9,}  p50 {result["p50_us"]:>8.1f} us  p99 {result["p99_us"]:>8.1f} us  max {result["max_us"]:>9.1f} us')
+    print(f'late/early median latency {ratio:.2f} (limit {args.factor}), {report["seconds"]:.0f}s')
+
+    out = args.out or os.path.join(ROOT, 'benchmarks', 'results', f'scaling_{report["commit"]}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    if not report['passed']:
+        sys.exit(f'Trader.run is {ratio:.2f} times slower at tick {checkpoints[-1]:,} than at tick {checkpoints[0]:,}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Startup benchmark: import time and peak memory of a fresh process importing the submission modules.
+
+Every measurement runs in a new interpreter, as the submission sandbox and every backtest worker do. The bare interpreter and NumPy alone
+are measured as references, and the run fails if importing trader.py loads any of the heavy modules that only the offline tooling may use.
+
+Usage:
+    python benchmarks/startup.py [--repeat 5] [--out startup.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['pandas', 'jsonpickle', 'scipy', 'matplotlib'] #must not be imported by trader.py or datamodel.py
+
+TARGETS = {
+    'python': '',
+    'numpy': 'import numpy',
+    'datamodel': 'import datamodel',
+    'trader': 'import trader',
+}
+
+PROBE = '''
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+{statement}
+seconds = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': seconds,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy_modules': [name for name in {heavy!r} if name in sys.modules],
+}}))
+'''
+
+
+def measure(statement: str, repeat: int) -> dict:
+    """
+    imports in repeat fresh interpreters and returns the median import time and peak RSS
+    """
+    runs = []
+    for _ in range(repeat):
+        code = PROBE.format(root=ROOT, statement=statement, heavy=HEAVY_MODULES)
+        output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout
+        runs.append(json.loads(output.splitlines()[-1]))
+
+    return {
+        'import_ms': statistics.median(run['seconds'] for run in runs) * 1000,
+        'max_rss_mb': statistics.median(run['max_rss_mb'] for run in runs),
+        'heavy_modules': sorted(set().union(*(run['heavy_modules'] for run in runs))),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the import time and peak memory of the submission modules in fresh processes.')
+    parser.add_argument('--repeat', type=int, default=5, help='fresh processes per module, the median is reported')
+    parser.add_argument('--out', default=None, help='json file receiving the results')
+    args = parser.parse_args()
+
+    results = {name: measure(statement, args.repeat) for name, statement in TARGETS.items()}
+
+    for name, result in results.items():
+        print(f'{name:>10} {result["import_ms"]:>9.1f} ms {result["max_rss_mb"]:>8.1f} MB', ' '.join(result['heavy_modules']))
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    heavy = results['trader']['heavy_modules'] + results['datamodel']['heavy_modules']
+    if heavy:
+        sys.exit(f'trader.py imports heavy modules: {", ".join(sorted(set(heavy)))}')
+
+
+if __name__ == '__main__':
+    main()
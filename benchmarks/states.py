@@ -0,0 +1,85 @@
+"""
+Seeded generator of realistic TradingStates for the benchmarks.
+
+Every product follows a random walk around its DEFAULT_PRICES, the gift basket tracking 4 chocolates, 6 strawberries and 1 rose plus a
+mean-reverting premium so that the basket strategy sees a stationary spread. Each tick has a book of the given depth on both sides, a few
+market trades, own trades moving a random-walk position within the limits, and an ORCHIDS ConversionObservation.
+Timestamps restart at 0 every DAY_LENGTH ticks, as when a Trader instance lives through consecutive days.
+"""
+
+import os
+import random
+import sys
+from typing import Iterator
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datamodel import ConversionObservation, Listing, Observation, OrderDepth, Trade, TradingState
+from trader import CHOCOLATE, DEFAULT_PRICES, GIFT_BASKET, ORCHIDS, POSITION_LIMITS, PRODUCTS, ROSES, STRAWBERRIES, SUBMISSION
+
+DAY_LENGTH = 10_000 #ticks per day, timestamps go from 0 to 999,900 by 100
+
+
+class StateGenerator:
+    """
+    Iterator over TradingStates, fully determined by the seed and the parameters.
+    """
+
+    def __init__(self, seed: int = 0, depth: int = 3, market_trades: int = 3, own_trades: bool = True) -> None:
+        self.rng = random.Random(seed)
+        self.depth = depth #price levels on each side of every book
+        self.market_trades = market_trades #largest number of market trades per tick
+        self.own_trades = own_trades
+        self.tick = 0
+        self.prices = {product: float(DEFAULT_PRICES[product]) for product in PRODUCTS}
+        self.premium = 0.0 #deviation of the basket from its components
+        self.position = {product: 0 for product in PRODUCTS}
+        self.sunlight = 2500.0
+        self.humidity = 70.0
+        self.listings = {product: Listing(product, product, 'SEASHELLS') for product in PRODUCTS}
+
+    def __iter__(self) -> Iterator[TradingState]:
+        return self
+
+    def __next__(self) -> TradingState:
+        rng = self.rng
+        timestamp = (self.tick % DAY_LENGTH) * 100
+
+        for product in PRODUCTS:
+            self.prices[product] += rng.gauss(0, 1)
+        self.premium = 0.99 * self.premium + rng.gauss(0, 5)
+        components = 4 * self.prices[CHOCOLATE] + 6 * self.prices[STRAWBERRIES] + self.prices[ROSES]
+        self.prices[GIFT_BASKET] = components + DEFAULT_PRICES[GIFT_BASKET] - (4 * DEFAULT_PRICES[CHOCOLATE] + 6 * DEFAULT_PRICES[STRAWBERRIES] + DEFAULT_PRICES[ROSES]) + self.premium
+        self.sunlight += rng.gauss(0, 2)
+        self.humidity += rng.gauss(0, 0.1)
+
+        order_depths = {}
+        market_trades = {}
+        own_trades = {}
+        for product in PRODUCTS:
+            mid = round(self.prices[product])
+            half_spread = rng.randint(1, 3)
+            #plain dicts, as the exchange sends them
+            buy_orders = {mid - half_spread - level: rng.randint(1, 30) for level in range(self.depth)}
+            sell_orders = {mid + half_spread + level: -rng.randint(1, 30) for level in range(self.depth)}
+            order_depths[product] = OrderDepth(buy_orders, sell_orders)
+
+            market_trades[product] = [
+                Trade(product, mid + rng.choice([-half_spread, half_spread]), rng.randint(1, 10), '', '', timestamp - 100)
+                for _ in range(rng.randint(0, self.market_trades))
+            ]
+
+            if self.own_trades:
+                limit = POSITION_LIMITS[product]
+                quantity = max(-limit, min(limit, self.position[product] + rng.randint(-5, 5))) - self.position[product]
+                self.position[product] += quantity
+                if quantity > 0:
+                    own_trades[product] = [Trade(product, mid + half_spread, quantity, SUBMISSION, '', timestamp - 100)]
+                elif quantity < 0:
+                    own_trades[product] = [Trade(product, mid - half_spread, -quantity, '', SUBMISSION, timestamp - 100)]
+
+        orchids = round(self.prices[ORCHIDS])
+        observations = Observation({}, {ORCHIDS: ConversionObservation(orchids - 1, orchids + 1, 1.0, 9.5, -5.0, self.sunlight, self.humidity)})
+
+        self.tick += 1
+        return TradingState('', timestamp, self.listings, order_depths, own_trades, market_trades, dict(self.position), observations)
@@ -1,7 +1,6 @@
 import json
 from typing import Dict, List
 from json import JSONEncoder
-import jsonpickle
 
 Time = int
 Symbol = str
@@ -11,15 +10,24 @@ UserId = str
 ObservationValue = int
 
 
+#All the classes below use __slots__: no per-instance __dict__, so they are cheaper to build and smaller in memory.
+#to_dict gives the attributes by name (what ProsperityEncoder and TradingState.toJSON write). The compact lists of the Logger lines are
+#built by Logger.compress_* in trader.py from the attributes, since trader.py runs against the exchange datamodel.
+
 class Listing:
+    __slots__ = ("symbol", "product", "denomination")
 
     def __init__(self, symbol: Symbol, product: Product, denomination: Product):
         self.symbol = symbol
         self.product = product
         self.denomination = denomination
+
+    def to_dict(self) -> dict:
+        return {"symbol": self.symbol, "product": self.product, "denomination": self.denomination}
         
                  
 class ConversionObservation:
+    __slots__ = ("bidPrice", "askPrice", "transportFees", "exportTariff", "importTariff", "sunlight", "humidity")
 
     def __init__(self, bidPrice: float, askPrice: float, transportFees: float, exportTariff: float, importTariff: float, sunlight: float, humidity: float):
         self.bidPrice = bidPrice
@@ -29,40 +37,68 @@ class ConversionObservation:
         self.importTariff = importTariff
         self.sunlight = sunlight
         self.humidity = humidity
+
+    def to_dict(self) -> dict:
+        return {
+            "bidPrice": self.bidPrice,
+            "askPrice": self.askPrice,
+            "transportFees": self.transportFees,
+            "exportTariff": self.exportTariff,
+            "importTariff": self.importTariff,
+            "sunlight": self.sunlight,
+            "humidity": self.humidity,
+        }
         
 
 class Observation:
+    __slots__ = ("plainValueObservations", "conversionObservations")
 
     def __init__(self, plainValueObservations: Dict[Product, ObservationValue], conversionObservations: Dict[Product, ConversionObservation]) -> None:
         self.plainValueObservations = plainValueObservations
         self.conversionObservations = conversionObservations
+
+    def to_dict(self) -> dict:
+        return {"plainValueObservations": self.plainValueObservations, "conversionObservations": self.conversionObservations}
         
     def __str__(self) -> str:
+        import jsonpickle #only needed to print observations, so it is not imported with the module
         return "(plainValueObservations: " + jsonpickle.encode(self.plainValueObservations) + ", conversionObservations: " + jsonpickle.encode(self.conversionObservations) + ")"
      
 
 class Order:
+    __slots__ = ("symbol", "price", "quantity")
 
     def __init__(self, symbol: Symbol, price: int, quantity: int) -> None:
         self.symbol = symbol
         self.price = price
         self.quantity = quantity
 
+    def to_dict(self) -> dict:
+        return {"symbol": self.symbol, "price": self.price, "quantity": self.quantity}
+
+
     def __str__(self) -> str:
-        return "(" + self.symbol + ", " + str(self.price) + ", " + str(self.quantity) + ")"
+        return f"({self.symbol}, {self.price}, {self.quantity})"
 
     def __repr__(self) -> str:
-        return "(" + self.symbol + ", " + str(self.price) + ", " + str(self.quantity) + ")"
+        return f"({self.symbol}, {self.price}, {self.quantity})"
     
 
 class OrderDepth:
+    __slots__ = ("buy_orders", "sell_orders")
+
+    def __init__(self, buy_orders: Dict[int, int] = None, sell_orders: Dict[int, int] = None):
+        #plain dicts, as on the exchange; the books can be given directly instead of filled in after
+        self.buy_orders: Dict[int, int] = buy_orders if buy_orders is not None else {}
+        self.sell_orders: Dict[int, int] = sell_orders if sell_orders is not None else {}
+
+    def to_dict(self) -> dict:
+        return {"buy_orders": self.buy_orders, "sell_orders": self.sell_orders}
 
-    def __init__(self):
-        self.buy_orders: Dict[int, int] = {}
-        self.sell_orders: Dict[int, int] = {}
 
 
 class Trade:
+    __slots__ = ("symbol", "price", "quantity", "buyer", "seller", "timestamp")
 
     def __init__(self, symbol: Symbol, price: int, quantity: int, buyer: UserId=None, seller: UserId=None, timestamp: int=0) -> None:
         self.symbol = symbol
@@ -72,14 +108,26 @@ class Trade:
         self.seller = seller
         self.timestamp = timestamp
 
+    def to_dict(self) -> dict:
+        return {
+            "symbol": self.symbol,
+            "price": self.price,
+            "quantity": self.quantity,
+            "buyer": self.buyer,
+            "seller": self.seller,
+            "timestamp": self.timestamp,
+        }
+
+
     def __str__(self) -> str:
-        return "(" + self.symbol + ", " + self.buyer + " << " + self.seller + ", " + str(self.price) + ", " + str(self.quantity) + ", " + str(self.timestamp) + ")"
+        return f"({self.symbol}, {self.buyer} << {self.seller}, {self.price}, {self.quantity}, {self.timestamp})"
 
     def __repr__(self) -> str:
-        return "(" + self.symbol + ", " + self.buyer + " << " + self.seller + ", " + str(self.price) + ", " + str(self.quantity) + ", " + str(self.timestamp) + ")"
+        return f"({self.symbol}, {self.buyer} << {self.seller}, {self.price}, {self.quantity}, {self.timestamp})"
 
 
 class TradingState(object):
+    __slots__ = ("traderData", "timestamp", "listings", "order_depths", "own_trades", "market_trades", "position", "observations")
 
     def __init__(self,
                  traderData: str,
@@ -99,11 +147,26 @@ class TradingState(object):
         self.position = position
         self.observations = observations
         
+    def to_dict(self) -> dict:
+        return {
+            "traderData": self.traderData,
+            "timestamp": self.timestamp,
+            "listings": self.listings,
+            "order_depths": self.order_depths,
+            "own_trades": self.own_trades,
+            "market_trades": self.market_trades,
+            "position": self.position,
+            "observations": self.observations,
+        }
+
     def toJSON(self):
-        return json.dumps(self, default=lambda o: o.__dict__, sort_keys=True)
+        return json.dumps(self, cls=ProsperityEncoder, sort_keys=True)
 
     
 class ProsperityEncoder(JSONEncoder):
 
         def default(self, o):
+            to_dict = getattr(o, "to_dict", None)
+            if to_dict is not None:
+                return to_dict()
             return o.__dict__
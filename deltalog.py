@@ -0,0 +1,280 @@
+"""
+Decoder of the delta logs printed by Trader(log_level=LOG_DELTA).
+
+Every tick is one DeltaEncoder record (trader.py), base85-encoded on a line starting with 'D' and continued on lines starting with '+' when
+it is longer than the line budget. A record only holds what changed since the previous one, so DeltaDecoder keeps the books, positions,
+observations and string table of the previous tick and applies each record to them, giving back the full view of every tick: the
+TradingState (without its traderData, which is not logged), the orders, the conversions and the logs. Other lines (e.g. what the trader
+prints outside of its logger) are skipped, and so are the records before the first keyframe of a log that was cut.
+
+Usage:
+    python deltalog.py LOG_FILE                 #number of ticks and bytes per tick
+    python deltalog.py LOG_FILE --json          #one untruncated line per tick, in the layout of the LOG_FULL lines
+"""
+
+import argparse
+import base64
+from typing import Any, Dict, Iterable, Iterator, List
+
+from datamodel import ConversionObservation, Listing, Observation, Order, OrderDepth, Trade, TradingState
+from trader import CONVERSION_FIELDS, DELTA_NEXT, DELTA_START, DELTA_STRINGS, DOUBLE, LOG_FULL, VALUE_FLOAT, VALUE_NONE, Logger
+
+
+class DeltaTick:
+    """
+    full view of one tick, rebuilt from the delta log
+    """
+
+    def __init__(self, state: TradingState, orders: Dict[str, List[Order]], conversions: int, logs: str) -> None:
+        self.state = state
+        self.orders = orders
+        self.conversions = conversions
+        self.logs = logs
+
+
+class DeltaDecoder:
+
+    def __init__(self) -> None:
+        self.started = False #False until the first keyframe
+        self.buffer = b''
+        self.offset = 0 #next varint
+        self.blob = 0 #next byte of the blob
+        self.reset()
+
+    def reset(self) -> None:
+        self.strings = []
+        self.timestamp = 0
+        self.listings = {}
+        self.symbols = []
+        self.books = {} #symbol -> (buy levels, sell levels)
+        self.position = {}
+        self.plain = {}
+        self.conversion = {} #product -> list of its CONVERSION_FIELDS
+
+    def uint(self) -> int:
+        n = shift = 0
+        while True:
+            byte = self.buffer[self.offset]
+            self.offset += 1
+            n |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return n
+            shift += 7
+
+    def zigzag(self, n: int) -> int:
+        return n >> 1 if not n & 1 else -(n >> 1) - 1
+
+    def signed(self) -> int:
+        return self.zigzag(self.uint())
+
+    def price(self, last: int) -> tuple:
+        """
+        price and new last price of the section, see DeltaEncoder.price
+        """
+        value = self.value()
+        if value is None or isinstance(value, float):
+            return value, last
+        return last + value, last + value
+
+    def value(self) -> Any:
+        tag = self.uint()
+        if tag == VALUE_NONE:
+            return None
+        if tag == VALUE_FLOAT:
+            value, = DOUBLE.unpack_from(self.buffer, self.blob)
+            self.blob += DOUBLE.size
+            return value
+        return self.zigzag(tag >> 2)
+
+    def string(self) -> str:
+        n = self.uint()
+        if n == 0:
+            return None
+        if not n & 1:
+            return self.strings[(n >> 1) - 1]
+        end = self.blob + (n >> 1)
+        value = self.buffer[self.blob:end].decode()
+        self.blob = end
+        if len(self.strings) < DELTA_STRINGS:
+            self.strings.append(value)
+        return value
+
+    def apply(self, current: dict, changes: Iterable) -> None:
+        for key, value in changes:
+            if value is None:
+                current.pop(key, None)
+            else:
+                current[key] = value
+
+    def trades(self, timestamp: int) -> Dict[str, List[Trade]]:
+        trades = {}
+        last = 0
+        for _ in range(self.uint()):
+            symbol = self.string()
+            price, last = self.price(last)
+            quantity, buyer, seller = self.value(), self.string(), self.string()
+            trades.setdefault(symbol, []).append(Trade(symbol, price, quantity, buyer, seller, timestamp + self.signed()))
+        return trades
+
+    def order_depth(self, symbol: str) -> OrderDepth:
+        """
+        copy of the book of symbol, each side from the best to the worst level as the exchange sends it
+        """
+        bids, asks = self.books[symbol]
+        return OrderDepth(dict(sorted(bids.items(), reverse=True)), dict(sorted(asks.items())))
+
+    def decode(self, record: bytes) -> DeltaTick:
+        """
+        applies one record and returns the view of its tick, or None for the records before the first keyframe
+        """
+        self.buffer, self.offset = record, 0
+        size = self.uint()
+        self.blob, self.offset = self.offset, self.offset + size
+        keyframe = self.uint()
+        if keyframe:
+            self.reset()
+            self.started = True
+        elif not self.started:
+            return None
+        self.timestamp += self.signed()
+        timestamp = self.timestamp
+
+        n = self.uint()
+        if n:
+            self.listings = {}
+            for _ in range(n - 1):
+                symbol, product, denomination = self.string(), self.string(), self.string()
+                self.listings[symbol] = Listing(symbol, product, denomination)
+
+        n = self.uint()
+        if n:
+            self.symbols = [self.string() for _ in range(n - 1)]
+            self.books = {symbol: ({}, {}) for symbol in self.symbols} #written again in full
+
+        for _ in range(self.uint()):
+            key = self.uint()
+            sides = self.books[self.symbols[key >> 2]]
+            side = key >> 1 & 1
+            levels = sides[side]
+            if key & 1: #whole side, best level first
+                n = self.uint()
+                price = (max(levels) if not side else min(levels)) if levels else 0 #previous best
+                prices = []
+                if n:
+                    price += self.signed()
+                    prices.append(price)
+                for _ in range(n - 1):
+                    price += self.uint() if side else -self.uint()
+                    prices.append(price)
+                levels.clear()
+                for price in prices:
+                    levels[price] = self.signed()
+                continue
+            price = 0
+            changes = []
+            for _ in range(self.uint()):
+                price += self.signed()
+                volume = self.uint()
+                changes.append((price, None if volume == 0 else self.zigzag(volume - 1)))
+            self.apply(levels, changes)
+
+        self.apply(self.position, [(self.string(), self.value()) for _ in range(self.uint())])
+        own_trades = self.trades(timestamp)
+        market_trades = self.trades(timestamp)
+
+        orders = {}
+        last = 0
+        for _ in range(self.uint()):
+            symbol = self.string()
+            price, last = self.price(last)
+            quantity = self.value()
+            orders.setdefault(symbol, []).append(Order(symbol, price, quantity))
+        conversions = self.value()
+
+        self.apply(self.plain, [(self.string(), self.value()) for _ in range(self.uint())])
+
+        for _ in range(self.uint()):
+            product, mask = self.string(), self.uint()
+            if mask >> len(CONVERSION_FIELDS) & 1:
+                self.conversion.pop(product, None)
+                continue
+            values = self.conversion.setdefault(product, [None] * len(CONVERSION_FIELDS))
+            for j in range(len(CONVERSION_FIELDS)):
+                if mask >> j & 1:
+                    values[j] = self.value()
+
+        logs = "\n".join(self.string() for _ in range(self.uint()))
+
+        #fresh copies, so the views handed out are not modified by the next records
+        state = TradingState(
+            traderData='',
+            timestamp=timestamp,
+            listings=dict(self.listings),
+            order_depths={symbol: self.order_depth(symbol) for symbol in self.symbols},
+            own_trades=own_trades,
+            market_trades=market_trades,
+            position=dict(self.position),
+            observations=Observation(dict(self.plain), {product: ConversionObservation(*values) for product, values in self.conversion.items()}),
+        )
+        return DeltaTick(state, orders, conversions, logs)
+
+
+def records(lines: Iterable[str]) -> Iterator[bytes]:
+    """
+    binary records of the delta lines, their continuation lines joined (a continuation without its first line is skipped)
+    """
+    text = None
+    for line in lines:
+        line = line.rstrip('\n')
+        if line.startswith(DELTA_START):
+            if text is not None:
+                yield base64.b85decode(text)
+            text = line[1:]
+        elif line.startswith(DELTA_NEXT) and text is not None:
+            text += line[1:]
+    if text is not None:
+        yield base64.b85decode(text)
+
+
+def read_log(lines: Iterable[str]) -> Iterator[DeltaTick]:
+    """
+    full view of every tick of a delta log, from its first keyframe on
+    """
+    decoder = DeltaDecoder()
+    for record in records(lines):
+        tick = decoder.decode(record)
+        if tick is not None:
+            yield tick
+
+
+def to_json(tick: DeltaTick, logger: Logger) -> str:
+    """
+    the tick in the layout of the LOG_FULL lines, without truncation and with empty traderData
+    """
+    state = tick.state
+    state_json = logger.to_json(logger.compress_state(state))[1:-1]
+    return f'[[{state.timestamp},"",{logger.compress_listings(state.listings)},{state_json}],{logger.to_json(logger.compress_orders(tick.orders))},{tick.conversions},"",{logger.to_json(tick.logs)}]'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Decode a delta log printed by Trader(log_level=LOG_DELTA).')
+    parser.add_argument('log', help='file with the stdout of the trader')
+    parser.add_argument('--json', action='store_true', help='print the full view of every tick as one JSON line')
+    args = parser.parse_args()
+
+    with open(args.log) as f:
+        lines = f.readlines()
+
+    if args.json:
+        logger = Logger(LOG_FULL)
+        for tick in read_log(lines):
+            print(to_json(tick, logger))
+        return
+
+    ticks = sum(1 for _ in read_log(lines))
+    size = sum(len(line) for line in lines if line.startswith((DELTA_START, DELTA_NEXT)))
+    print(f'{ticks} ticks, {size:,} bytes of delta lines, {size / max(ticks, 1):.0f} bytes per tick')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Memoized store of the derived series computed from MarketData (mids, EMAs, spreads, rolling moments...), shared by many runs on the same days.
+
+Every array is keyed by (dataset, feature, parameters): the dataset is the fingerprint of the MarketData, so a cached array is never served for
+other data, and the parameters are the ones the feature depends on (e.g. the window of a rolling stdev), so variants sharing them share the array.
+It is computed once, saved as a .npy file and handed out as a read-only memory-mapped view, to later calls as well as to other processes.
+The directory is capped at max_bytes: the least recently used files (by modification time, refreshed at every hit) are deleted first.
+
+Usage:
+    python features.py STORE_DIR                #list the cached arrays
+    python features.py STORE_DIR --clear
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from typing import Any, Callable, Dict
+
+import numpy as np
+
+MAX_BYTES = 1 << 30 #default size cap of a store
+
+
+class FeatureStore:
+
+    def __init__(self, directory: str, max_bytes: int = MAX_BYTES) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.views = {} #file name -> array already opened by this process
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def file_name(self, dataset: str, feature: str, params: Dict[str, Any]) -> str:
+        key = json.dumps([dataset, feature, params], sort_keys=True, default=str)
+        return f'{feature}_{hashlib.sha1(key.encode()).hexdigest()[:16]}.npy'
+
+    def get(self, dataset: str, feature: str, params: Dict[str, Any], compute: Callable[[], np.ndarray]) -> np.ndarray:
+        """
+        read-only view of the feature for this dataset and these parameters, computed by compute() and saved if it is not in the store yet
+        """
+        name = self.file_name(dataset, feature, params)
+        path = os.path.join(self.directory, name)
+        if name in self.views and os.path.exists(path):
+            self.hits += 1
+            os.utime(path)
+            return self.views[name]
+
+        try:
+            view = np.load(path, mmap_mode='r')
+            self.hits += 1
+            os.utime(path)
+        except (OSError, ValueError): #missing, or being replaced by another process
+            self.misses += 1
+            values = np.ascontiguousarray(compute())
+            temporary = f'{path}.{os.getpid()}.tmp'
+            with open(temporary, 'wb') as f:
+                np.save(f, values)
+            os.replace(temporary, path) #atomic, readers see either no file or a complete one
+            self.evict(keep=name)
+            view = np.load(path, mmap_mode='r') if os.path.exists(path) else values
+
+        if not isinstance(view, np.memmap):
+            view.flags.writeable = False
+        self.views[name] = view
+        return view
+
+    def entries(self) -> list:
+        """
+        (name, bytes, modification time) of the cached arrays, least recently used first
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npy'):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError: #evicted by another process
+                    continue
+                entries.append((name, stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def evict(self, keep: str = None) -> None:
+        """
+        deletes the least recently used arrays until the store fits in max_bytes (never the one just written)
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for name, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            self.views.pop(name, None) #views already handed out stay valid, the mapping outlives the file
+            total -= size
+
+    def clear(self) -> None:
+        for name, _, _ in self.entries():
+            os.remove(os.path.join(self.directory, name))
+        self.views = {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='List or clear a feature store.')
+    parser.add_argument('directory')
+    parser.add_argument('--clear', action='store_true')
+    args = parser.parse_args()
+
+    store = FeatureStore(args.directory)
+    if args.clear:
+        store.clear()
+    entries = store.entries()
+    for name, size, _ in reversed(entries):
+        print(f'{size / 1e6:>10.2f} MB  {name}')
+    print(f'{len(entries)} arrays, {sum(size for _, size, _ in entries) / 1e6:.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
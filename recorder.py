@@ -0,0 +1,342 @@
+"""
+Columnar recorder of every TradingState seen by Trader.run and of the orders it emitted, for post-mortems.
+
+Trader(recorder=Recorder('recordings/run_1')) appends each tick to a fixed-width binary store: one raw little-endian file per column, so a
+recording is read back memory-mapped, without parsing. A new session (sub-directory session_N) starts whenever the timestamp goes back, i.e.
+at every new day. Rows are buffered in memory and appended to the files every `chunk` ticks; meta.json is rewritten after every append and
+only the ticks it counts are read back, so a recording cut short by a crash stays readable.
+
+Per tick t (T ticks) and product p (P products, fixed at the first tick of the session):
+    timestamps, conversions: int64 [T]
+    bid_prices, bid_volumes, ask_prices, ask_volumes: int64 [T, P, levels], best level first, as in MarketData (books deeper than levels are cut)
+    positions: int64 [T, P]
+    observations: float64 [T, C, 7] for the C conversion products seen at the first tick (NaN when missing)
+    trader_data_end: int64 [T], end of the traderData of each tick in trader_data (uint8)
+Rows (one per market trade, own trade or order), the tick they belong to first:
+    market_*, own_*: tick, product, quantity, buyer, seller, timestamp int64 and price float64
+    order_*: tick, product, price, quantity int64
+
+Usage:
+    python recorder.py RECORDING_DIR            #summary of every session
+"""
+
+import argparse
+import json
+import os
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+from backtester import LEVELS, OBSERVATION_FIELDS, MarketData
+from datamodel import Listing, Order, Trade, TradingState
+from trader import PRODUCTS
+
+#column -> (dtype, number of values per tick or per row, as a function of the number of products and conversion products)
+COLUMNS = {
+    'timestamps': ('<i8', lambda P, C, L: ()),
+    'conversions': ('<i8', lambda P, C, L: ()),
+    'bid_prices': ('<i8', lambda P, C, L: (P, L)),
+    'bid_volumes': ('<i8', lambda P, C, L: (P, L)),
+    'ask_prices': ('<i8', lambda P, C, L: (P, L)),
+    'ask_volumes': ('<i8', lambda P, C, L: (P, L)),
+    'positions': ('<i8', lambda P, C, L: (P,)),
+    'observations': ('<f8', lambda P, C, L: (C, len(OBSERVATION_FIELDS))),
+    'trader_data_end': ('<i8', lambda P, C, L: ()),
+    'trader_data': ('u1', lambda P, C, L: ()),
+}
+for prefix in ('market', 'own'):
+    COLUMNS.update({
+        f'{prefix}_tick': ('<i8', lambda P, C, L: ()),
+        f'{prefix}_product': ('<i8', lambda P, C, L: ()),
+        f'{prefix}_price': ('<f8', lambda P, C, L: ()),
+        f'{prefix}_quantity': ('<i8', lambda P, C, L: ()),
+        f'{prefix}_buyer': ('<i8', lambda P, C, L: ()),
+        f'{prefix}_seller': ('<i8', lambda P, C, L: ()),
+        f'{prefix}_timestamp': ('<i8', lambda P, C, L: ()),
+    })
+COLUMNS.update({
+    'order_tick': ('<i8', lambda P, C, L: ()),
+    'order_product': ('<i8', lambda P, C, L: ()),
+    'order_price': ('<i8', lambda P, C, L: ()),
+    'order_quantity': ('<i8', lambda P, C, L: ()),
+})
+
+
+class Recorder:
+    """
+    Hook called by Trader.run at the end of every tick, see the module docstring for the layout.
+    The last, partial chunk of rows is only written by close() (or flush()): Backtester.run and run_variants close the recorders of their
+    traders when the replay ends, elsewhere use the recorder as a context manager (with Recorder(directory) as recorder: ...).
+    """
+
+    def __init__(self, directory: str, levels: int = LEVELS, chunk: int = 1000) -> None:
+        self.directory = directory
+        self.levels = levels
+        self.chunk = chunk #ticks buffered before they are appended to the files
+        self.session = -1
+        self.session_directory = None
+        self.last_timestamp = None
+
+    def start_session(self, state: TradingState) -> None:
+        self.flush()
+        self.session += 1
+        self.session_directory = os.path.join(self.directory, f'session_{self.session}')
+        os.makedirs(self.session_directory, exist_ok=True)
+        for name in COLUMNS: #a new session never appends to the files of an older recording
+            open(os.path.join(self.session_directory, name + '.bin'), 'wb').close()
+
+        seen = set(state.order_depths) | set(state.position)
+        self.products = [product for product in PRODUCTS if product in seen or product in state.listings] + sorted(seen - set(PRODUCTS))
+        self.product_index = {product: i for i, product in enumerate(self.products)}
+        self.conversion_products = sorted(state.observations.conversionObservations)
+        self.names = ['']
+        self.name_index = {'': 0}
+        self.ticks = 0
+        self.trader_data_length = 0
+        self.row_counts = {'market': 0, 'own': 0, 'order': 0}
+        self.rows = {name: [] for name in COLUMNS}
+
+    def name(self, name: str) -> int:
+        if name is None:
+            name = ''
+        i = self.name_index.get(name)
+        if i is None:
+            i = self.name_index[name] = len(self.names)
+            self.names.append(name)
+        return i
+
+    def record(self, state: TradingState, orders: Dict[str, List[Order]], conversions: int, trader_data: str) -> None:
+        if self.last_timestamp is None or state.timestamp < self.last_timestamp:
+            self.start_session(state)
+        self.last_timestamp = state.timestamp
+
+        rows = self.rows
+        tick = self.ticks
+        levels = self.levels
+        product_index = self.product_index
+
+        rows['timestamps'].append(state.timestamp)
+        rows['conversions'].append(conversions or 0)
+        for product in self.products:
+            order_depth = state.order_depths.get(product)
+            for side, prices_column, volumes_column in ((0, 'bid_prices', 'bid_volumes'), (1, 'ask_prices', 'ask_volumes')):
+                prices = volumes = ()
+                if order_depth is not None:
+                    book = order_depth.sell_orders if side else order_depth.buy_orders
+                    prices = sorted(book, reverse=not side)[:levels] #plain dicts in the exchange datamodel
+                    volumes = [abs(book[price]) for price in prices]
+                padding = [0] * (levels - len(prices))
+                rows[prices_column] += prices
+                rows[prices_column] += padding
+                rows[volumes_column] += volumes
+                rows[volumes_column] += padding
+        rows['positions'] += [state.position.get(product, 0) for product in self.products]
+
+        observations = state.observations.conversionObservations
+        for product in self.conversion_products:
+            observation = observations.get(product)
+            rows['observations'] += [getattr(observation, field) for field in OBSERVATION_FIELDS] if observation is not None else [np.nan] * len(OBSERVATION_FIELDS)
+
+        encoded = (state.traderData or '').encode()
+        self.trader_data_length += len(encoded)
+        rows['trader_data'] += encoded
+        rows['trader_data_end'].append(self.trader_data_length)
+
+        for prefix, trades in (('market', state.market_trades), ('own', state.own_trades)):
+            for product_trades in trades.values():
+                for trade in product_trades:
+                    p = product_index.get(trade.symbol)
+                    if p is None:
+                        continue
+                    rows[prefix + '_tick'].append(tick)
+                    rows[prefix + '_product'].append(p)
+                    rows[prefix + '_price'].append(trade.price)
+                    rows[prefix + '_quantity'].append(trade.quantity)
+                    rows[prefix + '_buyer'].append(self.name(trade.buyer))
+                    rows[prefix + '_seller'].append(self.name(trade.seller))
+                    rows[prefix + '_timestamp'].append(trade.timestamp)
+
+        for product_orders in orders.values():
+            for order in product_orders:
+                p = product_index.get(order.symbol)
+                if p is None:
+                    continue
+                rows['order_tick'].append(tick)
+                rows['order_product'].append(p)
+                rows['order_price'].append(order.price)
+                rows['order_quantity'].append(order.quantity)
+
+        self.ticks += 1
+        if self.ticks % self.chunk == 0:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        appends the buffered rows to the column files and rewrites meta.json
+        """
+        if self.session_directory is None:
+            return
+        for prefix in self.row_counts:
+            self.row_counts[prefix] += len(self.rows[prefix + '_tick'])
+        for name, values in self.rows.items():
+            if values:
+                with open(os.path.join(self.session_directory, name + '.bin'), 'ab') as f:
+                    np.asarray(values, dtype=COLUMNS[name][0]).tofile(f)
+                values.clear()
+
+        meta = {
+            'ticks': self.ticks,
+            'products': self.products,
+            'conversion_products': self.conversion_products,
+            'names': self.names,
+            'levels': self.levels,
+            'rows': self.row_counts,
+            'trader_data_length': self.trader_data_length,
+        }
+        path = os.path.join(self.session_directory, 'meta.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(path + '.tmp', path)
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self) -> 'Recorder':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class Recording:
+    """
+    One session written by Recorder, every column memory-mapped read-only.
+    """
+
+    def __init__(self, directory: str) -> None:
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        self.directory = directory
+        self.products = meta['products']
+        self.conversion_products = meta['conversion_products']
+        self.names = meta['names']
+        self.levels = meta['levels']
+        self.ticks = meta['ticks']
+
+        shapes = (len(self.products), len(self.conversion_products), self.levels)
+        counts = {'trader_data': meta['trader_data_length']}
+        for prefix, rows in meta['rows'].items():
+            counts.update({name: rows for name in COLUMNS if name.startswith(prefix + '_')})
+        for name, (dtype, shape) in COLUMNS.items():
+            shape = (counts.get(name, self.ticks),) + shape(*shapes)
+            path = os.path.join(directory, name + '.bin')
+            if np.prod(shape) == 0:
+                column = np.zeros(shape, dtype=dtype)
+            else:
+                column = np.memmap(path, dtype=dtype, mode='r', shape=shape)
+            setattr(self, name, column)
+
+    @staticmethod
+    def sessions(directory: str) -> List['Recording']:
+        names = sorted((name for name in os.listdir(directory) if name.startswith('session_')), key=lambda name: int(name.split('_')[1]))
+        return [Recording(os.path.join(directory, name)) for name in names]
+
+    def __len__(self) -> int:
+        return self.ticks
+
+    def offsets(self, prefix: str) -> np.ndarray:
+        """
+        start of the rows of every tick in the {prefix}_* columns (plus the total at the end), as MarketData.trade_offsets
+        """
+        offsets = np.zeros(self.ticks + 1, dtype=np.int64)
+        np.cumsum(np.bincount(getattr(self, prefix + '_tick'), minlength=self.ticks), out=offsets[1:])
+        return offsets
+
+    def market_data(self, day: int = 0) -> MarketData:
+        """
+        the recorded books, market trades and observations as MarketData, to be replayed by the Backtester or screened by batch.py
+        """
+        return MarketData(
+            self.products, self.names, self.conversion_products,
+            days=np.full(self.ticks, day, dtype=np.int64),
+            timestamps=self.timestamps,
+            bid_prices=self.bid_prices,
+            bid_volumes=self.bid_volumes,
+            ask_prices=self.ask_prices,
+            ask_volumes=self.ask_volumes,
+            observations=self.observations,
+            trade_offsets=self.offsets('market'),
+            trade_product=self.market_product,
+            trade_price=self.market_price,
+            trade_quantity=self.market_quantity,
+            trade_buyer=self.market_buyer,
+            trade_seller=self.market_seller,
+        )
+
+    def trades(self, prefix: str) -> List[Dict[str, List[Trade]]]:
+        """
+        the market (prefix 'market') or own ('own') trades of every tick, by product
+        """
+        offsets = self.offsets(prefix).tolist()
+        rows = list(zip(*(getattr(self, f'{prefix}_{name}').tolist() for name in ('product', 'price', 'quantity', 'buyer', 'seller', 'timestamp'))))
+        trades = []
+        for tick in range(self.ticks):
+            by_product = {}
+            for p, price, quantity, buyer, seller, timestamp in rows[offsets[tick]:offsets[tick + 1]]:
+                product = self.products[p]
+                price = int(price) if price.is_integer() else price
+                by_product.setdefault(product, []).append(Trade(product, price, quantity, self.names[buyer], self.names[seller], timestamp))
+            trades.append(by_product)
+        return trades
+
+    def states(self) -> Iterator[TradingState]:
+        """
+        rebuilds the TradingStates exactly as Trader.run saw them (books cut to the recorded levels), tick by tick
+        """
+        decoded = self.market_data().decode()
+        listings = {product: Listing(product, product, 'SEASHELLS') for product in self.products}
+        market_trades = self.trades('market')
+        own_trades = self.trades('own')
+        positions = self.positions.tolist()
+        timestamps = self.timestamps.tolist()
+        ends = [0] + self.trader_data_end.tolist()
+        trader_data = self.trader_data.tobytes()
+
+        for tick, (order_depths, _, observations, _) in enumerate(decoded):
+            yield TradingState(
+                trader_data[ends[tick]:ends[tick + 1]].decode(),
+                timestamps[tick],
+                listings,
+                order_depths,
+                own_trades[tick],
+                market_trades[tick],
+                dict(zip(self.products, positions[tick])),
+                observations,
+            )
+
+    def orders(self, tick: int) -> Dict[str, List[Order]]:
+        """
+        the orders emitted by the trader at the given tick
+        """
+        offsets = self.offsets('order')
+        orders = {}
+        for i in range(offsets[tick], offsets[tick + 1]):
+            product = self.products[self.order_product[i]]
+            orders.setdefault(product, []).append(Order(product, int(self.order_price[i]), int(self.order_quantity[i])))
+        return orders
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize the sessions of a recording written by Recorder.')
+    parser.add_argument('directory')
+    args = parser.parse_args()
+
+    for recording in Recording.sessions(args.directory):
+        print(
+            f'{os.path.basename(recording.directory)}: {len(recording):,} ticks, timestamps {recording.timestamps[0]}-{recording.timestamps[-1]}, '
+            f'{len(recording.market_tick):,} market trades, {len(recording.own_tick):,} own trades, {len(recording.order_tick):,} orders'
+        )
+
+
+if __name__ == '__main__':
+    main()
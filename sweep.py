@@ -0,0 +1,180 @@
+"""
+Parameter sweep: backtests many TraderParams variants on the same market data across a pool of worker processes.
+
+The round data is decoded once and saved as MarketData (.npy columns). Every worker memory-maps the same read-only files, so the data is
+shared through the page cache instead of being parsed or copied per process, and replays groups of variants at once, each tick being
+decoded once for the whole group (Backtester.run_variants). The ticks are decoded a chunk at a time as the replay reaches them
+(MarketData.ticks) and dropped after it, so no worker holds a decoded copy of the whole data. Each finished run adds one row (the parameters, the total
+and per-product PnL, the rejected order batches) to a single result table written as CSV.
+
+Usage:
+    python sweep.py DATA_DIR ROUND DAY [DAY ...] --params rolling_window=100,200 spread_threshold=1.5,1.96 --processes 8
+    python sweep.py DATA_DIR ROUND DAY [DAY ...] --random 100 --params ema_param=0.1:0.9 coco_threshold=1:3
+"""
+
+import argparse
+import contextlib
+import csv
+import glob
+import hashlib
+import itertools
+import math
+import multiprocessing
+import os
+import random
+import time
+from typing import Any, Dict, List
+
+from backtester import Backtester, MarketData
+from features import FeatureStore
+from trader import LOG_OFF, Trader, TraderParams
+
+_data = None #MarketData of the worker process, memory-mapped once by init_worker
+_store = None #FeatureStore shared by the workers, serving the series every run needs (the mid prices the PnL is marked to)
+
+
+def grid(values: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """
+    every combination of the given values, e.g. grid({'rolling_window': [100, 200], 'multiplier': [2, 3]}) gives 4 parameter sets
+    """
+    names = list(values)
+    return [dict(zip(names, combination)) for combination in itertools.product(*(values[name] for name in names))]
+
+
+def random_search(ranges: Dict[str, Any], n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    n random parameter sets: a (low, high) range is sampled uniformly (as int if both bounds are int), a list is sampled as a choice
+    """
+    rng = random.Random(seed)
+    sets = []
+    for _ in range(n):
+        params = {}
+        for name, values in ranges.items():
+            if isinstance(values, list):
+                params[name] = rng.choice(values)
+            elif isinstance(values[0], int) and isinstance(values[1], int):
+                params[name] = rng.randint(values[0], values[1])
+            else:
+                params[name] = rng.uniform(values[0], values[1])
+        sets.append(params)
+    return sets
+
+
+def cache_name(directory: str, round_number: int, days: List[int]) -> str:
+    """
+    name of the saved MarketData of these days: the round, the days and a hash of the resolved path, size and modification time of their
+    csv files, so that another data directory or an edited file is decoded again instead of reusing stale arrays
+    """
+    digest = hashlib.sha1()
+    for day in days:
+        for path in sorted(glob.glob(os.path.join(directory, f'*_round_{round_number}_day_{day}*.csv'))):
+            stat = os.stat(path)
+            digest.update(f'{os.path.realpath(path)};{stat.st_size};{stat.st_mtime_ns}\n'.encode())
+    return f'round_{round_number}_days_{"_".join(map(str, days))}_{digest.hexdigest()[:12]}'
+
+
+def init_worker(data_directory: str) -> None:
+    global _data, _store
+    _data = MarketData.load(data_directory, mmap_mode='r')
+    _store = FeatureStore(os.path.join(data_directory, 'features'))
+
+
+def run_group(parameter_sets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    backtests a group of parameter sets in a single replay of the data (Backtester.run_variants), one row per parameter set
+    """
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        traders = [Trader(TraderParams(**params), log_level=LOG_OFF, persist=False) for params in parameter_sets] #the traderData is never read back in process
+    results = Backtester(None, _data, store=_store).run_variants(traders)
+    seconds = (time.perf_counter() - start) / len(parameter_sets)
+
+    rows = []
+    for params, result in zip(parameter_sets, results):
+        row = dict(params)
+        row['total_pnl'] = result.total_pnl()
+        for product, pnl in result.final_pnl().items():
+            row['pnl_' + product] = pnl
+        row['rejected'] = len(result.rejected)
+        row['seconds'] = seconds
+        rows.append(row)
+    return rows
+
+
+def sweep(data_directory: str, parameter_sets: List[Dict[str, Any]], processes: int = None, group: int = None) -> List[Dict[str, Any]]:
+    """
+    backtests every parameter set on the MarketData saved in data_directory and returns one row per run, sorted by total PnL.
+    The parameter sets are replayed group at a time (by default, groups sized to give each process about 4 of them).
+    """
+    workers = processes or os.cpu_count() or 1
+    if group is None:
+        group = max(1, math.ceil(len(parameter_sets) / (4 * workers)))
+    groups = [parameter_sets[i:i + group] for i in range(0, len(parameter_sets), group)]
+
+    if processes == 1:
+        init_worker(data_directory)
+        rows = [row for parameter_group in groups for row in run_group(parameter_group)]
+    else:
+        with multiprocessing.Pool(processes, initializer=init_worker, initargs=(data_directory,)) as pool:
+            rows = [row for group_rows in pool.imap_unordered(run_group, groups) for row in group_rows]
+    return sorted(rows, key=lambda row: row['total_pnl'], reverse=True)
+
+
+def write_table(rows: List[Dict[str, Any]], path: str) -> None:
+    columns = []
+    for row in rows:
+        columns += [column for column in row if column not in columns]
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def parse_value(value: str):
+    for kind in (int, float):
+        try:
+            return kind(value)
+        except ValueError:
+            pass
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backtest a grid or a random sample of TraderParams in parallel.')
+    parser.add_argument('directory', help='directory with the round data csv files')
+    parser.add_argument('round', type=int)
+    parser.add_argument('days', type=int, nargs='+')
+    parser.add_argument('--params', nargs='+', default=[], metavar='NAME=VALUES', help='NAME=V1,V2,... values to combine in a grid, or to sample from with --random, which also accepts NAME=LOW:HIGH ranges')
+    parser.add_argument('--random', type=int, default=0, metavar='N', help='sample N random parameter sets instead of the full grid')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (all the cores by default)')
+    parser.add_argument('--group', type=int, default=None, help='parameter sets replayed together by a worker, sharing each decoded tick')
+    parser.add_argument('--cache', default='.sweep_data', help='where the decoded market data is saved, one directory per set of csv files')
+    parser.add_argument('--out', default='sweep_results.csv')
+    args = parser.parse_args()
+
+    data_directory = os.path.join(args.cache, cache_name(args.directory, args.round, args.days))
+    if not os.path.exists(os.path.join(data_directory, 'meta.json')):
+        MarketData.from_round(args.directory, args.round, args.days).save(data_directory)
+
+    if args.random:
+        ranges = {}
+        for item in args.params:
+            name, values = item.split('=')
+            ranges[name] = tuple(parse_value(value) for value in values.split(':')) if ':' in values else [parse_value(value) for value in values.split(',')]
+        parameter_sets = random_search(ranges, args.random, args.seed)
+    else:
+        parameter_sets = grid({name: [parse_value(value) for value in values.split(',')] for name, values in (item.split('=') for item in args.params)})
+
+    start = time.perf_counter()
+    rows = sweep(data_directory, parameter_sets, args.processes, args.group)
+    elapsed = time.perf_counter() - start
+    write_table(rows, args.out)
+
+    for row in rows[:10]:
+        print(f'{row["total_pnl"]:>14,.1f}', {name: row[name] for name in parameter_sets[0]} if parameter_sets[0] else '')
+    print(f'{len(rows)} runs in {elapsed:.1f}s ({len(rows) / elapsed * 3600:,.0f} runs/hour), results in {args.out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Shared fixtures: a small seeded round written in the csv format of the exchange, and its decoded MarketData.
+"""
+
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backtester import MarketData
+from trader import DEFAULT_PRICES, ORCHIDS, PRODUCTS
+
+ROUND, DAY = 4, 1
+TICKS = 2500 #not a multiple of the recorder chunk, nor of the delta log keyframe
+
+
+def write_round(directory: str, ticks: int = TICKS, seed: int = 0) -> None:
+    """
+    prices, trades and observations csv files of one day: random-walk books of 1 to 3 levels a side, a few market trades, ORCHIDS observations
+    """
+    rng = random.Random(seed)
+    prices = {product: DEFAULT_PRICES[product] for product in PRODUCTS}
+    sunlight, humidity = 2500.0, 70.0
+    levels = ';'.join(f'{side}_price_{i};{side}_volume_{i}' for side in ('bid', 'ask') for i in (1, 2, 3))
+    with open(os.path.join(directory, f'prices_round_{ROUND}_day_{DAY}.csv'), 'w') as p, \
+         open(os.path.join(directory, f'trades_round_{ROUND}_day_{DAY}_nn.csv'), 'w') as t, \
+         open(os.path.join(directory, f'observations_round_{ROUND}_day_{DAY}.csv'), 'w') as o:
+        p.write(f'day;timestamp;product;{levels};mid_price;profit_and_loss\n')
+        t.write('timestamp;buyer;seller;symbol;currency;price;quantity\n')
+        o.write('timestamp,bidPrice,askPrice,transportFees,exportTariff,importTariff,sunlight,humidity\n')
+        for tick in range(ticks):
+            timestamp = tick * 100
+            for product in PRODUCTS:
+                prices[product] += rng.choice([-1, 0, 0, 1])
+                mid = prices[product]
+                spread = rng.randint(1, 3)
+                bids = [f'{mid - spread - i};{rng.randint(1, 30)}' for i in range(rng.randint(1, 3))]
+                asks = [f'{mid + spread + i};{rng.randint(1, 30)}' for i in range(rng.randint(1, 3))]
+                bids += [';'] * (3 - len(bids))
+                asks += [';'] * (3 - len(asks))
+                p.write(f'{DAY};{timestamp};{product};{";".join(bids)};{";".join(asks)};{mid};0.0\n')
+                if rng.random() < 0.1:
+                    t.write(f'{timestamp};;;{product};SEASHELLS;{mid + rng.choice([-spread, spread])}.0;{rng.randint(1, 5)}\n')
+            sunlight += rng.uniform(-1, 1)
+            humidity += rng.uniform(-0.1, 0.1)
+            o.write(f'{timestamp},{prices[ORCHIDS] - 1},{prices[ORCHIDS] + 1},1.0,9.5,-5.0,{sunlight},{humidity}\n')
+
+
+@pytest.fixture(scope='session')
+def round_directory(tmp_path_factory) -> str:
+    directory = str(tmp_path_factory.mktemp('round'))
+    write_round(directory)
+    return directory
+
+
+@pytest.fixture(scope='session')
+def market_data(round_directory) -> MarketData:
+    return MarketData.from_round(round_directory, ROUND, [DAY])
@@ -0,0 +1,24 @@
+import numpy as np
+
+from backtester import Backtester
+from batch import check_parity
+from features import FeatureStore
+from trader import LOG_OFF, PRODUCTS, Trader, TraderParams
+
+
+def test_batch_matches_trader_run_flat(market_data):
+    assert check_parity(market_data) == []
+
+
+def test_batch_matches_trader_run_along_a_backtest(market_data, tmp_path, capsys):
+    result = Backtester(Trader(log_level=LOG_OFF), market_data).run()
+    #the positions each tick starts from, in the PRODUCTS order of compute_signals
+    positions = np.zeros((len(market_data), len(PRODUCTS)), dtype=np.int64)
+    for j, product in enumerate(result.products):
+        positions[1:, PRODUCTS.index(product)] = result.position[:-1, j]
+    assert positions.any()
+
+    trader = Trader(TraderParams(rolling_window=50, coco_lookback=20), log_level=LOG_OFF)
+    store = FeatureStore(str(tmp_path / 'features'))
+    assert check_parity(market_data, positions, trader, store) == []
+    assert check_parity(market_data, positions, Trader(TraderParams(rolling_window=50, coco_lookback=20), log_level=LOG_OFF), store) == [] #served from the store
@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from benchmarks.states import StateGenerator
+from datamodel import TradingState
+from trader import PRODUCTS, BookWalker, MarketSnapshot
+
+
+class Book:
+    """
+    order depth as the exchange sends it: two plain dicts and nothing else, whatever the local datamodel adds
+    """
+
+    def __init__(self, buy_orders: dict, sell_orders: dict) -> None:
+        self.buy_orders = buy_orders
+        self.sell_orders = sell_orders
+
+
+def walker(buy_orders: dict, sell_orders: dict) -> BookWalker:
+    return BookWalker(TradingState('', 0, {}, {'X': Book(buy_orders, sell_orders)}, {}, {}, {}, None))
+
+
+def walk(levels: list, quantity: int) -> tuple:
+    """
+    filled quantity, notional and worst price of taking the levels one by one, best first
+    """
+    left, filled, notional, worst = abs(quantity), 0, 0, None
+    for price, volume in levels:
+        if left == 0:
+            break
+        take = min(left, abs(volume))
+        filled, notional, left, worst = filled + take, notional + take * price, left - take, price
+    return filled, notional, worst
+
+
+def test_book_walker_matches_walking_the_levels():
+    rng = random.Random(0)
+    for _ in range(3000):
+        buy_orders = {price: rng.randint(1, 20) for price in rng.sample(range(90, 100), rng.randint(0, 6))}
+        sell_orders = {price: -rng.randint(1, 20) for price in rng.sample(range(101, 111), rng.randint(0, 6))}
+        book = walker(buy_orders, sell_orders)
+        quantity = rng.randint(-80, 80)
+        buy = quantity > 0
+        levels = sorted(sell_orders.items()) if buy else sorted(buy_orders.items(), reverse=True)
+
+        filled, notional, worst = walk(levels, quantity)
+        result = book.fill('X', quantity)
+        assert (abs(result[0]), result[1], result[2]) == (filled, notional, worst)
+        assert book.vwap('X', quantity) == (notional / filled if filled else None)
+
+        ticks = rng.randint(0, 5)
+        best = levels[0][0] if levels else None
+        within = sum(abs(volume) for price, volume in levels if (price <= best + ticks if buy else price >= best - ticks))
+        assert book.max_quantity('X', buy, ticks) == within
+
+
+def test_book_walker_sizes_and_slippage():
+    book = walker({99: 5, 98: 10}, {101: -5, 103: -10})
+    assert book.slippage('X', 10) == pytest.approx(1.0)
+    assert book.slippage('X', -10) == pytest.approx(0.5)
+    assert book.vwap('X', 0) is None
+    assert book.sized_order('X', 12, 1) == (5, 101)
+    assert book.sized_order('X', -12, 1) == (-12, 98)
+    assert book.sized_order('Y', 3, 1) == (0, None)
+
+
+def test_snapshot_reads_plain_books():
+    state = next(StateGenerator(seed=0))
+    for order_depth in state.order_depths.values():
+        assert type(order_depth.buy_orders) is dict and type(order_depth.sell_orders) is dict
+    state.order_depths = {product: Book(dict(book.buy_orders), dict(book.sell_orders)) for product, book in state.order_depths.items()}
+    snapshot = MarketSnapshot(state, [0.0] * len(PRODUCTS))
+    for product, book in state.order_depths.items():
+        assert snapshot.best_bid_ask(product) == (max(book.buy_orders), min(book.sell_orders))
@@ -0,0 +1,75 @@
+from backtester import Backtester
+from benchmarks.states import StateGenerator
+from deltalog import DeltaTick, read_log, to_json
+from trader import DELTA_KEYFRAME, DELTA_NEXT, DELTA_START, LOG_DELTA, LOG_FULL, Logger, Trader
+
+
+def delta_log(trader: Trader, replay) -> tuple:
+    """
+    the full view of every tick as Trader.run flushed it, in the layout of deltalog.to_json, and the lines of the delta log it printed
+    """
+    expected = []
+    logger = Logger(LOG_FULL)
+    flush = trader.logger.flush
+
+    def recording_flush(state, orders, conversions, trader_data):
+        expected.append(to_json(DeltaTick(state, orders, conversions, trader.logger.logs), logger))
+        flush(state, orders, conversions, trader_data)
+
+    trader.logger.flush = recording_flush
+    lines = replay(trader)
+    return expected, lines
+
+
+def decoded(lines) -> list:
+    logger = Logger(LOG_FULL)
+    return [to_json(tick, logger) for tick in read_log(lines)]
+
+
+def test_delta_log_round_trip_of_a_backtest(market_data, tmp_path):
+    path = tmp_path / 'delta.log'
+
+    def replay(trader):
+        Backtester(trader, market_data, log_path=str(path)).run()
+        return path.read_text().splitlines(keepends=True)
+
+    expected, lines = delta_log(Trader(log_level=LOG_DELTA), replay)
+    assert len(expected) == len(market_data) > DELTA_KEYFRAME
+    assert all(line.startswith((DELTA_START, DELTA_NEXT)) for line in lines)
+    assert decoded(lines) == expected
+
+    #a log cut anywhere resumes at its next keyframe
+    cut = lines[len(lines) // 3:]
+    tail = decoded(cut)
+    assert 0 < len(tail) < len(expected) and tail == expected[-len(tail):]
+
+
+def test_delta_log_round_trip_of_generated_states(capsys):
+    def replay(trader):
+        for _, state in zip(range(DELTA_KEYFRAME + 300), StateGenerator(seed=2, depth=5)):
+            trader.run(state)
+        return capsys.readouterr().out.splitlines(keepends=True)
+
+    expected, lines = delta_log(Trader(log_level=LOG_DELTA), replay)
+    assert decoded(lines) == expected
+
+
+def test_burst_ticks_stay_within_the_budget(capsys):
+    dropped = set()
+
+    def replay(trader):
+        capsys.readouterr()
+        for i, state in zip(range(400), StateGenerator(seed=3, depth=8, market_trades=40)):
+            if i % 7 == 3: #a new log string too long for the budget of a tick
+                trader.logger.print(f'{i}' * 2000)
+                dropped.add(i)
+            trader.run(state)
+        return capsys.readouterr().out.splitlines(keepends=True)
+
+    trader = Trader(log_level=LOG_DELTA)
+    expected, lines = delta_log(trader, replay)
+    assert all(line.startswith(DELTA_START) and len(line) <= trader.logger.max_log_length + 1 for line in lines)
+
+    #the ticks over the budget are left out and the log resumes at the keyframe that follows each of them
+    assert len(lines) == len(expected) - len(dropped)
+    assert decoded(lines) == [line for i, line in enumerate(expected) if i not in dropped]
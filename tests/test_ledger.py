@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from backtester import Backtester
+from trader import LOG_OFF, PRODUCTS, Ledger, Trader
+
+
+class Watched:
+    """
+    forwards run to the trader and keeps a copy of its ledger after every tick
+    """
+
+    def __init__(self, trader: Trader) -> None:
+        self.trader = trader
+        self.ledgers = []
+
+    def run(self, state):
+        result = self.trader.run(state)
+        ledger = self.trader.ledger
+        self.ledgers.append((list(ledger.position), list(ledger.cash), [ledger.pnl(product) for product in PRODUCTS],
+                             [ledger.realized[i] + ledger.unrealized(product) for i, product in enumerate(PRODUCTS)]))
+        return result
+
+
+def test_ledger_follows_the_backtester_accounts(market_data, capsys):
+    watched = Watched(Trader(log_level=LOG_OFF))
+    result = Backtester(watched, market_data).run()
+    columns = [PRODUCTS.index(product) for product in result.products]
+    assert result.position.any()
+
+    #the fills of a tick reach the trader in the own_trades of the next one
+    for t in range(1, len(market_data)):
+        position, cash, pnl, parts = watched.ledgers[t]
+        assert [position[j] for j in columns] == result.position[t - 1].tolist()
+        np.testing.assert_allclose([cash[j] for j in columns], result.cash[t - 1], rtol=0, atol=1e-6)
+        np.testing.assert_allclose(pnl, parts, rtol=0, atol=1e-6) #realized + unrealized == cash + position * mid
+
+
+def test_ledger_array_round_trip(market_data, capsys):
+    trader = Trader(log_level=LOG_OFF)
+    Backtester(trader, market_data).run()
+    ledger = Ledger()
+    ledger.load(trader.ledger.to_array())
+    for name in ['position', 'cash', 'average_price', 'realized', 'last_timestamp']:
+        assert getattr(ledger, name) == pytest.approx(getattr(trader.ledger, name))
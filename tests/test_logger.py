@@ -0,0 +1,30 @@
+import json
+
+import pytest
+
+from benchmarks.states import StateGenerator
+from trader import LOG_FULL, LOG_SUMMARY, Logger, Trader
+
+
+@pytest.mark.parametrize('max_length', [0, 1, 4, 5, 6, 10, 50, 200])
+def test_fit_stays_within_the_limit(max_length):
+    logger = Logger()
+    for value in ['x' * 100, 'é"\\' * 50, '']:
+        encoded = logger.fit(value, max_length)
+        assert len(encoded) <= max(max_length, len('""'))
+        decoded = json.loads(encoded)
+        assert decoded == value or decoded.endswith('...') or decoded == ''
+
+
+@pytest.mark.parametrize('level', [LOG_FULL, LOG_SUMMARY])
+def test_heavy_states_fit_the_log_limit(level, capsys):
+    trader = Trader(log_level=level)
+    capsys.readouterr()
+    for _, state in zip(range(300), StateGenerator(seed=3, depth=8, market_trades=40)):
+        trader.logger.print('x' * 500)
+        trader.run(state)
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 300
+    for line in lines:
+        assert len(line) <= trader.logger.max_log_length
+        json.loads(line)
@@ -0,0 +1,30 @@
+from benchmarks.states import StateGenerator
+from trader import LOG_OFF, PROFILE_SAMPLE_EVERY, PROFILE_SECTIONS, NullProfiler, Profiler, Trader
+
+TICKS = 20 * PROFILE_SAMPLE_EVERY
+
+
+def profile(trader: Trader) -> Profiler:
+    for _, state in zip(range(TICKS), StateGenerator(seed=0)):
+        trader.run(state)
+    trader.profiler.collect()
+    return trader.profiler
+
+
+def test_default_profiler_samples_the_strategies_and_risk_limits(capsys):
+    profiler = profile(Trader(log_level=LOG_OFF, profile_every=1000))
+    assert set(profiler.histograms) == set(PROFILE_SECTIONS)
+    assert profiler.counts[profiler.histograms['apply_risk_limits']].sum() == TICKS // PROFILE_SAMPLE_EVERY
+
+
+def test_profiler_can_time_every_step_of_every_tick(capsys):
+    trader = Trader(log_level=LOG_OFF)
+    trader.profiler = Profiler(1000, sample_every=1, sections=None)
+    profiler = profile(trader)
+    assert {'get_snapshot', 'encode_state', 'flush'} < set(profiler.histograms)
+    assert profiler.counts[profiler.histograms['flush']].sum() == TICKS
+    assert 'LATENCY' in profiler.summary()
+
+
+def test_profiling_disabled_by_default(capsys):
+    assert isinstance(Trader(log_level=LOG_OFF).profiler, NullProfiler)
@@ -0,0 +1,32 @@
+import os
+
+import numpy as np
+
+from backtester import Backtester
+from recorder import Recorder, Recording
+from trader import LOG_OFF, Trader
+
+
+def test_recording_has_every_replayed_tick(market_data, tmp_path):
+    recorder = Recorder(str(tmp_path), chunk=1000)
+    trader = Trader(log_level=LOG_OFF, recorder=recorder)
+    result = Backtester(trader, market_data).run()
+
+    sessions = Recording.sessions(str(tmp_path))
+    assert len(sessions) == 1
+    recording = sessions[0]
+    assert len(recording) == len(market_data) #the last, partial chunk is written when the replay ends
+    assert np.array_equal(recording.timestamps, market_data.timestamps)
+    positions = np.array([[state.position.get(product, 0) for product in result.products] for state in recording.states()])
+    assert np.array_equal(positions[1:], result.position[:-1]) #the state of a tick holds the positions after the fills of the previous one
+
+
+def test_context_manager_flushes(tmp_path):
+    from benchmarks.states import StateGenerator
+
+    generator = StateGenerator(seed=1)
+    with Recorder(str(tmp_path), chunk=1000) as recorder:
+        for _, state in zip(range(1234), generator):
+            recorder.record(state, {}, 0, '')
+    assert os.path.exists(tmp_path / 'session_0' / 'meta.json')
+    assert len(Recording(str(tmp_path / 'session_0'))) == 1234
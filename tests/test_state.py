@@ -0,0 +1,104 @@
+import base64
+
+import numpy as np
+import pytest
+
+from benchmarks.states import StateGenerator
+from trader import DELTA_16, DELTA_32, LOG_OFF, RAW, WINDOW_HEADER, PackedWindow, RingBuffer, Trader, TraderParams, pack_window, unpack_window
+
+TICKS = 300
+
+
+def orders_of(result) -> dict:
+    return {product: [(order.price, order.quantity) for order in orders] for product, orders in result.items()}
+
+
+def run(ticks: int = TICKS, fresh: bool = False, **kwargs) -> tuple:
+    """
+    orders and traderData of every tick, the traderData of a tick given back at the next one as the exchange does.
+    With fresh, every tick is run by a new Trader instance (a new process on the exchange) that can only resume from the traderData.
+    """
+    orders, payloads = [], []
+    trader_data = ''
+    trader = Trader(log_level=LOG_OFF, **kwargs)
+    for _, state in zip(range(ticks), StateGenerator(seed=0)):
+        if fresh:
+            trader = Trader(log_level=LOG_OFF, **kwargs)
+        state.traderData = trader_data
+        result, _, trader_data = trader.run(state)
+        orders.append(orders_of(result))
+        payloads.append(trader_data)
+    return orders, payloads
+
+
+@pytest.mark.parametrize('values, kind', [
+    (np.array([10000.0, 10000.5, 9999.0, 10001.5]), DELTA_16),
+    (np.array([635.0]), DELTA_16),
+    (np.array([0.0, 70000.0, -5000.0]), DELTA_32),
+    (np.array([1.0, np.nan, 2.5]), RAW),
+    (np.array([0.1, 0.2]), RAW),
+    (np.array([1e12, 0.0]), RAW),
+    (np.array([]), RAW),
+])
+def test_pack_window_round_trip(values, kind):
+    packed = pack_window(values, 123)
+    assert WINDOW_HEADER.unpack_from(packed)[0] == kind
+    unpacked, count, offset = unpack_window(b'xx' + packed, 2)
+    assert count == 123 and offset == len(packed) + 2
+    np.testing.assert_array_equal(unpacked, values)
+
+
+@pytest.mark.parametrize('capacity', [1, 2, 50])
+def test_packed_window_matches_pack_window(capacity):
+    rng = np.random.default_rng(capacity)
+    steps = rng.integers(-6, 7, 600) / 2
+    steps[100] = 20000.0 #out of int16, DELTA_32 until it leaves the window
+    steps[300] = 0.25 #not a half tick, RAW until it leaves
+    values = 10000 + np.cumsum(steps)
+    values[450] = np.nan
+    window = RingBuffer(capacity)
+    packer = PackedWindow(window)
+    for i, value in enumerate(values):
+        window.append(value)
+        if i % 7 == 3: #several values appended between two packs
+            continue
+        assert packer.pack() == pack_window(window.last(), window.count)
+        assert packer.pack() == pack_window(window.last(), window.count)
+
+
+@pytest.mark.parametrize('params', [TraderParams(), TraderParams(rolling_window=400, coco_lookback=100, orchids_lag=40)])
+def test_trader_data_size_is_bounded_by_the_windows(params, capsys):
+    _, payloads = run(ticks=1200, params=params)
+    bound = 4 / 3 * (2 * params.rolling_window + 4 * params.coco_lookback + 56 * params.orchids_lag + 560)
+    assert max(map(len, payloads)) <= bound
+
+
+def test_restored_trader_trades_like_a_persistent_one(capsys):
+    persistent, payloads = run()
+    restored, _ = run(fresh=True)
+    assert restored == persistent
+
+    trader = Trader(log_level=LOG_OFF)
+    trader.restore_state(payloads[-1])
+    assert trader.encode_state() == payloads[-1]
+
+
+def test_corrupt_trader_data_leaves_the_trader_untouched(capsys):
+    _, payloads = run(ticks=100)
+    raw = base64.b64decode(payloads[-1])
+    trader = Trader(log_level=LOG_OFF)
+    for _, state in zip(range(20), StateGenerator(seed=1)):
+        trader.run(state)
+    before = trader.encode_state()
+
+    for payload in [raw[:cut] for cut in range(0, len(raw), 11)] + [raw + b'\0']:
+        with pytest.raises(Exception):
+            trader.restore_state(base64.b64encode(payload).decode())
+        assert trader.encode_state() == before
+
+
+def test_persist_off_skips_the_trader_data(capsys):
+    persistent, _ = run()
+    skipped, payloads = run(persist=False)
+    assert skipped == persistent
+    assert set(payloads) == {''}
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from trader import RingBuffer, RollingStats, RunningMoments
+
+SEED = 0
+
+
+def prices(n: int = 3000, level: float = 70000.0) -> np.ndarray:
+    """
+    random walk around a basket-like level, where the sums of squares lose the most precision
+    """
+    rng = np.random.default_rng(SEED)
+    return level + np.cumsum(rng.normal(0, 3, n))
+
+
+@pytest.mark.parametrize('window', [2, 5, 200])
+def test_rolling_stats_match_a_full_recomputation(window):
+    values = prices()
+    stats = RollingStats(window)
+    for t, value in enumerate(values):
+        stats.update(value)
+        if t + 1 < window:
+            assert np.isnan(stats.mean()) and np.isnan(stats.std())
+            continue
+        last = values[t + 1 - window:t + 1]
+        assert stats.mean() == pytest.approx(last.mean(), abs=1e-8)
+        assert stats.std() == pytest.approx(last.std(ddof=1), abs=1e-8)
+
+
+def test_rolling_stats_match_pandas():
+    pd = pytest.importorskip('pandas')
+    values = prices()
+    stats = RollingStats(200)
+    means, stds = [], []
+    for value in values:
+        stats.update(value)
+        means.append(stats.mean())
+        stds.append(stats.std())
+    rolling = pd.Series(values).rolling(200)
+    np.testing.assert_allclose(means, rolling.mean(), rtol=0, atol=1e-8)
+    np.testing.assert_allclose(stds, rolling.std(), rtol=0, atol=1e-8)
+
+
+def test_rolling_stats_load_resumes_the_window():
+    values = prices(500)
+    stats = RollingStats(50)
+    for value in values[:300]:
+        stats.update(value)
+    loaded = RollingStats(50)
+    loaded.load(values[:300])
+    for value in values[300:]:
+        stats.update(value)
+        loaded.update(value)
+        assert loaded.mean() == pytest.approx(stats.mean(), abs=1e-8)
+        assert loaded.std() == pytest.approx(stats.std(), abs=1e-8)
+
+
+def test_ring_buffer_keeps_the_last_values():
+    buffer = RingBuffer(7)
+    values = prices(30)
+    for n, value in enumerate(values, 1):
+        buffer.append(value)
+        np.testing.assert_array_equal(buffer.last(), values[max(0, n - 7):n])
+        np.testing.assert_array_equal(buffer.last(3), values[max(0, n - 3):n])
+    assert not buffer.last().flags.writeable
+
+
+def test_running_moments_match_numpy_and_skip_nans():
+    values = prices()
+    values[::17] = np.nan
+    moments = RunningMoments()
+    assert np.isnan(moments.mean())
+    for t, value in enumerate(values):
+        moments.update(value)
+        seen = values[:t + 1]
+        seen = seen[~np.isnan(seen)]
+        if len(seen):
+            assert moments.mean() == pytest.approx(seen.mean(), abs=1e-8)
+            assert moments.std() == pytest.approx(seen.std(), abs=1e-8)
+
+
+def test_exponential_moments_match_pandas_ewm():
+    pd = pytest.importorskip('pandas')
+    values = prices()
+    moments = RunningMoments(alpha=0.05)
+    means, variances = [], []
+    for value in values:
+        moments.update(value)
+        means.append(moments.mean())
+        variances.append(moments.variance())
+    ewm = pd.Series(values).ewm(alpha=0.05, adjust=False)
+    np.testing.assert_allclose(means, ewm.mean(), rtol=0, atol=1e-8)
+    np.testing.assert_allclose(variances[1:], ewm.var(bias=True)[1:], rtol=0, atol=1e-8)
@@ -0,0 +1,56 @@
+import os
+import shutil
+
+import sweep
+from backtester import Backtester, MarketData
+from conftest import DAY, ROUND, write_round
+from sweep import cache_name
+from trader import LOG_OFF, Trader, TraderParams
+
+
+def test_cache_name_follows_the_csv_files(tmp_path):
+    first, second = tmp_path / 'first', tmp_path / 'second'
+    first.mkdir()
+    write_round(str(first), ticks=50)
+    shutil.copytree(first, second)
+
+    name = cache_name(str(first), ROUND, [DAY])
+    assert cache_name(str(first), ROUND, [DAY]) == name
+    assert name.startswith(f'round_{ROUND}_days_{DAY}_')
+    assert cache_name(str(second), ROUND, [DAY]) != name #same files in another data directory
+
+    path = first / f'prices_round_{ROUND}_day_{DAY}.csv'
+    stat = os.stat(path)
+    write_round(str(first), ticks=50, seed=1)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns)) #edited in place, same modification time
+    assert os.stat(path).st_size != stat.st_size
+    assert cache_name(str(first), ROUND, [DAY]) != name
+
+
+def flat(tick) -> tuple:
+    order_depths, market_trades, observations, prices = tick
+    return (
+        {symbol: (depth.buy_orders, depth.sell_orders) for symbol, depth in order_depths.items()},
+        {symbol: [trade.to_dict() for trade in trades] for symbol, trades in market_trades.items()},
+        {product: observation.to_dict() for product, observation in observations.conversionObservations.items()},
+        prices,
+    )
+
+
+def test_streamed_ticks_match_the_decoded_ones(market_data, tmp_path):
+    market_data.save(str(tmp_path))
+    data = MarketData.load(str(tmp_path))
+    streamed = [flat(tick) for tick in data.ticks(chunk_ticks=7)]
+    assert data._decoded is None #nothing kept
+    assert streamed == [flat(tick) for tick in data.decode()]
+
+
+def test_workers_replay_without_decoding_the_whole_data(market_data, tmp_path):
+    market_data.save(str(tmp_path))
+    parameter_sets = [{}, {'ema_param': 0.5}]
+    sweep.init_worker(str(tmp_path))
+    rows = sweep.run_group(parameter_sets)
+    assert sweep._data._decoded is None
+
+    expected = [Backtester(Trader(TraderParams(**params), log_level=LOG_OFF), market_data).run().total_pnl() for params in parameter_sets]
+    assert [row['total_pnl'] for row in rows] == expected
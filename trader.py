@@ -1,12 +1,14 @@
+import base64
+import bisect
 import json
 #from datamodel import OrderDepth, UserId, TradingState, Order
 from datamodel import Listing, Observation, Order, OrderDepth, ProsperityEncoder, Symbol, Trade, TradingState, ConversionObservation
 
 from typing import Any, Dict, List, Union
-import string
 import math
+import struct
+import time
 import numpy as np
-import pandas as pd
 #from logger import logger  # Assuming Logger is properly defined and imported
 
 AMETHYSTS = 'AMETHYSTS'
@@ -44,6 +46,8 @@ DEFAULT_PRICES = {
     COCONUT_COUPON: 635
 }
 
+PRODUCT_INDEX = {product: i for i, product in enumerate(PRODUCTS)} #position of each product in the MarketSnapshot arrays
+
 POSITION_LIMITS = {
         AMETHYSTS: 20,
         STARFRUIT: 20,
@@ -56,48 +60,1212 @@ POSITION_LIMITS = {
         COCONUT_COUPON:600
 }
 
+LIMITS = np.array([POSITION_LIMITS[product] for product in PRODUCTS]) #POSITION_LIMITS indexed by PRODUCT_INDEX
+
 VOLUME_BASKET = 2
 VOLUME_COCONUT = 2
 SPREAD_THRESHOLD = 1.96
 ROLLING_WINDOW = 200
 MULTIPLIER = 3
 
+ORCHIDS_LAG = 20 #number of observations used for the sunlight and humidity derivatives
+ORCHIDS_CUTOFF = 900_000 #timestamp after which the ORCHIDS position is only reset
+COCO_LOOKBACK = 50 #number of past mid prices averaged for the coconut spread
+COCO_THRESHOLD = 1.96 #number of standard deviations of the coconut spread triggering a trade
+COCO_RESET_THRESHOLD = 1 #number of standard deviations under which the coconut positions are reset
+COCO_WARMUP = 100 #number of ticks before the coconut strategy starts trading
+COUPON_STRIKE = 10_000 #strike of the COCONUT_COUPON call on COCONUT
+COUPON_DAYS_LEFT = 250 #trading days to the expiry of the coupon at the start of the session
+COUPON_VOL = 0.16 #annualized volatility the implied volatility solver starts from
+DAYS_PER_YEAR = 250 #trading days per year, the coupon time to expiry is in years of trading days
+DAY_TIMESTAMPS = 1_000_000 #timestamps per trading day
+IV_ITERATIONS = 20 #largest number of Newton steps of the implied volatility solver
+IV_TOLERANCE = 1e-6 #price error at which the implied volatility solver stops
+IV_BOUNDS = (1e-4, 5.0) #range of the implied volatility
+DEPTH_TICKS = None #if set, the basket and coconut legs are sized to the volume within that many ticks of the best price (single orders at fixed prices if None)
+EMA_PARAM = 0.5
+FEATURE_EMA = 0.1 #weight of the newest observation in the EMAs of the ConversionObservation fields
+
+CONVERSION_FIELDS = ['bidPrice', 'askPrice', 'transportFees', 'exportTariff', 'importTariff', 'sunlight', 'humidity'] #columns of the conversion features
+SUNLIGHT, HUMIDITY = CONVERSION_FIELDS.index('sunlight'), CONVERSION_FIELDS.index('humidity')
+VALUE, CHANGE, SLOPE, EMA = range(4) #rows of the conversion features: last value, change and least-squares slope over the window, EMA
+IMPORT_EDGE, EXPORT_EDGE = range(2) #columns of the conversion arbitrage edges
+
+#strategies run by Trader.run, in this order: the method computing their orders, the products they trade (in the order the method returns
+#their orders) and the derived series they read. A strategy only runs at the ticks where all its products have a two-sided book and all its
+#series were updated, and a series is only updated when an enabled strategy reads it and its own inputs are present.
+STRATEGIES = {
+    'amethysts': ('amethyst_strategy', [AMETHYSTS], []),
+    'starfruit': ('starfruit_strategy', [STARFRUIT], ['ema']),
+    'orchids': ('orchids_strategy', [ORCHIDS], ['observations']),
+    'basket': ('choco_straw_rose_bask_strategy', [CHOCOLATE, STRAWBERRIES, ROSES, GIFT_BASKET], ['spread']),
+    'coco': ('coco_strategy', [COCONUT, COCONUT_COUPON], ['coco_spread']),
+}
+SERIES_PRODUCTS = { #products that need a two-sided book for a series to be updated (observations need the ORCHIDS ConversionObservation instead)
+    'ema': [],
+    'observations': [],
+    'spread': [GIFT_BASKET, CHOCOLATE, STRAWBERRIES, ROSES],
+    'coco_spread': [COCONUT, COCONUT_COUPON],
+}
+
+LOG_OFF, LOG_SUMMARY, LOG_FULL, LOG_DELTA = 'off', 'summary', 'full', 'delta' #verbosity levels of the Logger
+DELTA_KEYFRAME = 1000 #ticks between two delta records that repeat the whole state, from which a log can be decoded
+DELTA_STRINGS = 4096 #size of the string table of the delta log, strings seen after it is full are written in full every time
+DELTA_START, DELTA_NEXT = 'D', '+' #first character of the first stdout line of a delta record and of its continuation lines
+VALUE_NONE, VALUE_FLOAT = 1, 2 #tags of the delta log values that are not integers, integers are written as zigzag << 2
+DOUBLE = struct.Struct('<d')
+EMPTY_BOOK = ({}, 0) #levels and best price of a book side not written yet
+B85_ALPHABET = np.frombuffer(b"0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz!#$%&()*+-;<=>?@^_`{|}~", dtype=np.uint8) #digits of base64.b85encode
+B85_POWERS = 85 ** np.arange(4, -1, -1, dtype=np.int64)
+PROFILE_BUCKETS = 8 #histogram buckets per power of two of nanoseconds
+PROFILE_BATCH = 4096 #laps staged by the Profiler before they are binned
+PROFILE_SAMPLE_EVERY = 16 #the Profiler times one tick out of this many
+PROFILE_SECTIONS = frozenset([*STRATEGIES, "apply_risk_limits"]) #steps of run timed by default, the others are only timed with sections=None
+
+STATE_VERSION = 3 #first byte of the traderData payload, to be bumped whenever its layout changes
+STATE_HEADER = struct.Struct('<BI') #version, round
+WINDOW_HEADER = struct.Struct('<BIH') #encoding, number of values appended so far, number of values packed
+MOMENTS = struct.Struct('<Idd') #count, mean, m2 of a RunningMoments
+COUNT = struct.Struct('<B') #number of products with conversion features, and index of each of them
+FIRST = struct.Struct('<i') #first value in half ticks of a delta-coded window
+DELTA = struct.Struct('<h') #one delta of a DELTA_16 window
+RAW, DELTA_16, DELTA_32 = 0, 1, 2 #encodings of a packed window
+HALF_TICK = 2 #mid prices and spreads are multiples of half a tick, so value * HALF_TICK is an integer
+
+
+class TraderParams:
+    """
+    Tunable constants of the strategies, one instance per Trader so that many variants can be backtested side by side.
+    The defaults are the module-level constants used in the submission.
+    The windows are also what the traderData carries from one tick to the next: its size is about 4/3 * (2 * rolling_window + 4 * coco_lookback
+    + 56 * orchids_lag + 560) bytes (about 3 KB by default), and a tick spends about 50 us encoding it. Longer windows cost traderData
+    size and encoding time, Trader(persist=False) skips it where nothing reads it back.
+    """
+
+    def __init__(
+        self,
+        ema_param: float = EMA_PARAM,
+        rolling_window: int = ROLLING_WINDOW,
+        spread_threshold: float = SPREAD_THRESHOLD,
+        multiplier: int = MULTIPLIER,
+        volume_basket: int = VOLUME_BASKET,
+        volume_coconut: int = VOLUME_COCONUT,
+        orchids_lag: int = ORCHIDS_LAG,
+        orchids_cutoff: int = ORCHIDS_CUTOFF,
+        coco_lookback: int = COCO_LOOKBACK,
+        coco_threshold: float = COCO_THRESHOLD,
+        coco_reset_threshold: float = COCO_RESET_THRESHOLD,
+        coco_warmup: int = COCO_WARMUP,
+        feature_ema: float = FEATURE_EMA,
+        depth_ticks: int = DEPTH_TICKS,
+        coupon_strike: float = COUPON_STRIKE,
+        coupon_days_left: float = COUPON_DAYS_LEFT,
+        coupon_vol: float = COUPON_VOL,
+    ) -> None:
+        self.ema_param = ema_param
+        self.rolling_window = rolling_window
+        self.spread_threshold = spread_threshold
+        self.multiplier = multiplier
+        self.volume_basket = volume_basket
+        self.volume_coconut = volume_coconut
+        self.orchids_lag = orchids_lag
+        self.orchids_cutoff = orchids_cutoff
+        self.coco_lookback = coco_lookback
+        self.coco_threshold = coco_threshold
+        self.coco_reset_threshold = coco_reset_threshold
+        self.coco_warmup = coco_warmup
+        self.feature_ema = feature_ema
+        self.depth_ticks = depth_ticks
+        self.coupon_strike = coupon_strike
+        self.coupon_days_left = coupon_days_left
+        self.coupon_vol = coupon_vol
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+    def __repr__(self) -> str:
+        return "TraderParams(" + ", ".join(f"{name}={value!r}" for name, value in self.__dict__.items()) + ")"
+
+
+class RingBuffer:
+    """
+    Bounded history of floats backed by a preallocated float64 array of twice the capacity.
+    Every value is written both at position i and i + capacity, so that append is O(1) and the last k values are always a contiguous slice of the array, returned as a zero-copy view.
+    Indexing and slicing behave like a list of the values currently retained (oldest first).
+    With a width, every value appended is a row of that many floats and the views are [k, width] arrays.
+    """
+
+    def __init__(self, capacity: int, width: int = None) -> None:
+        self.capacity = capacity
+        self.data = np.full((2 * capacity,) if width is None else (2 * capacity, width), np.nan)
+        self.count = 0 #total number of values appended, including the ones already dropped
+
+    def append(self, value: float) -> None:
+        i = self.count % self.capacity
+        self.data[i] = value
+        self.data[i + self.capacity] = value
+        self.count += 1
+
+    def last(self, k: int = None) -> np.ndarray:
+        """
+        returns a read-only view of the last k values (all the retained values if k is None), oldest first
+        """
+        n = len(self)
+        if k is None or k > n:
+            k = n
+        end = (self.count - 1) % self.capacity + self.capacity + 1
+        view = self.data[end - k:end]
+        view.flags.writeable = False
+        return view
+
+    def load(self, values, count: int) -> None:
+        """
+        replaces the content of the buffer with the given values (the last ones retained, oldest first) as if count values had been appended
+        """
+        values = values[len(values) - min(len(values), self.capacity, count):]
+        i = np.arange(count - len(values), count) % self.capacity
+        self.data[:] = np.nan
+        self.data[i] = values
+        self.data[i + self.capacity] = values
+        self.count = count
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def __getitem__(self, index):
+        return self.last()[index]
+
+    def __iter__(self):
+        return iter(self.last())
+
+
+class RunningMoments:
+    """
+    Online mean and variance of a stream of values with Welford's algorithm, in O(1) per update. NaN values are skipped.
+    With alpha=None every value has the same weight and std() is the population stdev (ddof=0, as np.std) of all the values seen so far.
+    With 0 < alpha <= 1 the mean and the variance are exponentially weighted, the newest value having weight alpha.
+    """
+
+    def __init__(self, alpha: float = None) -> None:
+        self.alpha = alpha
+        self.count = 0 #number of non-NaN values seen
+        self.mean_ = 0.0
+        self.m2 = 0.0 #sum of squared deviations from the mean (equal weights) or weighted variance (exponential weights)
+
+    def update(self, value: float) -> None:
+        if math.isnan(value):
+            return
+
+        self.count += 1
+        delta = value - self.mean_
+
+        if self.alpha is None:
+            self.mean_ += delta / self.count
+            self.m2 += delta * (value - self.mean_)
+        elif self.count == 1:
+            self.mean_ = value
+        else:
+            increment = self.alpha * delta
+            self.mean_ += increment
+            self.m2 = (1 - self.alpha) * (self.m2 + delta * increment)
+
+    def mean(self) -> float:
+        if self.count == 0:
+            return math.nan
+        return self.mean_
+
+    def variance(self) -> float:
+        if self.count == 0:
+            return math.nan
+        if self.alpha is None:
+            return self.m2 / self.count
+        return self.m2
+
+    def std(self) -> float:
+        return math.sqrt(self.variance())
+
+
+class RollingStats:
+    """
+    Rolling window of fixed size over a stream of values.
+    It keeps the running sum and sum of squares of the window, so that the mean and the standard deviation (ddof=1, as pandas) are available in O(1) at every tick.
+    Before the window is full, mean and std are NaN, exactly as pd.Series.rolling(window) would return.
+    """
+
+    def __init__(self, window: int) -> None:
+        self.window = window
+        self.values = np.zeros(window)
+        self.count = 0
+        self.shift = 0.0 #the sums are kept on values shifted by the first observation to limit cancellation errors in the variance
+        self.sum = 0.0
+        self.sum_sq = 0.0
+
+    def update(self, value: float) -> None:
+        if self.count == 0:
+            self.shift = value
+
+        i = self.count % self.window
+        x = value - self.shift
+
+        if self.count >= self.window: #remove from the sums the value leaving the window
+            old = self.values[i]
+            self.sum -= old
+            self.sum_sq -= old * old
+
+        self.values[i] = x
+        self.sum += x
+        self.sum_sq += x * x
+        self.count += 1
+
+        if i == self.window - 1: #once per window, recompute the sums from scratch so that floating point errors do not accumulate
+            self.sum = float(self.values.sum())
+            self.sum_sq = float(np.dot(self.values, self.values))
+
+    def load(self, values: np.ndarray) -> None:
+        """
+        resets the window to the last given values (oldest first), as if they were the only ones ever passed to update
+        """
+        values = np.asarray(values, dtype=float)[-self.window:]
+        self.count = len(values)
+        self.shift = float(values[0]) if self.count else 0.0
+        self.values[:] = 0.0
+        self.values[:self.count] = values - self.shift
+        self.sum = float(self.values.sum())
+        self.sum_sq = float(np.dot(self.values, self.values))
+
+    def is_full(self) -> bool:
+        return self.count >= self.window
+
+    def mean(self) -> float:
+        if not self.is_full():
+            return math.nan
+        return self.shift + self.sum / self.window
+
+    def std(self) -> float:
+        if not self.is_full() or self.window < 2:
+            return math.nan
+        variance = (self.sum_sq - self.sum * self.sum / self.window) / (self.window - 1)
+        return math.sqrt(max(variance, 0.0))
+
+
+class MarketSnapshot:
+    """
+    Market data of every product at one tick, read once from the TradingState at the start of Trader.run and shared by all the strategies.
+    Every array is indexed by PRODUCT_INDEX. Best bid/ask are NaN and their volumes 0 when that side of the book is empty or the product is missing.
+    The mid price falls back to the given default prices (the EMA of the previous mids) when the product has no two-sided book.
+    """
+
+    def __init__(self, state: TradingState, default_prices: List[float]) -> None:
+        self.state = state
+        self.timestamp = state.timestamp
+
+        #the scalar accessors read plain Python lists, which are much faster to index than the arrays
+        self._best_bid = []
+        self._best_ask = []
+        self._mid = []
+        bid_volumes = []
+        ask_volumes = []
+        for product, default_price in zip(PRODUCTS, default_prices):
+            order_depth = state.order_depths.get(product)
+            best_bid = best_ask = None
+            if order_depth is not None: #plain dicts on the exchange, whatever the local datamodel adds
+                best_bid = max(order_depth.buy_orders) if order_depth.buy_orders else None
+                best_ask = min(order_depth.sell_orders) if order_depth.sell_orders else None
+            self._best_bid.append(best_bid)
+            self._best_ask.append(best_ask)
+            bid_volumes.append(0 if best_bid is None else order_depth.buy_orders[best_bid])
+            ask_volumes.append(0 if best_ask is None else order_depth.sell_orders[best_ask])
+            self._mid.append(default_price if best_bid is None or best_ask is None else (best_bid + best_ask) / 2)
+        self._position = [state.position.get(product, 0) for product in PRODUCTS]
+
+        prices = np.array([self._best_bid, self._best_ask, self._mid], dtype=float) #None becomes NaN
+        volumes = np.array([bid_volumes, ask_volumes, self._position], dtype=int)
+        self.best_bid, self.best_ask, self.mid = prices
+        self.bid_volume, self.ask_volume, self.position = volumes
+        self.has_book = ~np.isnan(self.best_bid + self.best_ask) #True where the product has both bids and asks
+        self.book = BookWalker(state)
+
+    def mid_price(self, product) -> float:
+        return self._mid[PRODUCT_INDEX[product]]
+
+    def best_bid_ask(self, product):
+        i = PRODUCT_INDEX[product]
+        best_bid = self._best_bid[i]
+        best_ask = self._best_ask[i]
+        if best_bid is None or best_ask is None:
+            return None, None
+        return best_bid, best_ask
+
+    def get_position(self, product) -> int:
+        return self._position[PRODUCT_INDEX[product]]
+
+    def has_books(self, products) -> bool:
+        """
+        True if every one of the products has both bids and asks
+        """
+        for product in products:
+            i = PRODUCT_INDEX[product]
+            if self._best_bid[i] is None or self._best_ask[i] is None:
+                return False
+        return True
+
+    def inputs(self, products) -> tuple:
+        """
+        best bid, best ask and position of the products, the market data a strategy on them depends on
+        """
+        return tuple((self._best_bid[i], self._best_ask[i], self._position[i]) for i in (PRODUCT_INDEX[product] for product in products))
+
+
+class BookWalker:
+    """
+    Answers fill questions on the order books of one tick from the prefix sums of volume and notional of each side,
+    so that each query is a binary search over the levels instead of a scan. A positive quantity buys from the asks, a negative one sells to the bids.
+    The sides are plain dicts on the exchange: their sorted prices and prefix sums are built here, at the first query of a side in the tick.
+    """
+
+    def __init__(self, state: TradingState) -> None:
+        self.order_depths = state.order_depths
+        self.sides = {} #(product, buy) -> (prices from the best to the worst, cumulative volume, cumulative notional), None without levels
+
+    def side(self, product, buy: bool):
+        """
+        prices, cumulative absolute volume and notional of the side of the book an order takes liquidity from: the asks for a buy, the bids for a sell
+        (None if the product has no book or the side is empty)
+        """
+        key = (product, buy)
+        if key in self.sides:
+            return self.sides[key]
+        order_depth = self.order_depths.get(product)
+        levels = None if order_depth is None else (order_depth.sell_orders if buy else order_depth.buy_orders)
+        side = None
+        if levels:
+            prices = sorted(levels, reverse=not buy)
+            depth = []
+            notional = []
+            volume = total = 0
+            for price in prices:
+                size = abs(levels[price])
+                volume += size
+                total += size * price
+                depth.append(volume)
+                notional.append(total)
+            side = (prices, depth, notional)
+        self.sides[key] = side
+        return side
+
+    def fill(self, product, quantity: int):
+        """
+        returns the quantity a marketable order of the given quantity would fill (with its sign), its notional and the worst price it reaches
+        """
+        side = self.side(product, quantity > 0)
+        if side is None or quantity == 0:
+            return 0, 0, None
+        prices, depth, notional = side
+        size = abs(quantity)
+        i = bisect.bisect_left(depth, size) #first level where the cumulative volume covers the quantity
+        if i == len(depth):
+            filled = depth[-1]
+            total = notional[-1]
+            i -= 1
+        else:
+            filled = size
+            total = (notional[i - 1] if i else 0) + (size - (depth[i - 1] if i else 0)) * prices[i]
+        sign = 1 if quantity > 0 else -1
+        return sign * filled, total, prices[i]
+
+    def vwap(self, product, quantity: int) -> float:
+        """
+        average price of the part of the quantity the book can fill, None if nothing can be filled
+        """
+        filled, notional, _ = self.fill(product, quantity)
+        return notional / abs(filled) if filled else None
+
+    def slippage(self, product, quantity: int) -> float:
+        """
+        cost per unit of filling the quantity compared to the best price (>= 0), None if nothing can be filled
+        """
+        vwap = self.vwap(product, quantity)
+        if vwap is None:
+            return None
+        best = self.side(product, quantity > 0)[0][0]
+        return vwap - best if quantity > 0 else best - vwap
+
+    def max_quantity(self, product, buy: bool, ticks: int) -> int:
+        """
+        volume available within the given number of ticks of the best price, on the asks for a buy and on the bids for a sell
+        """
+        side = self.side(product, buy)
+        if side is None:
+            return 0
+        prices, depth, _ = side
+        limit = prices[0] + ticks if buy else prices[0] - ticks
+        #number of levels priced within the limit, the prices are sorted from the best to the worst
+        low, high = 0, len(prices)
+        while low < high:
+            middle = (low + high) // 2
+            if (prices[middle] <= limit) if buy else (prices[middle] >= limit):
+                low = middle + 1
+            else:
+                high = middle
+        return depth[low - 1] if low else 0
+
+    def sized_order(self, product, quantity: int, ticks: int):
+        """
+        the part of the quantity that can be filled within the given number of ticks of the best price, as (quantity, limit price), or (0, None)
+        """
+        size = min(abs(quantity), self.max_quantity(product, quantity > 0, ticks))
+        if size == 0:
+            return 0, None
+        filled, _, worst_price = self.fill(product, size if quantity > 0 else -size)
+        return filled, worst_price
+
+
+class ConversionFeatures:
+    """
+    Features of every field of the ConversionObservations (CONVERSION_FIELDS), for every product that has one, updated in O(1) per observation.
+    For each product, a window of the last observations keeps the running sum and index-weighted sum of every field, so that
+    the change over the window and the least-squares slope against the observation index are available without rescanning it, next to an EMA.
+    Everything is stored in fixed-size arrays indexed by PRODUCT_INDEX: table [product, VALUE/CHANGE/SLOPE/EMA, field] and
+    edges [product, IMPORT_EDGE/EXPORT_EDGE], the profit per unit of importing (buy through the conversion, sell at the best bid) or exporting
+    (buy at the best ask, sell through the conversion), NaN until known.
+    """
+
+    def __init__(self, window: int, alpha: float = FEATURE_EMA) -> None:
+        self.window = window
+        self.alpha = alpha
+        shape = (len(PRODUCTS), len(CONVERSION_FIELDS))
+        self.windows = {} #product -> RingBuffer of its observations, created at its first observation
+        self.sum = np.zeros(shape) #sum of every field over the window
+        self.weighted = np.zeros(shape) #sum of j * value over the window, j = 0 for the oldest observation
+        self.table = np.full((len(PRODUCTS), 4, len(CONVERSION_FIELDS)), np.nan)
+        self.edges = np.full((len(PRODUCTS), 2), np.nan)
+
+    def update(self, observations: Dict[str, ConversionObservation], snapshot: MarketSnapshot) -> None:
+        for product, observation in observations.items():
+            i = PRODUCT_INDEX.get(product)
+            if i is None:
+                continue
+            values = np.array([getattr(observation, field) for field in CONVERSION_FIELDS], dtype=float)
+            window = self.windows.get(product)
+            if window is None:
+                window = self.windows[product] = RingBuffer(self.window, len(CONVERSION_FIELDS))
+
+            n = len(window)
+            if n == self.window: #slide: every index drops by one and the oldest observation leaves
+                oldest = window.last()[0]
+                self.weighted[i] += (n - 1) * values - self.sum[i] + oldest
+                self.sum[i] += values - oldest
+            else:
+                self.weighted[i] += n * values
+                self.sum[i] += values
+            window.append(values)
+
+            table = self.table[i]
+            table[EMA] = values if window.count == 1 else self.alpha * values + (1 - self.alpha) * table[EMA]
+            if window.count % self.window == 0: #once per window, recompute the sums from scratch so that floating point errors do not accumulate
+                self.refresh(product)
+            else:
+                self.features(i, window)
+
+            best_bid, best_ask = snapshot.best_bid_ask(product)
+            if best_bid is not None:
+                self.edges[i, IMPORT_EDGE] = best_bid - (observation.askPrice + observation.transportFees + observation.importTariff)
+                self.edges[i, EXPORT_EDGE] = observation.bidPrice - observation.transportFees - observation.exportTariff - best_ask
+            else:
+                self.edges[i] = np.nan
+
+    def features(self, i: int, window: RingBuffer) -> None:
+        """
+        last value, change and slope of the product at index i from its window and running sums
+        """
+        table = self.table[i]
+        n = len(window)
+        values = window.last()
+        table[VALUE] = values[-1]
+        table[CHANGE] = values[-1] - values[0] if n == self.window else np.nan
+        if n >= 2:
+            sum_x = n * (n - 1) / 2
+            sum_xx = (n - 1) * n * (2 * n - 1) / 6
+            table[SLOPE] = (n * self.weighted[i] - sum_x * self.sum[i]) / (n * sum_xx - sum_x * sum_x)
+        else:
+            table[SLOPE] = np.nan
+
+    def refresh(self, product) -> None:
+        """
+        recomputes the running sums and the features of the product from its window
+        """
+        i = PRODUCT_INDEX[product]
+        window = self.windows[product]
+        values = window.last()
+        self.sum[i] = values.sum(axis=0)
+        self.weighted[i] = np.arange(len(values)) @ values
+        self.features(i, window)
+
+    def field(self, product, field: int) -> np.ndarray:
+        """
+        view of the values of one field in the window of the product, oldest first (empty before its first observation)
+        """
+        window = self.windows.get(product)
+        return window.last()[:, field] if window is not None else np.empty(0)
+
+    def get(self, product, feature: int, field: int) -> float:
+        return float(self.table[PRODUCT_INDEX[product], feature, field])
+
+    def edge(self, product, direction: int) -> float:
+        return float(self.edges[PRODUCT_INDEX[product], direction])
+
+    def pack(self) -> bytes:
+        """
+        the windows and EMAs of the products, the rest is rebuilt from them by load
+        """
+        parts = [COUNT.pack(len(self.windows))]
+        for product, window in self.windows.items():
+            i = PRODUCT_INDEX[product]
+            parts += [COUNT.pack(i), pack_window(window.last().ravel(), window.count), pack_window(self.table[i, EMA], 0)]
+        return b"".join(parts)
+
+    def load(self, buffer: bytes, offset: int) -> int:
+        """
+        restores what pack saved from buffer at offset and returns the offset of what follows
+        """
+        self.__init__(self.window, self.alpha)
+        n, = COUNT.unpack_from(buffer, offset)
+        offset += COUNT.size
+        for _ in range(n):
+            i, = COUNT.unpack_from(buffer, offset)
+            values, count, offset = unpack_window(buffer, offset + COUNT.size)
+            ema, _, offset = unpack_window(buffer, offset)
+            product = PRODUCTS[i]
+            window = self.windows[product] = RingBuffer(self.window, len(CONVERSION_FIELDS))
+            window.load(values.reshape(-1, len(CONVERSION_FIELDS)), count)
+            self.refresh(product)
+            self.table[i, EMA] = ema
+        return offset
+
+
+class Ledger:
+    """
+    Position, cash, average entry price and realized PnL of every product, kept up to date from the own trades of each TradingState.
+    Only the fills newer than the last one booked are processed, so an update costs time proportional to the number of new fills,
+    and the unrealized PnL is marked to the mid prices of the tick. Every list is indexed by PRODUCT_INDEX.
+    Conversions are not reported as own trades and are not booked.
+    """
 
-class Logger:
     def __init__(self) -> None:
+        n = len(PRODUCTS)
+        self.position = [0] * n
+        self.cash = [0.0] * n
+        self.average_price = [0.0] * n #average price of the open position, 0 when flat
+        self.realized = [0.0] * n
+        self.mid = [0.0] * n #mid prices of the last update
+        self.last_timestamp = -1 #timestamp of the newest fill booked
+        self.fills = 0 #fills booked by this instance, to_array only changes with it and last_timestamp
+
+    def update(self, state: TradingState, mid: np.ndarray) -> None:
+        """
+        books the fills of the state that were not booked yet and marks the positions to the given mids
+        """
+        if state.timestamp <= self.last_timestamp: #the timestamps restart at every new day
+            self.last_timestamp = -1
+        newest = self.last_timestamp
+        for product, trades in state.own_trades.items():
+            i = PRODUCT_INDEX.get(product)
+            if i is None:
+                continue
+            for trade in trades:
+                if trade.timestamp <= self.last_timestamp:
+                    continue
+                if trade.buyer == SUBMISSION:
+                    self.book(i, trade.price, trade.quantity)
+                elif trade.seller == SUBMISSION:
+                    self.book(i, trade.price, -trade.quantity)
+                newest = max(newest, trade.timestamp)
+        self.last_timestamp = newest
+        self.mid = mid.tolist()
+
+    def book(self, i: int, price: float, quantity: int) -> None:
+        """
+        books one fill of the product at index i, quantity > 0 for a buy and < 0 for a sell
+        """
+        position = self.position[i]
+        self.fills += 1
+        self.cash[i] -= price * quantity
+        if position == 0 or (position > 0) == (quantity > 0): #opening or adding to the position
+            self.average_price[i] = (self.average_price[i] * abs(position) + price * abs(quantity)) / abs(position + quantity)
+        else: #reducing, closing or flipping it
+            closed = min(abs(quantity), abs(position))
+            self.realized[i] += closed * (price - self.average_price[i]) * (1 if position > 0 else -1)
+            if abs(quantity) > abs(position):
+                self.average_price[i] = price
+            elif position + quantity == 0:
+                self.average_price[i] = 0.0
+        self.position[i] = position + quantity
+
+    def exposure(self, product) -> float:
+        i = PRODUCT_INDEX[product]
+        return self.position[i] * self.mid[i]
+
+    def unrealized(self, product) -> float:
+        i = PRODUCT_INDEX[product]
+        return self.position[i] * (self.mid[i] - self.average_price[i]) if self.position[i] else 0.0
+
+    def pnl(self, product) -> float:
+        """
+        realized + unrealized PnL of the product, equal to its cash plus its position marked to the mid
+        """
+        i = PRODUCT_INDEX[product]
+        return self.cash[i] + self.position[i] * self.mid[i] if self.position[i] else self.cash[i]
+
+    def total_pnl(self) -> float:
+        return sum(self.pnl(product) for product in PRODUCTS)
+
+    def summary(self) -> str:
+        return f"PNL {self.total_pnl():.1f} realized {sum(self.realized):.1f}"
+
+    def to_array(self) -> np.ndarray:
+        return np.array([self.last_timestamp] + self.position + self.cash + self.average_price + self.realized, dtype=float)
+
+    def load(self, values: np.ndarray) -> None:
+        """
+        restores the ledger from the array returned by to_array
+        """
+        n = len(PRODUCTS)
+        values = values.tolist()
+        self.last_timestamp = int(values[0])
+        self.position = [int(value) for value in values[1:1 + n]]
+        self.cash = values[1 + n:1 + 2 * n]
+        self.average_price = values[1 + 2 * n:1 + 3 * n]
+        self.realized = values[1 + 3 * n:1 + 4 * n]
+
+
+def norm_cdf(x: np.ndarray) -> np.ndarray:
+    """
+    standard normal CDF of an array, from the Abramowitz-Stegun 7.1.26 approximation of erf (absolute error below 1e-7)
+    """
+    z = np.abs(x) / math.sqrt(2)
+    t = 1 / (1 + 0.3275911 * z)
+    erf = 1 - t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429)))) * np.exp(-z * z)
+    return 0.5 * (1 + np.sign(x) * erf)
+
+
+def black_scholes(spot, strike, years, vol):
+    """
+    price, delta and vega of a European call without rates, element-wise on arrays (a whole day of ticks in one call)
+    """
+    spot, years, vol = np.asarray(spot, dtype=float), np.asarray(years, dtype=float), np.asarray(vol, dtype=float)
+    deviation = vol * np.sqrt(years)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d1 = (np.log(spot / strike) + 0.5 * deviation * deviation) / deviation
+    d2 = d1 - deviation
+    delta = norm_cdf(d1)
+    price = spot * delta - strike * norm_cdf(d2)
+    vega = spot * np.exp(-0.5 * d1 * d1) / math.sqrt(2 * math.pi) * np.sqrt(years)
+    return price, delta, vega
+
+
+def implied_vol(price, spot, strike, years, initial_vol = COUPON_VOL, iterations: int = IV_ITERATIONS) -> np.ndarray:
+    """
+    implied volatility of call prices, element-wise: Newton steps from initial_vol (a scalar or one guess per element), NaN where the price is
+    outside the no-arbitrage bounds (intrinsic value, spot) or the solver did not reach IV_TOLERANCE
+    """
+    price, spot = np.asarray(price, dtype=float), np.asarray(spot, dtype=float)
+    vol = np.broadcast_to(np.asarray(initial_vol, dtype=float), np.broadcast(price, spot, years).shape).copy()
+    for _ in range(iterations):
+        value, _, vega = black_scholes(spot, strike, years, vol)
+        error = value - price
+        if np.all(np.abs(error[~np.isnan(error)]) < IV_TOLERANCE):
+            break
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vol = np.clip(vol - error / vega, *IV_BOUNDS)
+    value, _, _ = black_scholes(spot, strike, years, vol)
+    valid = (price > np.maximum(spot - strike, 0)) & (price < spot) & (np.abs(value - price) < IV_TOLERANCE)
+    return np.where(valid, vol, np.nan)
+
+
+class CouponPricer:
+    """
+    Per-tick Black-Scholes valuation of COCONUT_COUPON, a call on COCONUT, with the scalar math functions (a few microseconds per tick).
+    The implied volatility is solved by Newton steps warm-started from the one of the previous tick, so one or two steps are usually enough.
+    The warm start is not saved in traderData: a restarted Trader starts again from params.coupon_vol and only needs a few more steps.
+    """
+
+    def __init__(self, params: TraderParams) -> None:
+        self.strike = params.coupon_strike
+        self.days_left = params.coupon_days_left
+        self.vol = params.coupon_vol #implied volatility of the last update, the starting point of the next solve
+        self.iv = math.nan #implied volatility of the last tick, NaN if the coupon price had none
+        self.delta = math.nan #delta of the coupon at that volatility
+        self.vega = math.nan
+
+    def years(self, timestamp: int) -> float:
+        return (self.days_left - timestamp / DAY_TIMESTAMPS) / DAYS_PER_YEAR
+
+    def value(self, spot: float, years: float, vol: float):
+        """
+        price, delta and vega of the coupon, the scalar version of black_scholes
+        """
+        deviation = vol * math.sqrt(years)
+        d1 = (math.log(spot / self.strike) + 0.5 * deviation * deviation) / deviation
+        delta = 0.5 * (1 + math.erf(d1 / math.sqrt(2)))
+        price = spot * delta - self.strike * 0.5 * (1 + math.erf((d1 - deviation) / math.sqrt(2)))
+        vega = spot * math.exp(-0.5 * d1 * d1) / math.sqrt(2 * math.pi) * math.sqrt(years)
+        return price, delta, vega
+
+    def update(self, spot: float, price: float, timestamp: int) -> float:
+        """
+        solves the implied volatility of the coupon price, updates iv, delta and vega and returns the implied volatility (NaN if there is none)
+        """
+        years = self.years(timestamp)
+        self.iv = self.delta = self.vega = math.nan
+        if years <= 0 or not max(spot - self.strike, 0) < price < spot:
+            return self.iv
+
+        vol = self.vol
+        low, high = IV_BOUNDS
+        for _ in range(IV_ITERATIONS):
+            value, delta, vega = self.value(spot, years, vol)
+            error = value - price
+            if abs(error) < IV_TOLERANCE:
+                self.vol = self.iv = vol
+                self.delta = delta
+                self.vega = vega
+                break
+            if vega <= 0:
+                break
+            vol = min(max(vol - error / vega, low), high)
+        return self.iv
+
+    def fair_value(self, spot: float, timestamp: int, vol: float = None) -> float:
+        """
+        price of the coupon for the given spot, at the given volatility (the last implied one by default)
+        """
+        return self.value(spot, self.years(timestamp), self.vol if vol is None else vol)[0]
+
+
+def pack_window(values: np.ndarray, count: int) -> bytes:
+    """
+    packs a window of floats (plus the number of values appended to it so far) into bytes.
+    Windows of half-tick prices are stored losslessly as the first value in half ticks followed by the int16 deltas between consecutive values (int32 if a delta does not fit),
+    anything else (NaN, EMA fallbacks, observations) as raw float64.
+    """
+    n = len(values)
+    kind = RAW
+    if n and (float(values[0]) * HALF_TICK).is_integer() and (float(values[-1]) * HALF_TICK).is_integer(): #else RAW without a pass over the values
+        scaled = values * HALF_TICK
+        quantized = np.rint(scaled)
+        if np.array_equal(quantized, scaled) and abs(quantized[0]) < 2**31: #False as soon as there is a NaN
+            deltas = np.diff(quantized)
+            kind = DELTA_16 if n == 1 or np.abs(deltas).max() < 2**15 else DELTA_32
+            if kind == DELTA_32 and np.abs(deltas).max() >= 2**31:
+                kind = RAW
+
+    header = WINDOW_HEADER.pack(kind, count, n)
+    if kind == RAW:
+        return header + np.asarray(values, dtype='<f8').tobytes()
+    return header + FIRST.pack(int(quantized[0])) + deltas.astype('<i2' if kind == DELTA_16 else '<i4').tobytes()
+
+
+def unpack_window(buffer: bytes, offset: int):
+    """
+    reads a window packed by pack_window starting at offset, returns the values, the number of values appended so far and the offset of what follows
+    """
+    kind, count, n = WINDOW_HEADER.unpack_from(buffer, offset)
+    offset += WINDOW_HEADER.size
+    if kind == RAW:
+        values = np.frombuffer(buffer, '<f8', n, offset)
+        return values, count, offset + 8 * n
+
+    dtype = '<i2' if kind == DELTA_16 else '<i4'
+    first, = FIRST.unpack_from(buffer, offset)
+    deltas = np.frombuffer(buffer, dtype, n - 1, offset + 4)
+    values = np.concatenate(([first], first + np.cumsum(deltas, dtype=np.int64))) / HALF_TICK
+    return values, count, offset + 4 + deltas.nbytes
+
+
+class PackedWindow:
+    """
+    pack_window of a RingBuffer, kept up to date as values are appended.
+    While the window is DELTA_16, the bytes after one more value are the previous ones with the delta of the new value appended (and the
+    oldest value dropped once the window is full), a few bytes operations instead of a NumPy pass over the whole window; anything else
+    (NaN, a delta out of int16, several values appended at once) packs the window again. The bytes are always those of pack_window.
+    """
+
+    def __init__(self, window: RingBuffer) -> None:
+        self.window = window
+        self.count = -1 #window.count when packed was built
+        self.packed = b""
+        self.first = None #first and last value of the window in half ticks while it is DELTA_16, None otherwise
+        self.last = None
+
+    def pack(self) -> bytes:
+        window = self.window
+        if window.count == self.count:
+            return self.packed
+        if window.count == self.count + 1 and self.last is not None and window.capacity > 1:
+            scaled = float(window.data[self.count % window.capacity]) * HALF_TICK
+            if scaled.is_integer() and -2**15 <= scaled - self.last < 2**15:
+                value = int(scaled)
+                deltas = self.packed[WINDOW_HEADER.size + FIRST.size:]
+                n = len(window)
+                if n * 2 == len(deltas) + 2: #full, the oldest value leaves
+                    self.first += DELTA.unpack_from(deltas)[0]
+                    deltas = deltas[DELTA.size:]
+                if -2**31 < self.first < 2**31:
+                    self.packed = WINDOW_HEADER.pack(DELTA_16, window.count, n) + FIRST.pack(self.first) + deltas + DELTA.pack(value - self.last)
+                    self.last = value
+                    self.count = window.count
+                    return self.packed
+
+        values = window.last()
+        self.packed = pack_window(values, window.count)
+        self.count = window.count
+        self.first = self.last = None
+        if len(values) and WINDOW_HEADER.unpack_from(self.packed)[0] == DELTA_16:
+            self.first, = FIRST.unpack_from(self.packed, WINDOW_HEADER.size)
+            self.last = int(values[-1] * HALF_TICK)
+        return self.packed
+
+
+def listing_fields(listing) -> list:
+    """
+    symbol, product and denomination of a listing, a plain dict on the exchange and a Listing in the local datamodel
+    """
+    if isinstance(listing, dict):
+        return [listing["symbol"], listing["product"], listing["denomination"]]
+    return [listing.symbol, listing.product, listing.denomination]
+
+
+def encode_varints(values: List[int]) -> bytes:
+    """
+    LEB128 bytes of non-negative integers, 7 bits per byte with the high bit set on every byte of a value but its last
+    """
+    out = bytearray()
+    append = out.append
+    for n in values:
+        while n > 0x7f:
+            append(n & 0x7f | 0x80)
+            n >>= 7
+        append(n)
+    return bytes(out)
+
+
+def b85encode(data: bytes) -> str:
+    """
+    same text as base64.b85encode(data).decode(), but the base 85 digits of all the 4-byte words are computed at once with NumPy
+    """
+    padding = -len(data) % 4
+    words = np.frombuffer(data + b"\0" * padding, dtype=">u4").astype(np.int64)
+    text = B85_ALPHABET[words[:, None] // B85_POWERS % 85].tobytes()
+    return text[:len(text) - padding].decode()
+
+
+class DeltaEncoder:
+    """
+    Binary records of the LOG_DELTA level: every tick only writes what changed since the previous one, base85-encoded on stdout lines.
+    Integers are zigzag varints, the changed levels of a book side are written in price order with each price delta-coded against the previous one,
+    and strings (symbols, trader names, log lines) are written once and then referred to by their index in a string table.
+    Every keyframe ticks the tables are reset and the record holds the whole state, so a log can be decoded from any keyframe on (deltalog.py).
+    A record over the budget of a tick is not printed: that tick is missing from the log and the next record is a keyframe, from which the decoder resumes.
+    The traderData is not written: it is the trader's own state, the Recorder keeps it when it is needed.
+
+    The integers of a record are gathered in a list and varint-encoded in one loop at the end, the bytes of the strings and floats go to a separate blob:
+    a record is the varint length of the blob, the blob, then the varints. In the order of the varints: keyframe flag, timestamp delta, listings,
+    symbols of the books, book changes, position changes, own trades, market trades, orders, conversions, plain observation changes,
+    conversion observation changes, log lines (the layout is mirrored by deltalog.DeltaDecoder).
+    """
+
+    def __init__(self, keyframe: int = DELTA_KEYFRAME) -> None:
+        self.keyframe = keyframe
+        self.ticks = 0
+        self.resync = False #True after a record that was not printed, the next one is a keyframe
+        self.ints = [] #non-negative integers of the record being written
+        self.blob = bytearray()
+        self.reset()
+
+    def reset(self) -> None:
+        self.strings = {} #string -> index in the string table
+        self.timestamp = 0
+        self.listings = None #symbols of the last listings written
+        self.symbols = () #symbols of the last order depths written
+        self.books = {} #index of the symbol << 2 | side << 1 -> (copy of the levels last written, best price)
+        self.position = {}
+        self.plain = {}
+        self.conversion = {} #product -> tuple of its CONVERSION_FIELDS last written
+
+    def signed(self, n: int) -> None:
+        self.ints.append(n << 1 if n >= 0 else (-n << 1) - 1)
+
+    def value(self, value: Any) -> None:
+        """
+        integer (zigzag << 2), float (VALUE_FLOAT then 8 bytes in the blob) or None (VALUE_NONE)
+        """
+        if value is None:
+            self.ints.append(VALUE_NONE)
+        elif isinstance(value, float):
+            self.ints.append(VALUE_FLOAT)
+            self.blob += DOUBLE.pack(value)
+        else:
+            value = int(value)
+            self.ints.append((value << 1 if value >= 0 else (-value << 1) - 1) << 2)
+
+    def price(self, price: Any, last: int) -> int:
+        """
+        integer prices are written as their difference to the last one of the section, returns the new last price
+        """
+        if price is None or isinstance(price, float):
+            self.value(price)
+            return last
+        price = int(price)
+        self.value(price - last)
+        return price
+
+    def string(self, value: str) -> None:
+        """
+        0 for None, (index + 1) << 1 for a string of the table, length << 1 | 1 and the UTF-8 bytes in the blob otherwise (added to the table while it is not full)
+        """
+        if value is None:
+            self.ints.append(0)
+            return
+        index = self.strings.get(value)
+        if index is not None:
+            self.ints.append(index + 1 << 1)
+            return
+        encoded = str(value).encode()
+        self.ints.append(len(encoded) << 1 | 1)
+        self.blob += encoded
+        if len(self.strings) < DELTA_STRINGS:
+            self.strings[value] = len(self.strings)
+
+    def changes(self, current: dict, previous: dict) -> list:
+        """
+        (key, value) of the entries of current that differ from previous, (key, None) for the ones it no longer has
+        """
+        if current == previous:
+            return []
+        changed = [(key, value) for key, value in current.items() if key not in previous or previous[key] != value]
+        return changed + [(key, None) for key in previous if key not in current]
+
+    def trades(self, trades: dict[Symbol, list[Trade]], timestamp: int) -> None:
+        trades = [trade for arr in trades.values() for trade in arr]
+        self.ints.append(len(trades))
+        last = 0
+        for trade in trades:
+            self.string(trade.symbol)
+            last = self.price(trade.price, last)
+            self.value(trade.quantity)
+            self.string(trade.buyer)
+            self.string(trade.seller)
+            self.signed(trade.timestamp - timestamp)
+
+    def encode(self, state: TradingState, orders: dict[Symbol, list[Order]], conversions: int, logs: str) -> bytes:
+        keyframe = self.resync or self.ticks % self.keyframe == 0
+        self.resync = False
+        self.ticks += 1
+        if keyframe:
+            self.reset()
+        self.ints = []
+        self.blob = bytearray()
+        put = self.ints.append
+        put(int(keyframe))
+        self.signed(state.timestamp - self.timestamp)
+        self.timestamp = state.timestamp
+
+        #listings and book symbols: 0 when unchanged, count + 1 then the new ones otherwise
+        listings = tuple(state.listings)
+        if listings == self.listings:
+            put(0)
+        else:
+            self.listings = listings
+            put(len(listings) + 1)
+            for listing in state.listings.values():
+                for field in listing_fields(listing):
+                    self.string(field)
+
+        symbols = tuple(state.order_depths)
+        if symbols == self.symbols:
+            put(0)
+        else:
+            put(len(symbols) + 1)
+            for symbol in symbols:
+                self.string(symbol)
+            self.books = {} #keyed by the index of the symbol, written again in full
+            self.symbols = symbols
+
+        #book sides that changed, as index of the symbol << 2 | side << 1 | whole, then either the changed levels (volume 0 for a level that is gone)
+        #or, when that is shorter, the whole side: best price delta-coded against the previous best, gaps to the next levels, volumes
+        books, ints, signed = self.books, self.ints, self.signed
+        count = len(ints)
+        put(0) #number of sides written, set below
+        for i, symbol in enumerate(symbols):
+            depth = state.order_depths[symbol]
+            for key, levels in ((i << 2, depth.buy_orders), (i << 2 | 2, depth.sell_orders)):
+                previous = books.get(key, EMPTY_BOOK)
+                if levels == previous[0]:
+                    continue
+                changed = self.changes(levels, previous[0])
+                prices = sorted(levels, reverse=not key & 2) #best first
+                books[key] = (dict(levels), prices[0] if prices else 0)
+                ints[count] += 1
+                if len(changed) > len(levels):
+                    put(key | 1)
+                    put(len(prices))
+                    if prices:
+                        signed(prices[0] - previous[1])
+                    ints += [abs(price - next_price) for price, next_price in zip(prices, prices[1:])]
+                    ints += [volume << 1 if volume >= 0 else (-volume << 1) - 1 for volume in map(levels.get, prices)]
+                    continue
+                put(key)
+                put(len(changed))
+                last = 0
+                for price, volume in sorted(changed):
+                    signed(price - last)
+                    put(0 if volume is None else (volume << 1 if volume >= 0 else (-volume << 1) - 1) + 1)
+                    last = price
+
+        changed = self.changes(state.position, self.position)
+        put(len(changed))
+        for symbol, position in changed:
+            self.string(symbol)
+            self.value(position)
+        self.position = dict(state.position)
+
+        self.trades(state.own_trades, state.timestamp)
+        self.trades(state.market_trades, state.timestamp)
+
+        orders = [order for arr in orders.values() for order in arr]
+        put(len(orders))
+        last = 0
+        for order in orders:
+            self.string(order.symbol)
+            last = self.price(order.price, last)
+            self.value(order.quantity)
+        self.value(conversions)
+
+        changed = self.changes(state.observations.plainValueObservations, self.plain)
+        put(len(changed))
+        for name, value in changed:
+            self.string(name)
+            self.value(value)
+        self.plain = dict(state.observations.plainValueObservations)
+
+        #conversion observations: product, bit mask of the changed fields (1 << len(CONVERSION_FIELDS) when it is gone), their values
+        conversion = {product: tuple(getattr(observation, field) for field in CONVERSION_FIELDS)
+                      for product, observation in state.observations.conversionObservations.items()}
+        changed = self.changes(conversion, self.conversion)
+        put(len(changed))
+        for product, values in changed:
+            self.string(product)
+            if values is None:
+                put(1 << len(CONVERSION_FIELDS))
+                continue
+            previous = self.conversion.get(product, (None,) * len(CONVERSION_FIELDS))
+            mask = sum(1 << j for j, value in enumerate(values) if value != previous[j])
+            put(mask)
+            for j, value in enumerate(values):
+                if mask >> j & 1:
+                    self.value(value)
+        self.conversion = conversion
+
+        lines = logs.split("\n")
+        put(len(lines))
+        for line in lines:
+            self.string(line)
+
+        return encode_varints([len(self.blob)]) + bytes(self.blob) + encode_varints(self.ints)
+
+    def lines(self, state: TradingState, orders: dict[Symbol, list[Order]], conversions: int, logs: str, max_length: int, budget: int) -> List[str]:
+        """
+        base85 text of the record of this tick, cut in lines of at most max_length characters (a multiple of 5 characters each, but the last one),
+        or no line when they would be more than budget characters in all (a burst of trades or log lines), the next record is then a keyframe
+        """
+        text = b85encode(self.encode(state, orders, conversions, logs))
+        size = (max_length - 1) // 5 * 5
+        if len(text) + -(-len(text) // size) > budget:
+            self.resync = True
+            return []
+        return [(DELTA_NEXT if i else DELTA_START) + text[i:i + size] for i in range(0, len(text), size)]
+
+
+class Logger:
+    """
+    Output of every tick, printed as one JSON line within max_log_length characters.
+    With level LOG_FULL the line is the format of the visualizer: the compressed state, the orders, the conversions, the traderData and the logs.
+    With LOG_SUMMARY only the timestamp, the positions, the orders, the conversions and the logs are printed. With LOG_OFF nothing is built nor printed.
+    With LOG_DELTA every tick is a DeltaEncoder record of what changed since the previous tick, without truncation: the lines of a record hold
+    the whole books, trades, orders and logs and are decoded offline by deltalog.py. They are max_delta_length characters at most in all
+    (one line by default, the budget of the other levels), a tick whose record is longer is left out of the log.
+    """
+
+    def __init__(self, level: str = LOG_FULL) -> None:
+        self.level = level
         self.logs = ""
         self.max_log_length = 3750
+        self.max_delta_length = self.max_log_length #total characters of the lines of a delta record, over several lines when above max_log_length
+        self.listings_key = None #symbols of the listings compressed in self.listings_json, which do not change during a session
+        self.listings_json = "[]"
+        self.delta = DeltaEncoder() if level == LOG_DELTA else None
 
     def print(self, *objects: Any, sep: str = " ", end: str = "\n") -> None:
+        if self.level == LOG_OFF:
+            return
         self.logs += sep.join(map(str, objects)) + end
 
     def flush(self, state: TradingState, orders: dict[Symbol, list[Order]], conversions: int, trader_data: str) -> None:
-        base_length = len(self.to_json([
-            self.compress_state(state, ""),
-            self.compress_orders(orders),
-            conversions,
-            "",
-            "",
-        ]))
-
-        # We truncate state.traderData, trader_data, and self.logs to the same max. length to fit the log limit
-        max_item_length = (self.max_log_length - base_length) // 3
-
-        print(self.to_json([
-            self.compress_state(state, self.truncate(state.traderData, max_item_length)),
-            self.compress_orders(orders),
-            conversions,
-            self.truncate(trader_data, max_item_length),
-            self.truncate(self.logs, max_item_length),
-        ]))
+        if self.level == LOG_OFF:
+            return
+
+        if self.level == LOG_DELTA:
+            for line in self.delta.lines(state, orders, conversions, self.logs, self.max_log_length, self.max_delta_length):
+                print(line)
+            self.logs = ""
+            return
+
+        orders_json = self.to_json(self.compress_orders(orders))
+
+        if self.level == LOG_SUMMARY:
+            head = f"[{state.timestamp},{self.to_json(state.position)},{orders_json},{conversions},"
+            if len(head) + len('""]') > self.max_log_length: #the orders alone are over the limit
+                head = f"[{state.timestamp},{self.to_json(state.position)},[],{conversions},"
+            print(head + self.fit(self.logs, self.max_log_length - len(head) - 1) + "]")
+            self.logs = ""
+            return
+
+        #everything but the three strings is serialized once, then the strings share what is left of the budget
+        listings_json = self.compress_listings(state.listings)
+        compressed = self.compress_state(state)
+        state_json = self.to_json(compressed)[1:-1]
+        fixed = len(str(state.timestamp)) + len(listings_json) + len(str(conversions)) + 11 #brackets and commas
+        budget = self.max_log_length - fixed - len(state_json) - len(orders_json)
+
+        #when the rest alone leaves no room for three empty strings, the market trades, the own trades, the books and then the orders are left out
+        reductions = [(2, []), (1, []), (0, {})]
+        while budget < 3 * len('""'):
+            if reductions:
+                index, empty = reductions.pop(0)
+                compressed[index] = empty
+                state_json = self.to_json(compressed)[1:-1]
+            elif orders_json != "[]":
+                orders_json = "[]"
+            else:
+                break
+            budget = self.max_log_length - fixed - len(state_json) - len(orders_json)
+
+        strings = [state.traderData, trader_data, self.logs]
+        encoded = []
+        for i, value in enumerate(strings):
+            share = max(0, budget // (len(strings) - i)) #what a string does not use goes to the next ones
+            encoded.append(self.fit(value, share))
+            budget = max(0, budget - len(encoded[-1]))
+
+        print(f"[[{state.timestamp},{encoded[0]},{listings_json},{state_json}],{orders_json},{conversions},{encoded[1]},{encoded[2]}]")
 
         self.logs = ""
 
-    def compress_state(self, state: TradingState, trader_data: str) -> list[Any]:
+    def compress_state(self, state: TradingState) -> list[Any]:
+        """
+        the part of the compressed state that changes at every tick, flush puts the timestamp, the traderData and the cached listings in front of it
+        """
         return [
-            state.timestamp,
-            trader_data,
-            self.compress_listings(state.listings),
             self.compress_order_depths(state.order_depths),
             self.compress_trades(state.own_trades),
             self.compress_trades(state.market_trades),
@@ -105,72 +1273,181 @@ class Logger:
             self.compress_observations(state.observations),
         ]
 
-    def compress_listings(self, listings: dict[Symbol, Listing]) -> list[list[Any]]:
-        compressed = []
-        for listing in listings.values():
-            compressed.append([listing["symbol"], listing["product"], listing["denomination"]])
+    def compress_listings(self, listings: dict[Symbol, Listing]) -> str:
+        """
+        JSON of the compressed listings, only rebuilt when the listed symbols change
+        """
+        key = tuple(listings)
+        if key != self.listings_key:
+            self.listings_key = key
+            self.listings_json = self.to_json([listing_fields(listing) for listing in listings.values()])
 
-        return compressed
+        return self.listings_json
 
+    #the compressed lists are built from the attributes, the datamodel classes (here as on the exchange) have no compress() of their own
     def compress_order_depths(self, order_depths: dict[Symbol, OrderDepth]) -> dict[Symbol, list[Any]]:
-        compressed = {}
-        for symbol, order_depth in order_depths.items():
-            compressed[symbol] = [order_depth.buy_orders, order_depth.sell_orders]
-
-        return compressed
+        return {symbol: [order_depth.buy_orders, order_depth.sell_orders] for symbol, order_depth in order_depths.items()}
 
     def compress_trades(self, trades: dict[Symbol, list[Trade]]) -> list[list[Any]]:
-        compressed = []
-        for arr in trades.values():
-            for trade in arr:
-                compressed.append([
-                    trade.symbol,
-                    trade.price,
-                    trade.quantity,
-                    trade.buyer,
-                    trade.seller,
-                    trade.timestamp,
-                ])
-
-        return compressed
+        return [[trade.symbol, trade.price, trade.quantity, trade.buyer, trade.seller, trade.timestamp] for arr in trades.values() for trade in arr]
 
     def compress_observations(self, observations: Observation) -> list[Any]:
-        conversion_observations = {}
-        for product, observation in observations.conversionObservations.items():
-            conversion_observations[product] = [
-                observation.bidPrice,
-                observation.askPrice,
-                observation.transportFees,
-                observation.exportTariff,
-                observation.importTariff,
-                observation.sunlight,
-                observation.humidity,
-            ]
-
+        conversion_observations = {product: [getattr(observation, field) for field in CONVERSION_FIELDS]
+                                   for product, observation in observations.conversionObservations.items()}
         return [observations.plainValueObservations, conversion_observations]
 
     def compress_orders(self, orders: dict[Symbol, list[Order]]) -> list[list[Any]]:
-        compressed = []
-        for arr in orders.values():
-            for order in arr:
-                compressed.append([order.symbol, order.price, order.quantity])
-
-        return compressed
+        return [[order.symbol, order.price, order.quantity] for arr in orders.values() for order in arr]
 
     def to_json(self, value: Any) -> str:
         return json.dumps(value, cls=ProsperityEncoder, separators=(",", ":"))
 
-    def truncate(self, value: str, max_length: int) -> str:
-        if len(value) <= max_length:
-            return value
-
-        return value[:max_length - 3] + "..."
+    def fit(self, value: str, max_length: int) -> str:
+        """
+        JSON string literal of value, truncated with "..." so that the literal (quotes and escapes included) is at most max_length characters,
+        or the empty literal when not even '"..."' fits
+        """
+        encoded = json.dumps(value)
+        if len(encoded) <= max_length:
+            return encoded
+        if max_length < len('"..."'):
+            return '""'
+        length = len(value)
+        while len(encoded) > max_length and length > 0:
+            length = max(0, min(length - 1, length * (max_length - 5) // len(encoded))) #escaped characters take more than one character in the literal
+            encoded = json.dumps(value[:length] + "...")
+
+        return encoded
 
 logger = Logger()
 
+
+class Profiler:
+    """
+    Latency of the steps of Trader.run, measured with perf_counter_ns between consecutive calls to lap and counted in fixed-size histograms.
+    Only one tick out of sample_every is timed (begin returns None for the others, and run then skips its laps), and only the steps in
+    sections are kept, by default the strategies and the risk limits; sections=None keeps every step.
+    lap only appends the time and the component to a staging buffer; every PROFILE_BATCH laps the buffer is binned at once with NumPy,
+    so the memory never grows and the per-lap cost stays a few hundred nanoseconds.
+    The buckets split every power of two of nanoseconds in PROFILE_BUCKETS, so a reported percentile is at most 12.5% above the measured latency.
+    """
+
+    def __init__(self, report_every: int = 1000, sample_every: int = PROFILE_SAMPLE_EVERY, sections: frozenset = PROFILE_SECTIONS) -> None:
+        self.report_every = report_every #ticks between two summaries appended to the logs
+        self.sample_every = sample_every
+        self.sections = sections #steps kept in the histograms, None for all of them
+        self.ticks = 0
+        self.histograms = {} #component -> its row in counts and max
+        self.counts = np.zeros((0, 64 * PROFILE_BUCKETS), dtype=np.int64) #histogram of the latencies of each component
+        self.max = np.zeros(0, dtype=np.int64) #largest latency of each component, in ns
+        self.times = []
+        self.components = [] #None marks the start of a tick, whose time is not a latency
+
+    def begin(self) -> "Profiler":
+        """
+        starts timing a tick and returns the profiler, or returns None when the tick is not sampled
+        """
+        self.ticks += 1
+        if self.ticks % self.sample_every:
+            return None
+        if len(self.times) >= PROFILE_BATCH:
+            self.collect()
+        self.components.append(None)
+        self.times.append(time.perf_counter_ns())
+        return self
+
+    def lap(self, component: str) -> None:
+        """
+        records the time elapsed since the previous lap (or start) as a latency of component
+        """
+        self.times.append(time.perf_counter_ns())
+        self.components.append(component)
+
+    def collect(self) -> None:
+        """
+        bins the staged laps into the histograms and empties the buffer
+        """
+        if len(self.times) < 2:
+            return
+        latencies = np.diff(np.array(self.times, dtype=np.int64))
+        components = self.components[1:]
+        if self.sections is not None: #the other steps only delimit the kept ones
+            components = [name if name in self.sections else None for name in components]
+        for name in dict.fromkeys(components):
+            if name is not None and name not in self.histograms:
+                self.histograms[name] = len(self.histograms)
+        rows = {None: -1, **self.histograms}
+        ids = np.array(list(map(rows.__getitem__, components)))
+        self.times = self.times[-1:] #an unfinished tick carries on in the next batch
+        self.components = self.components[-1:]
+
+        _, exponents = np.frexp(latencies.astype(float)) #bit length of the latencies
+        small = exponents <= 4
+        shifts = np.where(small, 0, exponents - 4)
+        buckets = np.where(small, latencies, shifts * PROFILE_BUCKETS + (latencies >> shifts))
+        buckets = np.clip(buckets, 0, 64 * PROFILE_BUCKETS - 1)
+
+        n = len(self.histograms)
+        if len(self.counts) < n: #new components
+            self.counts = np.vstack([self.counts, np.zeros((n - len(self.counts), 64 * PROFILE_BUCKETS), dtype=np.int64)])
+            self.max = np.concatenate([self.max, np.zeros(n - len(self.max), dtype=np.int64)])
+
+        selected = ids >= 0
+        ids = ids[selected]
+        self.counts += np.bincount(ids * 64 * PROFILE_BUCKETS + buckets[selected], minlength=self.counts.size).reshape(self.counts.shape)
+        np.maximum.at(self.max, ids, latencies[selected])
+
+    def percentile(self, component: str, q: float) -> int:
+        """
+        upper bound in ns of the q-th percentile (0 < q <= 100) of the latencies of component
+        """
+        histogram = self.counts[self.histograms[component]]
+        i = int(np.searchsorted(np.cumsum(histogram), q / 100 * histogram.sum()))
+        if i < 2 * PROFILE_BUCKETS:
+            return i
+        shift = i // PROFILE_BUCKETS - 1
+        return ((i % PROFILE_BUCKETS + PROFILE_BUCKETS + 1) << shift) - 1
+
+    def is_due(self, tick: int) -> bool:
+        return tick % self.report_every == 0
+
+    def summary(self) -> str:
+        """
+        one line with the p50/p99/max latency of every component in microseconds
+        """
+        self.collect()
+        parts = [
+            f"{component} {self.percentile(component, 50) / 1000:.1f}/{self.percentile(component, 99) / 1000:.1f}/{self.max[self.histograms[component]] / 1000:.1f}"
+            for component in self.histograms
+        ]
+        return "LATENCY us p50/p99/max: " + ", ".join(parts)
+
+
+class NullProfiler:
+    """
+    Profiler used when profiling is disabled: no tick is sampled.
+    """
+
+    def begin(self) -> None:
+        return None
+
+    def is_due(self, tick: int) -> bool:
+        return False
+
 class Trader:
-    def __init__(self) -> None:
-        self.logger = Logger()  # Initialize the logger
+    def __init__(self, params: TraderParams = None, log_level: str = LOG_FULL, profile_every: int = None, recorder = None, strategies: List[str] = None, persist: bool = True) -> None:
+        self.params = params if params is not None else TraderParams()
+        params = self.params
+        unknown = set(strategies or []) - set(STRATEGIES)
+        if unknown:
+            raise ValueError(f"unknown strategies: {', '.join(sorted(unknown))}")
+        self.strategies = list(STRATEGIES) if strategies is None else [name for name in STRATEGIES if name in strategies] #enabled strategies, run in the order of STRATEGIES
+        self.consumed = {series for name in self.strategies for series in STRATEGIES[name][2]} #series read by at least one enabled strategy
+        self.last_orders = {} #strategy -> (its inputs, the orders it returned for them), reused while the inputs do not change
+        self.logger = Logger(log_level)  # Initialize the logger
+        self.profiler = Profiler(profile_every) if profile_every else NullProfiler() #latency of every step of run, summarized in the logs every profile_every ticks
+        self.recorder = recorder #optional recorder.Recorder, receives every state and the orders emitted for it
+        self.persist = persist #False when nothing reads the traderData back (in-process backtests, sweeps): run then skips encode_state and returns ""
         print("Initialize Trader ...")
         self.position_limit = {
             AMETHYSTS: 20,
@@ -185,70 +1462,56 @@ class Trader:
         }
 
         self.round = 0
-        self.cash = 0
-        self.past_prices = {product: [] for product in PRODUCTS}
+        self.ledger = Ledger() #position, cash and PnL of every product, booked from the own trades
+        self.past_prices = {product: RingBuffer(params.coco_lookback) for product in PRODUCTS}
         self.ema_prices = {product: None for product in PRODUCTS}
-        self.ema_param = 0.5
-        self.sunlight = [] 
-        self.humidity = [] 
-        self.spread = []
-        self.coco_spread = []
+        self.snapshot = None #MarketSnapshot of the TradingState currently processed by run
+        self.features = ConversionFeatures(params.orchids_lag, params.feature_ema) #changes, slopes and EMAs of the ConversionObservation fields, arbitrage edges
+        self.spread = RingBuffer(params.rolling_window)
+        self.spread_stats = RollingStats(params.rolling_window) #rolling mean and stdev of the spread
+        self.spread_stats_5 = RollingStats(5) #rolling mean of the spread over a smaller window of 5 periods
+        self.coco_prices_stats = {product: RollingStats(params.coco_lookback) for product in [COCONUT, COCONUT_COUPON]} #rolling averages of the last coco_lookback mid prices
+        self.coco_spread = RingBuffer(params.coco_lookback)
+        self.coco_spread_stats = RunningMoments() #mean and stdev of all the coconut spreads of the session
+        self.coupon = CouponPricer(params) #implied volatility and delta of COCONUT_COUPON, updated with the coconut spread
+        self.trader_data = "" #traderData returned by the last call to run
+        self.packed = {} #section of the traderData -> (the object it was packed from, its key, its bytes), see encode_state
 
     #ROUND 1 UTILS
+    def get_snapshot(self, state: TradingState) -> MarketSnapshot:
+        """
+        returns the MarketSnapshot of the given state, building it only the first time the state is seen
+        """
+        if self.snapshot is None or self.snapshot.state is not state:
+            default_prices = [DEFAULT_PRICES[product] if self.ema_prices[product] is None else self.ema_prices[product] for product in PRODUCTS]
+            self.snapshot = MarketSnapshot(state, default_prices)
+        return self.snapshot
+
     def get_position(self, product, state: TradingState):
-        return state.position.get(product, 0)
+        return self.get_snapshot(state).get_position(product)
     
     def get_mid_price(self, product, state : TradingState):
         """
         Given a product and a state objects, it returns the mid_price.
         The mid_price consists of the price in between the best bid and the best ask.
         If there are no bids or asks, it returns the DEFAULT_PRICE consisting of the exponential moving average (EMA) of all the previous prices.
+        The value is read from the MarketSnapshot of the state, so the order book is only scanned once per tick.
         """
-
-        default_price = self.ema_prices[product]
-        if default_price is None:
-            default_price = DEFAULT_PRICES[product] #at the beginning of the series, just set the default price to DEFAULT_PRICE
-
-        if product not in state.order_depths:
-            return default_price
-        
-        market_bids = state.order_depths[product].buy_orders #save here all the BIDS present in the market for a product at a certain state in time
-        if len(market_bids) == 0:
-            return default_price #if there are no BID orders, set the mid_price to be the EMA of the previous prices
-        
-        market_asks = state.order_depths[product].sell_orders
-        if len(market_asks) == 0:
-            return default_price #if there are no ASK orders, set the mid_price to be the EMA of the previous prices
-        
-        #in all the other cased, the mid_price of a product at a given state in time is defined as the average between the best bid and the best ask
-        best_bid = max(market_bids)
-        best_ask = max(market_asks)
-
-        return (best_bid + best_ask)/2
+        return self.get_snapshot(state).mid_price(product)
     
     def get_value_on_product(self, product, state: TradingState):
-        return self.get_position(product, state) * self.get_mid_price(product, state)
+        return self.ledger.exposure(product)
     
     def get_best_bid_ask(self, product, state: TradingState):
-        if product not in state.order_depths:
-            return None, None
-        market_bids = state.order_depths[product].buy_orders
-        market_asks = state.order_depths[product].sell_orders
-        if len(market_bids) == 0 or len(market_asks) == 0:
-            return None, None
-        best_bid = max(market_bids)
-        best_ask = min(market_asks)
-        return best_bid, best_ask
+        return self.get_snapshot(state).best_bid_ask(product)
     
     def update_ema_price(self, state: TradingState):
-        for product in PRODUCTS:
-            mid_price = self.get_mid_price(product, state)
-            if mid_price is None:
-                continue
+        mid_prices = self.get_snapshot(state).mid
+        for product, mid_price in zip(PRODUCTS, mid_prices.tolist()):
             if self.ema_prices[product] is None:
                 self.ema_prices[product] = mid_price
             else:
-                self.ema_prices[product] = self.ema_param * mid_price + (1 - self.ema_param) * self.ema_prices[product]
+                self.ema_prices[product] = self.params.ema_param * mid_price + (1 - self.params.ema_param) * self.ema_prices[product]
         
 
     def reset_positions(self, state: TradingState, product):
@@ -268,7 +1531,7 @@ class Trader:
     #ROUND 3 UTILS
     def update_spread(self, state: TradingState):
         """
-        this method appends the spread value to the self.spread list at each state
+        this method appends the spread value to the self.spread list at each state and feeds the rolling statistics of the spread
         """
         price_strawberries = self.get_mid_price(STRAWBERRIES, state)
         price_chocolate = self.get_mid_price(CHOCOLATE, state)
@@ -278,23 +1541,196 @@ class Trader:
         current_spread = price_basket - (4 * price_chocolate + 6 * price_strawberries + price_roses)
 
         self.spread.append(current_spread)
+        self.spread_stats.update(current_spread)
+        self.spread_stats_5.update(current_spread)
 
     #ROUND 4 UTILS
-    def update_coco_spread(self, state: TradingState, LOOKBACK = 50):
-        prices_coconut = self.past_prices[COCONUT]
-        prices_coupon = self.past_prices[COCONUT_COUPON]
+    def update_coco_spread(self, state: TradingState):
+        """
+        this method appends the spread between the average of the past coco_lookback prices of coconut and coconut_coupon to self.coco_spread (NaN until there are enough prices)
+        """
+        stats_coconut = self.coco_prices_stats[COCONUT]
+        stats_coupon = self.coco_prices_stats[COCONUT_COUPON]
+
+        if not stats_coconut.is_full() or not stats_coupon.is_full():
+            current_spread = np.nan
 
-        if len(prices_coconut) < LOOKBACK or len(prices_coupon) < LOOKBACK:
-            self.coco_spread.append(np.NaN)
-        
         else:
             #get the average of the past 50 prices of coconut and coconut_coupon
-            recent_prices_coconut = np.mean(prices_coconut[-LOOKBACK:])
-            recent_prices_coupon = np.mean(prices_coupon[-LOOKBACK:])
+            current_spread = stats_coconut.mean() - stats_coupon.mean()
 
-            current_spread = recent_prices_coconut - recent_prices_coupon
+        self.coco_spread.append(current_spread)
+        self.coco_spread_stats.update(current_spread)
 
-            self.coco_spread.append(current_spread)
+
+    def apply_risk_limits(self, result: Dict[str, List[Order]], snapshot: MarketSnapshot) -> Dict[str, List[Order]]:
+        """
+        last check of all the orders of the tick before they are sent. The exchange rejects all the orders of a product if its buys, or its sells,
+        would take the position beyond the limit once all filled, so the orders without a price or quantity are dropped and, for every product
+        whose total buys (sells) exceed what the limit leaves, the buys (sells) are scaled down proportionally (rounded towards zero) to fit.
+        The cached orders of the strategies are never modified, the scaled orders are new ones.
+        """
+        orders = []
+        for product, product_orders in result.items():
+            for order in product_orders:
+                if not order.quantity:
+                    continue
+                if order.symbol == product and product in PRODUCT_INDEX and order.price is not None and math.isfinite(order.price):
+                    orders.append(order)
+                else:
+                    self.logger.print(f"Risk: dropped invalid order {order}")
+        if not orders:
+            return {product: [] for product in result}
+
+        products = np.array([PRODUCT_INDEX[order.symbol] for order in orders])
+        quantities = np.array([order.quantity for order in orders], dtype=np.int64)
+        buys = np.bincount(products, np.maximum(quantities, 0), len(PRODUCTS)).astype(np.int64)
+        sells = np.bincount(products, np.maximum(-quantities, 0), len(PRODUCTS)).astype(np.int64)
+        buy_room = np.maximum(LIMITS - snapshot.position, 0)
+        sell_room = np.maximum(LIMITS + snapshot.position, 0)
+        over_buy = buys > buy_room
+        over_sell = sells > sell_room
+
+        if over_buy.any() or over_sell.any():
+            buying = quantities > 0
+            over = np.where(buying, over_buy[products], over_sell[products])
+            room = np.where(buying, buy_room[products], sell_room[products])
+            total = np.where(buying, buys[products], sells[products])
+            scaled = np.sign(quantities) * (np.abs(quantities) * room // np.maximum(total, 1))
+            quantities = np.where(over, scaled, quantities)
+            for i in np.flatnonzero(over_buy | over_sell).tolist():
+                self.logger.print(f"Risk: clipped {PRODUCTS[i]} buys {buys[i]}/{buy_room[i]} sells {sells[i]}/{sell_room[i]}")
+
+        guarded = {product: [] for product in result}
+        for order, quantity in zip(orders, quantities.tolist()):
+            if quantity == order.quantity:
+                guarded[order.symbol].append(order)
+            elif quantity:
+                guarded[order.symbol].append(Order(order.symbol, order.price, quantity))
+        return guarded
+
+    def series_inputs(self, series: List[str], products: List[str]) -> tuple:
+        """
+        the values of the series a strategy reads: the EMA prices of its products, or the number of values appended to the windows, which changes at every update
+        """
+        values = []
+        for name in series:
+            if name == "ema":
+                values.append(tuple(self.ema_prices[product] for product in products))
+            elif name == "observations":
+                values.append(self.features.windows[ORCHIDS].count)
+            elif name == "spread":
+                values.append(self.spread.count)
+            elif name == "coco_spread":
+                values.append(self.coco_spread.count)
+        return tuple(values)
+
+
+    #STATE PERSISTENCE
+    def encode_state(self) -> str:
+        """
+        packs the state the strategies need to resume trading into a compact base64 string, returned as traderData.
+        Only the bounded windows, the EMA prices, the running moments and the ledger are stored: the rolling sums are rebuilt from the windows on restore,
+        so the size of the string only depends on the window lengths of the params (see TraderParams, about 3 KB with the default ones).
+        Only the last value of the coconut spreads is stored, the strategies read nothing older. The price windows are kept packed from one
+        tick to the next (PackedWindow), and the features and the ledger are only packed again when they change.
+        """
+        ema_prices = np.array([np.nan if price is None else price for price in self.ema_prices.values()])
+        stats = self.coco_spread_stats
+        features = self.features
+        ledger = self.ledger
+        buffer = b"".join([
+            STATE_HEADER.pack(STATE_VERSION, self.round),
+            pack_window(ema_prices, self.round),
+            self.packed_window("past_coconut", self.past_prices[COCONUT]),
+            self.packed_window("past_coupon", self.past_prices[COCONUT_COUPON]),
+            self.packed_section("features", features, tuple(window.count for window in features.windows.values()), features.pack),
+            self.packed_window("spread", self.spread),
+            pack_window(self.coco_spread.last(1), self.coco_spread.count),
+            MOMENTS.pack(stats.count, stats.mean_, stats.m2),
+            self.packed_section("ledger", ledger, (ledger.fills, ledger.last_timestamp), lambda: pack_window(ledger.to_array(), 0)),
+        ])
+        return base64.b64encode(buffer).decode("ascii")
+
+    def packed_window(self, name: str, window: RingBuffer) -> bytes:
+        """
+        pack_window of the window, through a PackedWindow kept for it until restore_state replaces the window
+        """
+        packer = self.packed.get(name)
+        if packer is None or packer.window is not window:
+            packer = self.packed[name] = PackedWindow(window)
+        return packer.pack()
+
+    def packed_section(self, name: str, owner, key, pack) -> bytes:
+        """
+        bytes of a section of the traderData, packed again only when its key changes or restore_state replaces its owner
+        """
+        cached = self.packed.get(name)
+        if cached is None or cached[0] is not owner or cached[1] != key:
+            cached = self.packed[name] = (owner, key, pack())
+        return cached[2]
+
+    def restore_state(self, trader_data: str) -> None:
+        """
+        restores the state packed by encode_state, raises ValueError if trader_data was not produced by it.
+        The whole payload is decoded into new objects first: a truncated or corrupt traderData raises before any attribute is replaced.
+        """
+        params = self.params
+        buffer = base64.b64decode(trader_data, validate=True)
+        version, ticks = STATE_HEADER.unpack_from(buffer)
+        if version != STATE_VERSION:
+            raise ValueError(f"unknown traderData version {version}")
+        offset = STATE_HEADER.size
+
+        values, _, offset = unpack_window(buffer, offset)
+        ema_prices = {product: None if math.isnan(price) else price for product, price in zip(PRODUCTS, values.tolist())}
+
+        past_prices = dict(self.past_prices)
+        coco_prices_stats = {}
+        for product in [COCONUT, COCONUT_COUPON]:
+            values, count, offset = unpack_window(buffer, offset)
+            past_prices[product] = RingBuffer(params.coco_lookback)
+            past_prices[product].load(values, count)
+            coco_prices_stats[product] = RollingStats(params.coco_lookback)
+            coco_prices_stats[product].load(past_prices[product].last())
+
+        features = ConversionFeatures(params.orchids_lag, params.feature_ema)
+        offset = features.load(buffer, offset)
+
+        spread = RingBuffer(params.rolling_window)
+        coco_spread = RingBuffer(params.coco_lookback)
+        for window in [spread, coco_spread]:
+            values, count, offset = unpack_window(buffer, offset)
+            window.load(values, count)
+
+        coco_spread_stats = RunningMoments()
+        coco_spread_stats.count, coco_spread_stats.mean_, coco_spread_stats.m2 = MOMENTS.unpack_from(buffer, offset)
+        offset += MOMENTS.size
+
+        values, _, offset = unpack_window(buffer, offset)
+        ledger = Ledger()
+        ledger.load(values)
+        if offset != len(buffer):
+            raise ValueError(f"{len(buffer) - offset} unexpected bytes at the end of traderData")
+
+        spread_stats = RollingStats(params.rolling_window)
+        spread_stats.load(spread.last())
+        spread_stats_5 = RollingStats(5)
+        spread_stats_5.load(spread.last())
+
+        #everything parsed, swap the state in
+        self.round = ticks
+        self.ema_prices = ema_prices
+        self.past_prices = past_prices
+        self.coco_prices_stats = coco_prices_stats
+        self.features = features
+        self.spread = spread
+        self.coco_spread = coco_spread
+        self.spread_stats = spread_stats
+        self.spread_stats_5 = spread_stats_5
+        self.coco_spread_stats = coco_spread_stats
+        self.ledger = ledger
+        self.last_orders = {}
 
 
     #ROUND 1 STRATEGIES
@@ -373,7 +1809,7 @@ class Trader:
 
 
     #ROUND 2 STRATEGIES
-    def orchids_strategy(self, state: TradingState, sunlight, humidity):
+    def orchids_strategy(self, state: TradingState, sunlight = None, humidity = None):
         """
         Idea:
             - During the first part of the trading session (before timestamp 900,000), if both sunlight and humidity are increasing, buy at the mid price.
@@ -385,6 +1821,11 @@ class Trader:
         
         self.logger.print("Executing Orchids strategy")
 
+        if sunlight is None:
+            sunlight = self.features.field(ORCHIDS, SUNLIGHT)
+        if humidity is None:
+            humidity = self.features.field(ORCHIDS, HUMIDITY)
+
         current_timestamp = int(state.timestamp)
 
         position_orchids = self.get_position(ORCHIDS, state)
@@ -393,20 +1834,22 @@ class Trader:
 
         mid_price = int(round(self.get_mid_price(ORCHIDS, state)))
 
+        lag = self.params.orchids_lag
         sunlight_deriv = None
         humidity_deriv = None
 
         # Calculate derivatives if there are enough data points
-        if len(sunlight) >= 20:
-            sunlight_deriv = sunlight[-1] - sunlight[-20]
-        if len(humidity) >= 20:
-            humidity_deriv = humidity[-1] - humidity[-20]
+        if len(sunlight) >= lag:
+            sunlight_deriv = sunlight[-1] - sunlight[-lag]
+        if len(humidity) >= lag:
+            humidity_deriv = humidity[-1] - humidity[-lag]
         
         self.logger.print(f"Sunlight Derivative: {sunlight_deriv}, Humidity Derivative: {humidity_deriv}")
+        self.logger.print(f"Import edge: {self.features.edge(ORCHIDS, IMPORT_EDGE)}, Export edge: {self.features.edge(ORCHIDS, EXPORT_EDGE)}")
 
         orders = []
 
-        if current_timestamp <= 900_000:
+        if current_timestamp <= self.params.orchids_cutoff:
         # If both sunlight and humidity are increasing 
             if sunlight_deriv is not None and humidity_deriv is not None:
                 if sunlight_deriv > 0 and humidity_deriv > 0:
@@ -420,7 +1863,7 @@ class Trader:
                 else:
                     orders.append(self.reset_positions(state, ORCHIDS))  
                     
-            if len(sunlight) < 20 or len(humidity) < 20 or sunlight_deriv is None or humidity_deriv is None:
+            if len(sunlight) < lag or len(humidity) < lag or sunlight_deriv is None or humidity_deriv is None:
                 pass
         else:
             orders.append(self.reset_positions(state, ORCHIDS))
@@ -436,6 +1879,7 @@ class Trader:
             - Calculate the spread mean and standard deviation over a rolling window and check if the recent spread deviates significantly from the mean.
             - If the spread is more than a threshold standard deviations below the mean, buy the basket and sell the components. If it's above, sell the basket and buy the components.
             - If the position limit for the gift basket is reached, decrease the position by a multiplier.
+            - With params.depth_ticks set, trade only as many baskets as every leg can fill within depth_ticks of its best price, each leg priced at the worst level it reaches.
         """
 
         self.logger.print("Executing choco_straw_rose_bask_ strategy")
@@ -445,6 +1889,9 @@ class Trader:
         orders_roses=[]
         orders_gift_basket=[]
 
+        volume_basket = self.params.volume_basket
+        spread_threshold = self.params.spread_threshold
+
         def create_orders(buy_basket: bool, multiplier):
 
             if buy_basket:
@@ -455,20 +1902,36 @@ class Trader:
                 sign = -1
                 price_basket = 1
                 price_others = 1_000_000
+
+            if self.params.depth_ticks is not None:
+                create_sized_orders(sign, volume_basket * multiplier)
+                return
             
             orders_gift_basket.append(
-                Order(GIFT_BASKET, price_basket, sign*VOLUME_BASKET*multiplier)
+                Order(GIFT_BASKET, price_basket, sign*volume_basket*multiplier)
             )
             orders_chocolate.append(
-                Order(CHOCOLATE, price_others, -sign*4*VOLUME_BASKET*multiplier)
+                Order(CHOCOLATE, price_others, -sign*4*volume_basket*multiplier)
             )
             orders_strawberries.append(
-                Order(STRAWBERRIES, price_others, -sign*6*VOLUME_BASKET*multiplier)
+                Order(STRAWBERRIES, price_others, -sign*6*volume_basket*multiplier)
             )
             orders_roses.append(
-                Order(ROSES, price_others, -sign*VOLUME_BASKET*multiplier)
+                Order(ROSES, price_others, -sign*volume_basket*multiplier)
             )
 
+        def create_sized_orders(sign, baskets):
+            #walk the books once per leg: cap the baskets by the scarcest leg, then price every leg at the worst level its volume reaches
+            book = self.get_snapshot(state).book
+            legs = [(orders_gift_basket, GIFT_BASKET, sign), (orders_chocolate, CHOCOLATE, -4 * sign), (orders_strawberries, STRAWBERRIES, -6 * sign), (orders_roses, ROSES, -sign)]
+            for _, product, ratio in legs:
+                baskets = min(baskets, book.max_quantity(product, ratio > 0, self.params.depth_ticks) // abs(ratio))
+            if baskets <= 0:
+                return
+            for orders, product, ratio in legs:
+                quantity, _, worst_price = book.fill(product, ratio * baskets)
+                orders.append(Order(product, worst_price, quantity))
+
         #calculate the mid prices of everything
         price_strawberries= self.get_mid_price(STRAWBERRIES, state)
         price_chocolate = self.get_mid_price(CHOCOLATE, state)
@@ -478,24 +1941,16 @@ class Trader:
         #get the current position we have on the GIFTS_BASKET
         position_basket = self.get_position(GIFT_BASKET, state)
 
-        #calculate a time series of spread mean and stdev with rolling window size of ROLLING_WINDOW
-        past_spreads = pd.Series(self.spread)
-        spread_mean = past_spreads.rolling(ROLLING_WINDOW).mean()
-        spread_sd = past_spreads.rolling(ROLLING_WINDOW).std()
-
-        #calculate the average spread over a smaller window of 5 periods
-        spread_5 =  past_spreads.rolling(5).mean()
-
-        if not np.isnan(spread_mean.iloc[-1]): #if the last spread_mean is not a NaN, I will use the last values of the timeseries just calculated
-            spread_mean = spread_mean.iloc[-1]
-            spread_sd = spread_sd.iloc[-1]
-            spread_5 = spread_5.iloc[-1]
-           
-            if abs(position_basket) <= POSITION_LIMITS[GIFT_BASKET] - VOLUME_BASKET: #if we can buy or sell other baskets:
-                if spread_5 < spread_mean - SPREAD_THRESHOLD * spread_sd: #if the recent spread is more than 1.96 standard deviations below the mean, buy the basket and sell the components
+        if self.spread_stats.is_full(): #as soon as we have rolling_window spreads, use the rolling mean and stdev of the spread and its average over the last 5 periods
+            spread_mean = self.spread_stats.mean()
+            spread_sd = self.spread_stats.std()
+            spread_5 = self.spread_stats_5.mean()
+
+            if abs(position_basket) <= POSITION_LIMITS[GIFT_BASKET] - volume_basket: #if we can buy or sell other baskets:
+                if spread_5 < spread_mean - spread_threshold * spread_sd: #if the recent spread is more than spread_threshold standard deviations below the mean, buy the basket and sell the components
                     buy_basket = True
                     create_orders(buy_basket, multiplier=1)
-                elif spread_5 > spread_mean + SPREAD_THRESHOLD * spread_sd:
+                elif spread_5 > spread_mean + spread_threshold * spread_sd:
                     buy_basket = False
                     create_orders(buy_basket, multiplier=1)
                 else:
@@ -504,10 +1959,10 @@ class Trader:
             else: #if we reached the maximum number of baskets we can buy or sell, decrease our position by multiplier basket
                 if position_basket > 0: #in this case I want to sell a basket
                     buy_basket = False
-                    create_orders(buy_basket, multiplier=MULTIPLIER)
+                    create_orders(buy_basket, multiplier=self.params.multiplier)
                 else: #in this case I want to buy a basket
                     buy_basket = True
-                    create_orders(buy_basket, multiplier=MULTIPLIER)
+                    create_orders(buy_basket, multiplier=self.params.multiplier)
 
         return orders_chocolate, orders_strawberries, orders_roses, orders_gift_basket
 
@@ -520,6 +1975,7 @@ class Trader:
             - If the spread is greater than 1.5 standard deviations above the mean, sell coconut and buy coconut_coupon.
             - If the spread is smaller than 1.5 standard deviations below the mean, sell coconut_coupon and buy coconut.
             - If the spread is within one standard deviation of the mean, reset positions for both coconut and coconut_coupon.
+            - With params.depth_ticks set, the entries take only the volume within depth_ticks of the best price, at the worst level they reach, instead of the full volume at the mid price.
         """
 
         self.logger.print("Executing Coco strategy")
@@ -535,28 +1991,38 @@ class Trader:
         mid_price_coconut = int(round(self.get_mid_price(COCONUT, state)))
         mid_price_coupon = int(round(self.get_mid_price(COCONUT_COUPON, state)))
 
-        spread_series = pd.Series(self.coco_spread)
-
         orders_coconut = []
         orders_coupon = []
 
-        if len(spread_series) < 100:
+        threshold = self.params.coco_threshold
+        reset_threshold = self.params.coco_reset_threshold
+
+        self.logger.print(f"Coupon iv {self.coupon.iv:.4f} delta {self.coupon.delta:.3f}")
+
+        def entry(product, mid_price, quantity):
+            #the full quantity at the mid price, or with depth_ticks the part of it the book fills within depth_ticks of the best price
+            if self.params.depth_ticks is None:
+                return [Order(product, mid_price, quantity)]
+            quantity, price = self.get_snapshot(state).book.sized_order(product, quantity, self.params.depth_ticks)
+            return [Order(product, price, quantity)] if quantity else []
+
+        if self.coco_spread.count < self.params.coco_warmup:
             pass
     
         else:
-            current_spread = spread_series.iloc[-1]
-            spread_mean = np.mean(spread_series)
-            spread_sd = np.std(spread_series)
+            current_spread = self.coco_spread[-1]
+            spread_mean = self.coco_spread_stats.mean() #the first coco_lookback spreads are NaN and are skipped
+            spread_sd = self.coco_spread_stats.std()
 
-            if current_spread > spread_mean + 1.96 * spread_sd:
-                orders_coconut.append(Order(COCONUT, mid_price_coconut, sell_volume_coconut))
-                orders_coupon.append(Order(COCONUT_COUPON, mid_price_coupon, buy_volume_coupon))
+            if current_spread > spread_mean + threshold * spread_sd:
+                orders_coconut += entry(COCONUT, mid_price_coconut, sell_volume_coconut)
+                orders_coupon += entry(COCONUT_COUPON, mid_price_coupon, buy_volume_coupon)
 
-            elif current_spread < spread_mean - 1.96 * spread_sd:
-                orders_coconut.append(Order(COCONUT, mid_price_coconut, buy_volume_coconut))
-                orders_coupon.append(Order(COCONUT_COUPON, mid_price_coupon, sell_volume_coupon))
+            elif current_spread < spread_mean - threshold * spread_sd:
+                orders_coconut += entry(COCONUT, mid_price_coconut, buy_volume_coconut)
+                orders_coupon += entry(COCONUT_COUPON, mid_price_coupon, sell_volume_coupon)
 
-            elif abs(current_spread) < spread_mean + 1 * spread_sd:
+            elif abs(current_spread) < spread_mean + reset_threshold * spread_sd:
                 orders_coconut.append(self.reset_positions(state, COCONUT))
                 orders_coupon.append(self.reset_positions(state, COCONUT_COUPON))
 
@@ -567,60 +2033,121 @@ class Trader:
 
 
     def run(self, state: TradingState):
-        self.round += 1
-
-        #update past_prices for COCONUT and COCONUT_COUPON
-        self.past_prices[COCONUT].append(self.get_mid_price(COCONUT, state))
-        self.past_prices[COCONUT_COUPON].append(self.get_mid_price(COCONUT_COUPON, state))
+        profiler = self.profiler.begin() #None when this tick is not timed, the laps are then skipped
 
-        self.update_ema_price(state)
-        
-        #append to self.sunlight and self.humidity the current values of sunlight and humidity
-        self.sunlight.append(state.observations.conversionObservations[ORCHIDS].sunlight)
-        self.humidity.append(state.observations.conversionObservations[ORCHIDS].humidity)
+        #a new Trader instance (or a restarted process) resumes from the traderData returned at the previous tick, unless it is the one this instance just emitted
+        if state.traderData and state.traderData != self.trader_data:
+            try:
+                self.restore_state(state.traderData)
+            except Exception as e:
+                self.logger.print(f"Could not restore traderData: {e}")
+            if profiler:
+                profiler.lap("restore_state")
 
-        self.update_spread(state)
+        self.round += 1
 
-        self.update_coco_spread(state)
+        #read the market once, all the strategies below share this snapshot
+        snapshot = self.get_snapshot(state)
+        if profiler:
+            profiler.lap("get_snapshot")
+
+        #book the new fills and mark the positions to the mids of the tick
+        self.ledger.update(state, snapshot.mid)
+        if profiler:
+            profiler.lap("update_ledger")
+
+        #update only the series some enabled strategy reads, and only when their inputs are present, so that
+        #a missing book does not push the EMA fallback prices into the spreads
+        updated = set()
+        consumed = self.consumed
+
+        if "coco_spread" in consumed and snapshot.has_books(SERIES_PRODUCTS["coco_spread"]):
+            #update past_prices and their rolling averages for COCONUT and COCONUT_COUPON
+            for product in [COCONUT, COCONUT_COUPON]:
+                mid_price = self.get_mid_price(product, state)
+                self.past_prices[product].append(mid_price)
+                self.coco_prices_stats[product].update(mid_price)
+            self.update_coco_spread(state)
+            self.coupon.update(self.get_mid_price(COCONUT, state), self.get_mid_price(COCONUT_COUPON, state), state.timestamp)
+            updated.add("coco_spread")
+        if profiler:
+            profiler.lap("update_coco_spread")
+
+        #the EMA is also the fallback mid price of the snapshots, it is always updated (it does not move without a two-sided book)
+        self.update_ema_price(state)
+        updated.add("ema")
+        if profiler:
+            profiler.lap("update_ema_price")
+
+        #features of the ConversionObservations of the tick, the orchids strategy needs the ORCHIDS one
+        observations = state.observations.conversionObservations
+        if "observations" in consumed and observations:
+            self.features.update(observations, snapshot)
+            if ORCHIDS in observations:
+                updated.add("observations")
+        if profiler:
+            profiler.lap("update_observations")
+
+        if "spread" in consumed and snapshot.has_books(SERIES_PRODUCTS["spread"]):
+            self.update_spread(state)
+            updated.add("spread")
+        if profiler:
+            profiler.lap("update_spread")
 
-        print(f"TIMESTAMP: {state.timestamp}")
-        
         result = {}
 
-        
-        try:
-            result[AMETHYSTS] = self.amethyst_strategy(state)
-        except Exception as e:
-            self.logger.print(f"Error in AMETHYSTS strategy: {e}")
-        
-        try:
-            result[STARFRUIT] = self.starfruit_strategy(state)
-        except Exception as e:
-            self.logger.print(f"Error in STARFRUIT strategy: {e}")
-        
-        try:
-            result[ORCHIDS] = self.orchids_strategy(state, self.sunlight, self.humidity)
-        except Exception as e:
-            self.logger.print(f"Error in ORCHIDS strategy: {e}")
-        
-        try:
-            result[CHOCOLATE], \
-            result[STRAWBERRIES], \
-            result[ROSES], \
-            result[GIFT_BASKET] = self.choco_straw_rose_bask_strategy(state)
-        except Exception as e:
-            self.logger.print(f"Error in choco_straw_rose_bask strategy: {e}") 
-
-        try:
-            result[COCONUT], \
-            result[COCONUT_COUPON] = self.coco_strategy(state)
-        except Exception as e:
-            self.logger.print(f"Error in coco strategy: {e}")
+        for name in self.strategies:
+            method, products, series = STRATEGIES[name]
+            if not snapshot.has_books(products) or not updated.issuperset(series):
+                continue
+
+            #the orders only depend on the books and positions of the products and on the series read, reuse them while these do not change
+            inputs = (snapshot.inputs(products), self.series_inputs(series, products))
+            last = self.last_orders.get(name)
+            if last is not None and last[0] == inputs:
+                orders = last[1]
+            else:
+                try:
+                    orders = getattr(self, method)(state)
+                except Exception as e:
+                    self.logger.print(f"Error in {name} strategy: {e}")
+                    if profiler:
+                        profiler.lap(name)
+                    continue
+                if len(products) == 1:
+                    orders = (orders,)
+                self.last_orders[name] = (inputs, orders)
+
+            for product, product_orders in zip(products, orders):
+                result[product] = product_orders
+            if profiler:
+                profiler.lap(name)
+
+        result = self.apply_risk_limits(result, snapshot)
+        if profiler:
+            profiler.lap("apply_risk_limits")
+
+        self.logger.print(self.ledger.summary())
 
         conversions = 0 
-        trader_data = "SAMPLE"
+        if self.persist:
+            trader_data = self.trader_data = self.encode_state()
+            if profiler:
+                profiler.lap("encode_state")
+        else:
+            trader_data = ""
+
+        if self.recorder is not None:
+            self.recorder.record(state, result, conversions, trader_data)
+            if profiler:
+                profiler.lap("record")
+
+        if self.profiler.is_due(self.round):
+            self.logger.print(self.profiler.summary())
         
         # Flush logs to output
         self.logger.flush(state, result, conversions, trader_data)
+        if profiler:
+            profiler.lap("flush")
         
         return result, conversions, trader_data